@@ -0,0 +1,77 @@
+import pandas as pd
+import pyarrow.dataset as ds
+from columnar_export import PARQUET_DIR, PARTITIONING
+
+# --------------------------
+# Load History
+# --------------------------
+def load_history(path=PARQUET_DIR, columns=None, since=None, until=None, indicator_types=None,
+                 country=None):
+    # Filters on week / indicator_type prune whole partition directories, so
+    # a trend over one indicator type only reads that type's files.
+    dataset = ds.dataset(path, format="parquet",
+                         partitioning=ds.partitioning(PARTITIONING, flavor="hive"))
+    expr = None
+    if since:
+        expr = _and(expr, ds.field("week") >= str(since))
+    if until:
+        expr = _and(expr, ds.field("week") <= str(until))
+    if indicator_types:
+        expr = _and(expr, ds.field("indicator_type").isin(list(indicator_types)))
+    if country:
+        # Rows repeat per target country; one country's view counts each once
+        expr = _and(expr, ds.field("country") == country)
+        return dataset.to_table(columns=columns, filter=expr).to_pandas()
+    # Across all countries each indicator counts once, as its highest-scored row
+    extra = ["indicator"] if columns is not None and "indicator" not in columns else []
+    df = dataset.to_table(columns=columns and columns + extra, filter=expr).to_pandas()
+    if "threat_score" in df:
+        df = df.sort_values("threat_score", ascending=False, kind="stable")
+    return df.drop_duplicates("indicator").sort_index().drop(columns=extra)
+
+def _and(expr, cond):
+    return cond if expr is None else expr & cond
+
+# --------------------------
+# Trends
+# --------------------------
+def weekly_counts(df):
+    # Rows: week, columns: indicator type, values: indicator count
+    return (df.groupby(["week", "indicator_type"], observed=True)
+              .size()
+              .unstack(fill_value=0)
+              .sort_index())
+
+def weekly_score_stats(df):
+    return (df.groupby("week", observed=True)["threat_score"]
+              .agg(["count", "mean", "median", "max"])
+              .sort_index())
+
+def score_distribution(df, bins=(0, 3, 6, 10, 20, float("inf"))):
+    buckets = pd.cut(df["threat_score"], bins=list(bins), right=False)
+    return (pd.crosstab(buckets, df["indicator_type"])
+              .rename_axis(index="score_range", columns="indicator_type"))
+
+def top_authors(df, n=10):
+    grouped = df.groupby("pulse_author", observed=True)
+    result = pd.DataFrame({
+        "indicators": grouped.size(),
+        "pulses": grouped["pulse_name"].nunique(),
+        "avg_score": grouped["threat_score"].mean().round(2),
+        "first_week": grouped["week"].min(),
+        "last_week": grouped["week"].max(),
+    })
+    return result.sort_values(["indicators", "avg_score"], ascending=False).head(n)
+
+def trend_summary(path=PARQUET_DIR, since=None, until=None, country=None):
+    df = load_history(
+        path,
+        columns=["week", "indicator_type", "pulse_author", "pulse_name", "threat_score"],
+        since=since, until=until, country=country
+    )
+    return {
+        "weekly_counts": weekly_counts(df),
+        "weekly_scores": weekly_score_stats(df),
+        "score_distribution": score_distribution(df),
+        "top_authors": top_authors(df),
+    }
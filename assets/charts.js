@@ -1 +1,125 @@
-// Dummy charts.js - heatmap chart placeholder
\ No newline at end of file
+// Dashboard charts, drawn from the pre-aggregated /api/stats rollups.
+//   #stateHeatmap  - the country's states by week (cell shade = indicator count)
+//   #dailySeries   - indicators per day, one bar per day, stacked by type
+(function () {
+  "use strict";
+
+  var WEEKS = 26;
+  var DAYS = 90;
+
+  function isoDate(d) {
+    return d.toISOString().slice(0, 10);
+  }
+
+  function daysAgo(n) {
+    var d = new Date();
+    d.setUTCDate(d.getUTCDate() - n);
+    return isoDate(d);
+  }
+
+  // <body data-country="MY">: the country this dashboard is rendered for
+  function countryParam() {
+    return "&country=" + encodeURIComponent(document.body.dataset.country || "");
+  }
+
+  function getJSON(url) {
+    return fetch(url).then(function (r) {
+      if (!r.ok) throw new Error(url + ": " + r.status);
+      return r.json();
+    });
+  }
+
+  function el(tag, attrs, text) {
+    var node = document.createElement(tag);
+    Object.keys(attrs || {}).forEach(function (k) { node.setAttribute(k, attrs[k]); });
+    if (text !== undefined) node.textContent = text;
+    return node;
+  }
+
+  function renderHeatmap(target, series) {
+    var weeks = [], states = {}, cells = {}, max = 0;
+    series.forEach(function (p) {
+      if (weeks.indexOf(p.bucket) < 0) weeks.push(p.bucket);
+      states[p.key] = (states[p.key] || 0) + p.count;
+      cells[p.key + "|" + p.bucket] = p.count;
+      max = Math.max(max, p.count);
+    });
+    weeks.sort();
+    var rows = Object.keys(states).sort(function (a, b) { return states[b] - states[a]; });
+
+    var table = el("table", { "class": "heatmap" });
+    var head = el("tr");
+    head.appendChild(el("th", {}, "State"));
+    weeks.forEach(function (w) { head.appendChild(el("th", { title: w }, w.slice(5))); });
+    table.appendChild(head);
+    rows.forEach(function (state) {
+      var tr = el("tr");
+      tr.appendChild(el("td", {}, state));
+      weeks.forEach(function (w) {
+        var n = cells[state + "|" + w] || 0;
+        var alpha = max ? (0.1 + 0.9 * n / max) : 0;
+        tr.appendChild(el("td", {
+          title: state + " " + w + ": " + n,
+          style: n ? "background: rgba(220, 40, 40, " + alpha.toFixed(2) + ")" : ""
+        }, n ? String(n) : ""));
+      });
+      table.appendChild(tr);
+    });
+    target.innerHTML = "";
+    target.appendChild(rows.length ? table : el("p", {}, "No located indicators yet."));
+  }
+
+  function renderDaily(target, series) {
+    var days = {}, types = [], max = 0;
+    series.forEach(function (p) {
+      days[p.bucket] = days[p.bucket] || {};
+      days[p.bucket][p.key] = p.count;
+      if (types.indexOf(p.key) < 0) types.push(p.key);
+    });
+    var labels = Object.keys(days).sort();
+    labels.forEach(function (d) {
+      var total = 0;
+      types.forEach(function (t) { total += days[d][t] || 0; });
+      max = Math.max(max, total);
+    });
+
+    var canvas = el("canvas", { width: 900, height: 220 });
+    var ctx = canvas.getContext("2d");
+    var palette = ["#e74c3c", "#3498db", "#f1c40f", "#2ecc71", "#9b59b6", "#e67e22", "#1abc9c"];
+    var barWidth = labels.length ? canvas.width / labels.length : 0;
+    labels.forEach(function (d, i) {
+      var y = canvas.height;
+      types.forEach(function (t, j) {
+        var h = max ? (days[d][t] || 0) / max * (canvas.height - 10) : 0;
+        ctx.fillStyle = palette[j % palette.length];
+        ctx.fillRect(i * barWidth, y - h, Math.max(barWidth - 1, 1), h);
+        y -= h;
+      });
+    });
+
+    var legend = el("div", { "class": "legend" });
+    types.forEach(function (t, j) {
+      legend.appendChild(el("span", { style: "color: " + palette[j % palette.length] }, "■ " + t + " "));
+    });
+    target.innerHTML = "";
+    target.appendChild(canvas);
+    target.appendChild(legend);
+  }
+
+  function load() {
+    var heatmap = document.getElementById("stateHeatmap");
+    var daily = document.getElementById("dailySeries");
+    if (heatmap) {
+      getJSON("/api/stats/state?since=" + daysAgo(WEEKS * 7) + countryParam())
+        .then(function (data) { renderHeatmap(heatmap, data.series); })
+        .catch(function (e) { heatmap.textContent = e.message; });
+    }
+    if (daily) {
+      getJSON("/api/stats/day?since=" + daysAgo(DAYS) + countryParam())
+        .then(function (data) { renderDaily(daily, data.series); })
+        .catch(function (e) { daily.textContent = e.message; });
+    }
+  }
+
+  document.addEventListener("DOMContentLoaded", load);
+})();
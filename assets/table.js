@@ -1 +1,141 @@
-// Dummy table.js - search tables placeholder
\ No newline at end of file
+// Virtualized threat table backed by /api/table.
+// Only the rows in view (plus a small margin) exist in the DOM, and rows are
+// fetched in fixed-size blocks as the user scrolls, so a 1M-row table costs
+// a few KB per screen. Markup expected:
+//   <input id="gridSearch"> <select id="gridSort"> <div id="threatGrid"></div>
+// inside <body data-country="MY">.
+(function () {
+  "use strict";
+
+  var ROW_HEIGHT = 28;
+  var BLOCK = 200;          // rows per /api/table request
+  var OVERSCAN = 10;        // extra rows rendered above/below the viewport
+  var VIEW_ROWS = 20;
+  // Browsers cap element heights (about 17.9M px in Firefox, i.e. ~640k rows
+  // here). Past MAX_HEIGHT the spacer stays at that height and the scroll
+  // position maps to a row proportionally.
+  var MAX_HEIGHT = 8000000;
+  var COLUMNS = ["indicator", "indicator_type", "pulse_name", "pulse_created", "threat_score"];
+  var LABELS = ["Indicator", "Type", "Pulse Name", "Created", "Score"];
+
+  var state = { q: "", sort: "score", total: 0, height: 0, blocks: {}, pending: {}, generation: 0 };
+  var grid, viewport, spacer, body;
+
+  function blockUrl(index) {
+    var params = new URLSearchParams({ offset: index * BLOCK, limit: BLOCK, sort: state.sort });
+    if (state.q) params.set("q", state.q);
+    if (document.body.dataset.country) params.set("country", document.body.dataset.country);
+    return "/api/table?" + params.toString();
+  }
+
+  function fetchBlock(index) {
+    if (state.blocks[index] || state.pending[index]) return;
+    var generation = state.generation;
+    state.pending[index] = true;
+    fetch(blockUrl(index))
+      .then(function (r) { return r.json(); })
+      .then(function (page) {
+        if (generation !== state.generation) return;   // search/sort changed meanwhile
+        delete state.pending[index];
+        if (page.error) { grid.title = page.error; return; }
+        state.blocks[index] = page.data;
+        setTotal(page.total);
+        render();
+      })
+      .catch(function () { delete state.pending[index]; });
+  }
+
+  function setTotal(total) {
+    if (total === state.total) return;
+    state.total = total;
+    state.height = Math.min(Math.max(total, 0) * ROW_HEIGHT, MAX_HEIGHT);
+    spacer.style.height = state.height + "px";
+    var count = document.getElementById("gridTotal");
+    if (count) count.textContent = total.toLocaleString() + " indicators";
+  }
+
+  function cell(row) {
+    var block = state.blocks[Math.floor(row / BLOCK)];
+    if (!block) return null;
+    var i = row % BLOCK;
+    return COLUMNS.map(function (c) { return block[c][i]; });
+  }
+
+  function topRow() {
+    // Fractional index of the row at the top of the viewport
+    var scrollTop = viewport.scrollTop;
+    var scrollable = state.height - viewport.clientHeight;
+    if (state.total * ROW_HEIGHT <= MAX_HEIGHT || scrollable <= 0) return scrollTop / ROW_HEIGHT;
+    return scrollTop / scrollable * (state.total - viewport.clientHeight / ROW_HEIGHT);
+  }
+
+  function render() {
+    var top = topRow();
+    var first = Math.max(0, Math.floor(top) - OVERSCAN);
+    var last = Math.min(state.total, first + VIEW_ROWS + 2 * OVERSCAN);
+    for (var b = Math.floor(first / BLOCK); b <= Math.floor(Math.max(last - 1, 0) / BLOCK); b++) {
+      fetchBlock(b);
+    }
+    // Equals first * ROW_HEIGHT until the spacer is clamped
+    body.style.transform = "translateY(" + (viewport.scrollTop + (first - top) * ROW_HEIGHT) + "px)";
+    var html = [];
+    for (var row = first; row < last; row++) {
+      var values = cell(row);
+      html.push("<tr style=\"height:" + ROW_HEIGHT + "px\">" + (values || COLUMNS.map(function () { return "…"; }))
+        .map(function (v) { return "<td>" + escapeHtml(v) + "</td>"; }).join("") + "</tr>");
+    }
+    body.innerHTML = html.join("");
+  }
+
+  function escapeHtml(v) {
+    return String(v === null || v === undefined ? "" : v)
+      .replace(/&/g, "&amp;").replace(/</g, "&lt;").replace(/>/g, "&gt;").replace(/"/g, "&quot;");
+  }
+
+  function reset() {
+    state.generation++;
+    state.blocks = {};
+    state.pending = {};
+    state.total = -1;
+    viewport.scrollTop = 0;
+    fetchBlock(0);
+  }
+
+  function build() {
+    grid = document.getElementById("threatGrid");
+    if (!grid) return;
+    grid.innerHTML =
+      "<table class=\"grid-head\"><tr>" + LABELS.map(function (l) { return "<th>" + l + "</th>"; }).join("") +
+      "</tr></table><div class=\"grid-viewport\"><div class=\"grid-spacer\"></div>" +
+      "<table class=\"grid-body\"><tbody></tbody></table></div>";
+    viewport = grid.querySelector(".grid-viewport");
+    spacer = grid.querySelector(".grid-spacer");
+    body = grid.querySelector("tbody");
+    viewport.style.cssText = "position:relative; overflow-y:auto; height:" + (VIEW_ROWS * ROW_HEIGHT) + "px";
+    spacer.style.cssText = "position:absolute; top:0; left:0; width:1px";
+    grid.querySelector(".grid-body").style.cssText = "position:absolute; top:0; left:0; width:100%; margin-top:0";
+
+    var ticking = false;
+    viewport.addEventListener("scroll", function () {
+      if (ticking) return;
+      ticking = true;
+      window.requestAnimationFrame(function () { ticking = false; render(); });
+    });
+
+    var search = document.getElementById("gridSearch");
+    var timer = null;
+    if (search) {
+      search.addEventListener("input", function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () { state.q = search.value.trim(); reset(); }, 200);
+      });
+    }
+    var sort = document.getElementById("gridSort");
+    if (sort) {
+      sort.addEventListener("change", function () { state.sort = sort.value; reset(); });
+    }
+    reset();
+  }
+
+  document.addEventListener("DOMContentLoaded", build);
+})();
@@ -1,16 +1,40 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, union_all
 from app.db.database import SessionLocal
-from app.db.models import Indicator
+from app.db.models import Indicator, ArchivedIndicator
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
 import csv
 import io
+import os
 from reportlab.platypus import SimpleDocTemplate, Paragraph
 from reportlab.lib.styles import getSampleStyleSheet
 
 router = APIRouter(prefix="/api")
 
+# ReportLab holds the GIL for the whole build, so PDFs render in worker
+# processes; the pool size caps concurrent renders. The executor's own queue
+# is unbounded, so past PDF_MAX_PENDING reports in progress (queued +
+# rendering, per web worker) requests get 429 instead of piling up.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))
+PDF_MAX_PENDING = int(os.getenv("PDF_MAX_PENDING", "8"))
+_pdf_pool = None
+_pdf_pending = 0
+
+def _get_pdf_pool():
+    global _pdf_pool
+    if _pdf_pool is None:
+        # spawn: forking a threaded web worker can copy held locks
+        _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_pool
+
 def get_db():
     db = SessionLocal()
     try:
@@ -18,37 +42,81 @@ def get_db():
     finally:
         db.close()
 
+def _window(query, model, since=None, until=None):
+    # created_at >= since and < until; either bound may be open
+    if since is not None:
+        query = query.where(model.created_at >= since)
+    if until is not None:
+        query = query.where(model.created_at < until)
+    return query
+
+def _indicators(include_archived=False, since=None, until=None):
+    # Hot table, or hot + archive with the same columns
+    columns = ("id", "type", "value", "country", "created_at")
+    hot = _window(select(*(getattr(Indicator, c) for c in columns)), Indicator, since, until)
+    if not include_archived:
+        return hot.subquery()
+    cold = _window(select(*(getattr(ArchivedIndicator, c) for c in columns)),
+                   ArchivedIndicator, since, until)
+    return union_all(hot, cold).subquery()
+
 @router.get("/top/ip")
-def top_ips(db: Session = Depends(get_db)):
+def top_ips(include_archived: bool = False, since: Optional[datetime] = None,
+            until: Optional[datetime] = None, db: Session = Depends(get_db)):
+    rows = _indicators(include_archived, since, until)
     result = (
-        db.query(Indicator.value, func.count(Indicator.id).label("count"))
-        .filter(Indicator.type == "ip")
-        .group_by(Indicator.value)
-        .order_by(func.count(Indicator.id).desc())
+        db.query(rows.c.value, func.count(rows.c.id).label("count"))
+        .filter(rows.c.type == "ip")
+        .group_by(rows.c.value)
+        .order_by(func.count(rows.c.id).desc())
         .limit(10)
         .all()
     )
     return result
 
 @router.get("/report/json")
-def json_report(db: Session = Depends(get_db)):
-    indicators = db.query(Indicator).all()
-    return indicators
+def json_report(include_archived: bool = False, since: Optional[datetime] = None,
+                until: Optional[datetime] = None, db: Session = Depends(get_db)):
+    if not include_archived:
+        return db.scalars(_window(select(Indicator), Indicator, since, until)).all()
+    rows = _indicators(True, since, until)
+    return [dict(r._mapping) for r in db.execute(select(rows))]
 
 @router.get("/report/csv")
-def csv_report(db: Session = Depends(get_db)):
+def csv_report(since: Optional[datetime] = None, until: Optional[datetime] = None,
+               db: Session = Depends(get_db)):
     output = io.StringIO()
     writer = csv.writer(output)
     writer.writerow(["Type", "Value", "Country", "Date"])
 
-    for i in db.query(Indicator).all():
+    for i in db.scalars(_window(select(Indicator), Indicator, since, until)):
         writer.writerow([i.type, i.value, i.country, i.created_at])
 
     output.seek(0)
     return StreamingResponse(output, media_type="text/csv")
 
-@router.get("/report/pdf")
-def pdf_report(db: Session = Depends(get_db)):
+def _top_ip_rows(days=None):
+    # All time by default. With days the window is bounded on both sides, so
+    # a partitioned table only reads the partitions it covers and skips the
+    # premade future ones.
+    db = SessionLocal()
+    try:
+        query = db.query(Indicator.value, func.count(Indicator.id)).filter(Indicator.type == "ip")
+        if days is not None:
+            until = datetime.now(timezone.utc)
+            query = query.filter(Indicator.created_at >= until - timedelta(days=days),
+                                 Indicator.created_at < until)
+        return [
+            (ip, count) for ip, count in
+            query.group_by(Indicator.value)
+            .order_by(func.count(Indicator.id).desc())
+            .limit(10)
+            .all()
+        ]
+    finally:
+        db.close()
+
+def render_pdf_report(results):
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer)
     styles = getSampleStyleSheet()
@@ -56,19 +124,23 @@ def pdf_report(db: Session = Depends(get_db)):
 
     content.append(Paragraph("Red Shark Weekly Threat Report", styles["Title"]))
 
-    results = (
-        db.query(Indicator.value, func.count(Indicator.id))
-        .filter(Indicator.type == "ip")
-        .group_by(Indicator.value)
-        .order_by(func.count(Indicator.id).desc())
-        .limit(10)
-        .all()
-    )
-
     for ip, count in results:
         content.append(Paragraph(f"{ip} - {count}", styles["Normal"]))
 
     doc.build(content)
-    buffer.seek(0)
+    return buffer.getvalue()
 
-    return StreamingResponse(buffer, media_type="application/pdf")
+@router.get("/report/pdf")
+async def pdf_report(days: Optional[int] = None):
+    # Only touched from the event loop thread, so a plain counter is enough
+    global _pdf_pending
+    if _pdf_pending >= PDF_MAX_PENDING:
+        raise HTTPException(status_code=429, detail="Too many PDF reports in progress")
+    _pdf_pending += 1
+    try:
+        results = await run_in_threadpool(_top_ip_rows, days)
+        loop = asyncio.get_running_loop()
+        content = await loop.run_in_executor(_get_pdf_pool(), render_pdf_report, results)
+    finally:
+        _pdf_pending -= 1
+    return StreamingResponse(io.BytesIO(content), media_type="application/pdf")
@@ -1,6 +1,10 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.ingestion import ingest
+from app.services.lifecycle import archive_expired
+from app.services.partitions import maintain_partitions
 
 scheduler = BackgroundScheduler()
 scheduler.add_job(ingest, "interval", minutes=15)
+scheduler.add_job(archive_expired, "cron", hour=3)
+scheduler.add_job(maintain_partitions, "cron", hour=3, minute=30)
 scheduler.start()
@@ -1,7 +1,13 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
+# One row per indicator; bulk loads merge on it with ON CONFLICT
+UNIQUE_INDEX = "uq_indicators_type_value"
+# Time-window scans; BRIN on Postgres, where rows arrive in created_at order.
+# app.services.partitions rebuilds the table partitioned on this column.
+CREATED_INDEX = "ix_indicators_created_at"
+
 class Indicator(Base):
     __tablename__ = "indicators"
 
@@ -10,3 +16,19 @@ class Indicator(Base):
     value = Column(String, index=True)
     country = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index(UNIQUE_INDEX, "type", "value", unique=True),
+        Index(CREATED_INDEX, "created_at", postgresql_using="brin"),
+    )
+
+class ArchivedIndicator(Base):
+    # Expired rows moved out of indicators by app.services.lifecycle
+    __tablename__ = "indicators_archive"
+
+    id = Column(Integer, primary_key=True)
+    type = Column(String)
+    value = Column(String, index=True)
+    country = Column(String)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
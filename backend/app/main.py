@@ -3,8 +3,12 @@ from app.api.routes import router
 from app.db.database import engine
 from app.db.models import Base
 from app.core.scheduler import scheduler
+from app.services.bulk_load import ensure_unique_index
+from app.services.partitions import maintain_partitions
 
 Base.metadata.create_all(bind=engine)
+ensure_unique_index(engine)
+maintain_partitions(engine)
 
 app = FastAPI(title="Red Shark Threat Intelligence Platform")
 
@@ -0,0 +1,108 @@
+import io
+import csv
+from itertools import islice
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from app.db.database import engine
+from app.db.models import Indicator, UNIQUE_INDEX
+from app.services.partitions import PARTITIONED_SQL, is_partitioned
+
+# Loads (type, value, country) rows into indicators, skipping the ones
+# already stored. On Postgres the rows stream through COPY into a temp table
+# and one INSERT ... ON CONFLICT merges them; on SQLite (local dev) they go
+# in executemany batches. Both lean on the unique (type, value) index.
+# A partitioned indicators table (see partitions.py) cannot have one, since
+# unique indexes there must include created_at; the merge then skips stored
+# rows with NOT EXISTS, which assumes loads do not run concurrently (the
+# scheduler is the only writer).
+COPY_CHUNK_ROWS = 50000
+BATCH_ROWS = 5000
+
+_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+_MERGE = """
+    INSERT INTO indicators (type, value, country)
+    SELECT type, value, country FROM indicators_load
+    ORDER BY type, value
+    ON CONFLICT (type, value) DO NOTHING
+"""
+_MERGE_PARTITIONED = """
+    INSERT INTO indicators (type, value, country)
+    SELECT DISTINCT ON (type, value) type, value, country FROM indicators_load l
+    WHERE NOT EXISTS (
+        SELECT 1 FROM indicators i WHERE i.type = l.type AND i.value = l.value
+    )
+    ORDER BY type, value
+"""
+
+def ensure_unique_index(bind=engine):
+    # Tables created before the index can hold repeats of the same indicator
+    # (every ingest re-added them); keep the first copy of each.
+    if bind.dialect.name == "postgresql":
+        with bind.connect() as conn:
+            if is_partitioned(conn):
+                return False
+    if UNIQUE_INDEX in {ix["name"] for ix in inspect(bind).get_indexes("indicators")}:
+        return False
+    with bind.begin() as conn:
+        conn.execute(text("""
+            DELETE FROM indicators
+            WHERE id NOT IN (SELECT MIN(id) FROM indicators GROUP BY type, value)
+        """))
+        conn.execute(text(f"CREATE UNIQUE INDEX {UNIQUE_INDEX} ON indicators (type, value)"))
+    return True
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _copy(cur, sql, buf):
+    if hasattr(cur, "copy_expert"):     # psycopg2
+        cur.copy_expert(sql, buf)
+    else:                               # psycopg 3
+        with cur.copy(sql) as copy:
+            copy.write(buf.getvalue())
+
+def copy_load(rows, bind=engine):
+    # One transaction: COPY every chunk into the temp table, then merge
+    raw = bind.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("""
+            CREATE TEMP TABLE indicators_load (type text, value text, country text)
+            ON COMMIT DROP
+        """)
+        for chunk in _chunks(rows, COPY_CHUNK_ROWS):
+            buf = io.StringIO()
+            csv.writer(buf, lineterminator="\n").writerows(chunk)
+            buf.seek(0)
+            _copy(cur, "COPY indicators_load (type, value, country) FROM STDIN WITH (FORMAT csv)", buf)
+        cur.execute(PARTITIONED_SQL)
+        partitioned = cur.fetchone() is not None
+        # Key order turns random index inserts into mostly appends
+        cur.execute(_MERGE_PARTITIONED if partitioned else _MERGE)
+        inserted = cur.rowcount
+        raw.commit()
+    finally:
+        raw.close()
+    return inserted
+
+def batch_load(rows, bind=engine, batch_rows=BATCH_ROWS):
+    stmt = _INSERTS[bind.dialect.name](Indicator.__table__).on_conflict_do_nothing(
+        index_elements=["type", "value"])
+    inserted = 0
+    with bind.begin() as conn:
+        for chunk in _chunks(rows, batch_rows):
+            result = conn.execute(stmt, [{"type": t, "value": v, "country": c} for t, v, c in chunk])
+            inserted += max(result.rowcount, 0)
+    return inserted
+
+def bulk_load(rows, bind=engine):
+    # Returns the number of new indicators
+    if bind.dialect.name == "postgresql":
+        return copy_load(rows, bind)
+    return batch_load(rows, bind)
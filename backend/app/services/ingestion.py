@@ -1,17 +1,35 @@
-from app.db.database import SessionLocal
-from app.db.models import Indicator
+from app.services.bulk_load import bulk_load
 from app.services.otx_client import fetch_indicators
 from app.services.maxmind import is_malaysia
+from app.services.pipeline import Pipeline, Stage
 
-def ingest():
-    db = SessionLocal()
+# fetch -> geo filter -> write over bounded queues; GeoIP lookups run on
+# several threads while a single writer commits one batch at a time.
+BATCH_SIZE = 200
+GEO_WORKERS = 4
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-    ips = fetch_indicators("IPv4")
+def _malaysian(ips):
+    return [ip for ip in ips if is_malaysia(ip)] or None
 
-    for ip in ips:
-        if is_malaysia(ip):
-            indicator = Indicator(type="ip", value=ip, country="MY")
-            db.add(indicator)
+def _write(ips):
+    # Already-stored IPs are skipped by the unique (type, value) index
+    return bulk_load(("ip", ip, "MY") for ip in ips)
 
-    db.commit()
-    db.close()
+def ingest():
+    return Pipeline(
+        [_batches(fetch_indicators("IPv4"), BATCH_SIZE)],
+        [
+            Stage("geo", _malaysian, workers=GEO_WORKERS),
+            Stage("write", _write),
+        ]
+    ).run()
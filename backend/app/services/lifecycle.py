@@ -0,0 +1,43 @@
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import insert, select, delete, literal
+from app.db.database import SessionLocal
+from app.db.models import Indicator, ArchivedIndicator
+
+# Indicators expire per type and move to indicators_archive in small
+# batches, so the hot table and its indexes stay small. Copy and delete
+# share one transaction here (same database, unlike the SQLite app).
+TTL_DAYS = {"ip": 30, "domain": 90, "hash": 365}
+DEFAULT_TTL_DAYS = 180
+ARCHIVE_BATCH = 2000
+ARCHIVE_PAUSE = 0.05
+
+def archive_expired(batch_rows=ARCHIVE_BATCH, pause=ARCHIVE_PAUSE):
+    now = datetime.now(timezone.utc)
+    moved = {}
+    db = SessionLocal()
+    try:
+        types = [t for (t,) in db.query(Indicator.type).distinct()]
+        for ind_type in types:
+            cutoff = now - timedelta(days=TTL_DAYS.get(ind_type, DEFAULT_TTL_DAYS))
+            while True:
+                ids = [i for (i,) in db.query(Indicator.id)
+                       .filter(Indicator.type == ind_type, Indicator.created_at < cutoff)
+                       .limit(batch_rows)]
+                if not ids:
+                    break
+                db.execute(insert(ArchivedIndicator).from_select(
+                    ["id", "type", "value", "country", "created_at", "archived_at"],
+                    select(Indicator.id, Indicator.type, Indicator.value, Indicator.country,
+                           Indicator.created_at, literal(now))
+                    .where(Indicator.id.in_(ids), Indicator.created_at < cutoff)
+                ))
+                # The cutoff also prunes partitions (app.services.partitions)
+                db.execute(delete(Indicator).where(Indicator.id.in_(ids), Indicator.created_at < cutoff))
+                db.commit()
+                moved[ind_type] = moved.get(ind_type, 0) + len(ids)
+                if pause:
+                    time.sleep(pause)
+    finally:
+        db.close()
+    return moved
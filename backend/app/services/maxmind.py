@@ -1,9 +1,14 @@
 import geoip2.database
 from app.core.config import MAXMIND_DB
+from app.services.geo_reload import ReloadingReader
 
-reader = geoip2.database.Reader(MAXMIND_DB)
+# Re-opened in the background when the workflow replaces the MMDB file
+geoip = ReloadingReader(MAXMIND_DB, geoip2.database.Reader)
 
 def is_malaysia(ip):
+    reader = geoip.get()
+    if reader is None:
+        return False
     try:
         response = reader.country(ip)
         return response.country.iso_code == "MY"
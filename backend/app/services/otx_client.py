@@ -11,7 +11,11 @@ def fetch_indicators(indicator_type, limit=500):
     url = f"{BASE_URL}/indicators/export"
     params = {"type": indicator_type, "limit": limit}
 
-    response = requests.get(url, headers=HEADERS, params=params, timeout=15)
-    response.raise_for_status()
+    # Yields one indicator per line as the export body streams in
+    with requests.get(url, headers=HEADERS, params=params, timeout=15, stream=True) as response:
+        response.raise_for_status()
+        response.encoding = response.encoding or "utf-8"
 
-    return response.text.splitlines()
+        for line in response.iter_lines(decode_unicode=True):
+            if line:
+                yield line
@@ -0,0 +1,183 @@
+import os
+import re
+import argparse
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from app.db.database import engine
+from app.db.models import CREATED_INDEX
+from app.services.lifecycle import TTL_DAYS, DEFAULT_TTL_DAYS
+
+# On Postgres, indicators is partitioned by RANGE (created_at), one partition
+# per month (or week). A weekly report filtered on created_at then only
+# reads one or two partitions. Each partition has a BRIN index on created_at,
+# which stays tiny because rows arrive in time order, plus B-trees on
+# (type, value) and value. Partitions are made PREMAKE periods ahead. Once a
+# whole partition is older than RETENTION_DAYS it is detached, any rows
+# lifecycle.archive_expired has not moved yet go to indicators_archive, and
+# it is dropped. Rows outside every range (clock skew, a missed maintenance
+# run) land in indicators_default and move out when their period is made.
+#
+# Converting rewrites the table under an ACCESS EXCLUSIVE lock, so it never
+# happens on startup: set INDICATOR_PARTITIONS and run
+#   python -m app.services.partitions convert
+# once. Startup and the daily job only maintain an already partitioned table.
+INTERVAL = os.getenv("INDICATOR_PARTITIONS", "none")      # month | week | none
+PREMAKE = 3
+RETENTION_DAYS = int(os.getenv("PARTITION_RETENTION_DAYS",
+                               max([DEFAULT_TTL_DAYS, *TTL_DAYS.values()])))
+
+DEFAULT_PARTITION = "indicators_default"
+PARTITIONED_SQL = "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('indicators')"
+_BOUNDS = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+def enabled(bind=engine):
+    return bind.dialect.name == "postgresql" and INTERVAL in ("month", "week")
+
+def is_partitioned(conn):
+    return conn.execute(text(PARTITIONED_SQL)).first() is not None
+
+# --------------------------
+# Periods
+# --------------------------
+def _period_start(ts):
+    ts = ts.astimezone(timezone.utc)
+    if INTERVAL == "week":
+        day = ts.date() - timedelta(days=ts.weekday())
+    else:
+        day = ts.date().replace(day=1)
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def _next_period(start):
+    if INTERVAL == "week":
+        return start + timedelta(days=7)
+    return (start + timedelta(days=32)).replace(day=1)
+
+def partitions(conn):
+    # [(name, lower, upper)] in time order, without the default partition
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'indicators'::regclass
+    """)).all()
+    result = []
+    for name, bound in rows:
+        if bound == "DEFAULT":
+            continue
+        lo, hi = _BOUNDS.search(bound).groups()
+        result.append((name, datetime.fromisoformat(lo), datetime.fromisoformat(hi)))
+    return sorted(result, key=lambda p: p[1])
+
+def create_partitions(conn, start, end):
+    # One partition per period in [start, end); periods overlapping an
+    # existing partition (e.g. after switching month -> week) are skipped.
+    # Rows the default partition holds for a period move into it first, or
+    # attaching would fail; ATTACH also locks less than PARTITION OF.
+    existing = [(lo, hi) for _, lo, hi in partitions(conn)]
+    created = []
+    period = _period_start(start)
+    while period < end:
+        upper = _next_period(period)
+        if not any(lo < upper and period < hi for lo, hi in existing):
+            name = f"indicators_{period:%Y%m%d}"
+            bounds = {"lo": period, "hi": upper}
+            conn.execute(text(f"CREATE TABLE {name} (LIKE indicators INCLUDING DEFAULTS)"))
+            conn.execute(text(f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION}
+                    WHERE created_at >= :lo AND created_at < :hi
+                    RETURNING id, type, value, country, created_at
+                )
+                INSERT INTO {name} (id, type, value, country, created_at)
+                SELECT id, type, value, country, created_at FROM moved
+            """), bounds)
+            conn.execute(text(f"""
+                ALTER TABLE indicators ATTACH PARTITION {name}
+                FOR VALUES FROM ('{period.isoformat()}') TO ('{upper.isoformat()}')
+            """))
+            created.append(name)
+        period = upper
+    return created
+
+# --------------------------
+# Conversion
+# --------------------------
+def convert_to_partitioned(conn):
+    # Rebuilds a plain indicators table as a partitioned one in a single
+    # transaction. The primary key has to include the partition key, and ids
+    # keep coming from the same sequence.
+    seq = conn.execute(text("SELECT pg_get_serial_sequence('indicators', 'id')")).scalar()
+    conn.execute(text("LOCK TABLE indicators IN ACCESS EXCLUSIVE MODE"))
+    bounds = conn.execute(text("SELECT MIN(created_at), MAX(created_at) FROM indicators")).first()
+    conn.execute(text("ALTER TABLE indicators RENAME TO indicators_unpartitioned"))
+    conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY NONE"))
+    conn.execute(text(f"""
+        CREATE TABLE indicators (
+            id INTEGER NOT NULL DEFAULT nextval('{seq}'),
+            type VARCHAR,
+            value VARCHAR,
+            country VARCHAR,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            CONSTRAINT indicators_partitioned_pkey PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF indicators DEFAULT"))
+    now = datetime.now(timezone.utc)
+    create_partitions(conn, min(bounds[0] or now, now), now)
+    conn.execute(text("""
+        INSERT INTO indicators (id, type, value, country, created_at)
+        SELECT id, type, value, country, COALESCE(created_at, now())
+        FROM indicators_unpartitioned
+        ORDER BY created_at
+    """))
+    conn.execute(text("DROP TABLE indicators_unpartitioned"))
+    conn.execute(text(f"ALTER SEQUENCE {seq} OWNED BY indicators.id"))
+    # Built after the copy; each cascades to every partition
+    conn.execute(text(f"CREATE INDEX {CREATED_INDEX} ON indicators USING brin (created_at)"))
+    conn.execute(text("CREATE INDEX ix_indicators_type_value ON indicators (type, value)"))
+    conn.execute(text("CREATE INDEX ix_indicators_value ON indicators (value)"))
+
+# --------------------------
+# Retention
+# --------------------------
+def drop_expired_partitions(conn, now=None):
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=RETENTION_DAYS)
+    dropped = []
+    for name, _, upper in partitions(conn):
+        if upper > cutoff:
+            break
+        conn.execute(text(f"ALTER TABLE indicators DETACH PARTITION {name}"))
+        conn.execute(text(f"""
+            INSERT INTO indicators_archive (id, type, value, country, created_at, archived_at)
+            SELECT id, type, value, country, created_at, now() FROM {name}
+        """))
+        conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+def maintain_partitions(bind=engine, convert=False):
+    # Startup and daily: keep future partitions ready, retire old ones.
+    # convert=True (the command below) first rebuilds a plain table.
+    # Returns what changed.
+    if not enabled(bind):
+        return {}
+    with bind.begin() as conn:
+        converted = not is_partitioned(conn)
+        if converted and not convert:
+            return {}
+        if converted:
+            convert_to_partitioned(conn)
+        now = datetime.now(timezone.utc)
+        end = _period_start(now)
+        for _ in range(PREMAKE + 1):
+            end = _next_period(end)
+        created = create_partitions(conn, now, end)
+        dropped = drop_expired_partitions(conn, now)
+    return {"converted": converted, "created": created, "dropped": dropped}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage indicator partitions")
+    parser.add_argument("action", choices=["convert", "maintain"])
+    args = parser.parse_args()
+    if not enabled():
+        parser.error("set INDICATOR_PARTITIONS=month or week on a Postgres DATABASE_URL")
+    print(maintain_partitions(convert=args.action == "convert"))
@@ -0,0 +1,61 @@
+import time
+import random
+import argparse
+from sqlalchemy.orm import Session
+from app.db.database import engine
+from app.db.models import Base, Indicator
+from app.services.bulk_load import copy_load, batch_load
+
+# Loads the same synthetic IP export with each write path into a fresh
+# indicators table and prints the wall time. Run against a throwaway
+# database from the backend/ directory:
+#   DATABASE_URL=postgresql://localhost/bench python -m benchmarks.bulk_load --rows 500000
+
+def synthetic_export(n, seed=1):
+    # Distinct IPs, so the ORM path does not trip over the unique index
+    addresses = random.Random(seed).sample(range(1 << 24, 224 << 24), n)
+    return [("ip", ".".join(str(a >> s & 255) for s in (24, 16, 8, 0)), "MY") for a in addresses]
+
+def orm_load(rows, bind=engine, batch_rows=200):
+    # The previous ingestion path: add_all + commit per pipeline batch
+    with Session(bind) as db:
+        for i in range(0, len(rows), batch_rows):
+            db.add_all([Indicator(type=t, value=v, country=c) for t, v, c in rows[i:i + batch_rows]])
+            db.commit()
+    return len(rows)
+
+METHODS = {"orm": orm_load, "executemany": batch_load, "copy": copy_load}
+
+def _reset():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+def _count():
+    with Session(engine) as db:
+        return db.query(Indicator).count()
+
+def run(rows, methods):
+    print(f"{engine.dialect.name}: {len(rows)} rows")
+    for name in methods:
+        if name == "copy" and engine.dialect.name != "postgresql":
+            continue
+        _reset()
+        start = time.perf_counter()
+        METHODS[name](rows)
+        first = time.perf_counter() - start
+        stored = _count()
+        line = f"{name:12} load {first:8.2f}s  {len(rows) / first:10.0f} rows/s  stored {stored}"
+        if name != "orm":
+            # Second run: every row conflicts with a stored one
+            start = time.perf_counter()
+            METHODS[name](rows)
+            line += f"  reload {time.perf_counter() - start:6.2f}s"
+        print(line)
+    _reset()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark indicator bulk loads")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--methods", default="orm,executemany,copy")
+    args = parser.parse_args()
+    run(synthetic_export(args.rows), args.methods.split(","))
@@ -0,0 +1,166 @@
+import os
+import ipaddress
+from generate_ioc import FEEDS_DIR, feed_ips
+from indicators import TAG_IPV4, TAG_IPV6, IP_TYPES
+
+# --------------------------
+# Blocklist Config
+# --------------------------
+# Stored IPs and the feeds/*.txt entries (IPs or CIDRs) collapse into the
+# smallest set of CIDRs covering exactly the same addresses, so firewalls
+# load a few aggregated networks instead of thousands of /32s. Ranges are
+# sorted as integers once (O(n log n), the dominant cost); merging and
+# splitting into CIDRs are then one linear pass. A merged network carries
+# the highest score of the entries in it. Feed entries have no score of
+# their own and count as BLOCKLIST_FEED_SCORE against --min-score.
+OUTPUT_DIR = os.path.join("exports", "blocklist")
+TABLE = "malaysia_targeted_threats"
+SET_NAME = os.environ.get("BLOCKLIST_SET", "redshark")
+FEED_SCORE = int(os.environ.get("BLOCKLIST_FEED_SCORE", 10))
+IPSET_MAXELEM = 1 << 20
+SURICATA_CATEGORY = 1       # id in the categories file, see README
+
+BITS = {4: 32, 6: 128}
+ADDRESS = {4: ipaddress.IPv4Address, 6: ipaddress.IPv6Address}
+TAG_VERSIONS = {TAG_IPV4: 4, TAG_IPV6: 6}
+
+# --------------------------
+# Sources
+# --------------------------
+def _stored_ranges(conn, min_score, country):
+    # Stored IPs are tagged raw bytes (indicators.py): no text round trip
+    placeholders = ", ".join("?" * len(IP_TYPES))
+    sql = f"""
+        SELECT indicator, threat_score FROM {TABLE}
+        WHERE indicator_type IN ({placeholders}) AND COALESCE(threat_score, 0) >= ?
+    """
+    params = [*IP_TYPES, min_score]
+    if country:
+        sql += " AND country = ?"
+        params.append(country)
+    for indicator, score in conn.execute(sql, params):
+        if not isinstance(indicator, bytes) or indicator[0] not in TAG_VERSIONS:
+            continue
+        address = int.from_bytes(indicator[1:], "big")
+        yield TAG_VERSIONS[indicator[0]], address, address, score or 0
+
+def _feed_ranges(feeds_dir, min_score):
+    if FEED_SCORE < min_score:
+        return
+    for value, _ in feed_ips(feeds_dir):
+        try:
+            net = ipaddress.ip_network(value, strict=False)
+        except ValueError:
+            continue
+        yield net.version, int(net.network_address), int(net.broadcast_address), FEED_SCORE
+
+def feeds_stamp(feeds_dir=FEEDS_DIR):
+    # Feed files change without a dataset version bump
+    if not os.path.isdir(feeds_dir):
+        return None
+    return tuple(sorted(
+        (name, os.stat(os.path.join(feeds_dir, name)).st_mtime_ns)
+        for name in os.listdir(feeds_dir) if name.endswith(".txt")
+    ))
+
+# --------------------------
+# Aggregation
+# --------------------------
+def merge_ranges(ranges):
+    # Sorted (start, end, score) -> overlapping or adjacent ranges joined
+    merged = []
+    for start, end, score in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            last = merged[-1]
+            if end > last[1]:
+                last[1] = end
+            if score > last[2]:
+                last[2] = score
+        else:
+            merged.append([start, end, score])
+    return merged
+
+def range_cidrs(start, end, bits):
+    # Largest aligned block at each step: [start, end] -> (network, prefix)
+    while start <= end:
+        size = start & -start or 1 << bits
+        while size > end - start + 1:
+            size >>= 1
+        yield start, bits - size.bit_length() + 1
+        start += size
+
+def build_networks(conn, min_score=0, country=None, feeds=True, feeds_dir=FEEDS_DIR):
+    # {4: [(cidr text, score)], 6: [...]}
+    ranges = {4: [], 6: []}
+    sources = [_stored_ranges(conn, min_score, country)]
+    if feeds:
+        sources.append(_feed_ranges(feeds_dir, min_score))
+    for source in sources:
+        for version, start, end, score in source:
+            ranges[version].append((start, end, score))
+    networks = {}
+    for version, items in ranges.items():
+        items.sort()
+        address = ADDRESS[version]
+        networks[version] = [
+            (f"{address(net)}/{prefix}", score)
+            for start, end, score in merge_ranges(items)
+            for net, prefix in range_cidrs(start, end, BITS[version])
+        ]
+    return networks
+
+# --------------------------
+# Formats
+# --------------------------
+def _plain(networks):
+    return "".join(f"{cidr}\n" for version in (4, 6) for cidr, _ in networks[version])
+
+def _ipset(networks):
+    # `ipset -exist restore < file`: fills a scratch set, then swaps it in
+    lines = []
+    for version, family in ((4, "inet"), (6, "inet6")):
+        name = f"{SET_NAME}-v{version}"
+        create = f"hash:net family {family} maxelem {IPSET_MAXELEM}"
+        lines += [f"create {name} {create}", f"create {name}-new {create}", f"flush {name}-new"]
+        lines += [f"add {name}-new {cidr}" for cidr, _ in networks[version]]
+        lines += [f"swap {name}-new {name}", f"destroy {name}-new"]
+    return "\n".join(lines) + "\n"
+
+def _nftables(networks):
+    # `nft -f file` applies it as one transaction; rules in the same table
+    # match with `ip saddr @blocklist_v4`
+    lines = [f"add table inet {SET_NAME}"]
+    for version in (4, 6):
+        name = f"blocklist_v{version}"
+        lines.append(f"add set inet {SET_NAME} {name} {{ type ipv{version}_addr; flags interval; }}")
+        lines.append(f"flush set inet {SET_NAME} {name}")
+        if networks[version]:
+            elements = ",\n    ".join(cidr for cidr, _ in networks[version])
+            lines.append(f"add element inet {SET_NAME} {name} {{\n    {elements}\n}}")
+    return "\n".join(lines) + "\n"
+
+def _suricata(networks):
+    # IP reputation file: <network>,<category>,<score 1-127>
+    return "".join(
+        f"{cidr},{SURICATA_CATEGORY},{min(max(score, 1), 127)}\n"
+        for version in (4, 6) for cidr, score in networks[version]
+    )
+
+FORMATS = {"plain": _plain, "ipset": _ipset, "nftables": _nftables, "suricata": _suricata}
+EXTENSIONS = {"plain": "txt", "ipset": "ipset", "nftables": "nft", "suricata": "list"}
+
+def render_blocklist(networks, fmt):
+    return FORMATS[fmt](networks)
+
+def write_blocklists(conn, formats=tuple(FORMATS), out_dir=OUTPUT_DIR, **kwargs):
+    networks = build_networks(conn, **kwargs)
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for fmt in formats:
+        path = os.path.join(out_dir, f"blocklist.{EXTENSIONS[fmt]}")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(render_blocklist(networks, fmt))
+        os.replace(tmp, path)
+        paths.append(path)
+    return paths, sum(len(n) for n in networks.values())
@@ -0,0 +1,185 @@
+import os
+import secrets
+from datetime import datetime, timedelta
+
+# --------------------------
+# Change Feed Config
+# --------------------------
+# Every insert, update and delete on the threats table appends a row to
+# threat_changes from a trigger, so no write path can forget one. seq is
+# AUTOINCREMENT and never reused, so a consumer only needs the last seq it
+# saw. Refreshing last_seen (a re-sighted indicator) is not a change.
+#
+# Compaction keeps only the newest change per threat and drops tombstones
+# older than CHANGES_RETENTION_DAYS. The live rows therefore always have an
+# upsert in the feed and after=0 replays the whole current dataset; a
+# consumer whose cursor is older than a dropped tombstone is told to resync.
+# The epoch is minted with the table and again on every snapshot restore,
+# so a rebuilt database is never mistaken for the one a cursor came from.
+CHANGES_TABLE = "threat_changes"
+RETENTION_DAYS = int(os.environ.get("CHANGES_RETENTION_DAYS", 14))
+MAX_LIMIT = 5000
+TABLE = "malaysia_targeted_threats"
+
+FEED_COLUMNS = """
+    c.seq, c.op, c.threat_id AS id, c.country, ioc_text(c.indicator) AS indicator,
+    c.indicator_type, c.changed_at, t.pulse_name, t.pulse_description, t.pulse_author,
+    t.pulse_created, t.threat_score, t.geo_country, t.geo_region, t.geo_city, t.geo_asn,
+    t.geo_isp, t.last_seen
+"""
+
+class ResyncRequired(Exception):
+    pass
+
+# --------------------------
+# Table + Triggers
+# --------------------------
+def ensure_change_feed(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CHANGES_TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            threat_id INTEGER NOT NULL,
+            country TEXT,
+            indicator BLOB,
+            indicator_type TEXT,
+            changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+        )
+    """)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_changes_threat ON {CHANGES_TABLE} (threat_id, seq)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS threat_changes_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch TEXT NOT NULL,
+            compacted_through INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    created = conn.execute("INSERT OR IGNORE INTO threat_changes_meta (id, epoch) VALUES (1, ?)",
+                           (secrets.token_hex(8),)).rowcount
+    if created:
+        # Any cursor from before a reset (see reset_change_feed) is below
+        # the new epoch's first seq and gets told to resync
+        conn.execute("""
+            UPDATE threat_changes_meta SET compacted_through = COALESCE(
+                (SELECT seq FROM sqlite_sequence WHERE name = ?), 0) + 1
+            WHERE id = 1
+        """, (CHANGES_TABLE,))
+        # Rows stored before the feed existed start it off as upserts
+        conn.execute(f"""
+            INSERT INTO {CHANGES_TABLE} (op, threat_id, country, indicator, indicator_type)
+            SELECT 'upsert', id, country, indicator, indicator_type FROM {TABLE} ORDER BY id
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS threat_changes_ai AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {CHANGES_TABLE} (op, threat_id, country, indicator, indicator_type)
+            VALUES ('upsert', new.id, new.country, new.indicator, new.indicator_type);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS threat_changes_ad AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {CHANGES_TABLE} (op, threat_id, country, indicator, indicator_type)
+            VALUES ('delete', old.id, old.country, old.indicator, old.indicator_type);
+        END
+    """)
+    # Every column but last_seen, which ingest refreshes on each re-sighting.
+    # The list is fixed into the trigger, so it is rebuilt whenever a
+    # migration adds a column.
+    columns = [r[1] for r in conn.execute(f"PRAGMA table_info({TABLE})")
+               if r[1] not in ("id", "last_seen")]
+    update_of = f"AFTER UPDATE OF {', '.join(columns)} ON {TABLE}"
+    current = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'threat_changes_au'").fetchone()
+    if current and update_of not in current[0]:
+        conn.execute("DROP TRIGGER threat_changes_au")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS threat_changes_au
+        {update_of} BEGIN
+            INSERT INTO {CHANGES_TABLE} (op, threat_id, country, indicator, indicator_type)
+            VALUES ('upsert', new.id, new.country, new.indicator, new.indicator_type);
+        END
+    """)
+
+def suspend_change_feed(conn):
+    # Bulk reloads (snapshots.restore) would log a tombstone and an upsert
+    # per row; they drop the triggers and call reset_change_feed afterwards
+    for name in ("threat_changes_ai", "threat_changes_ad", "threat_changes_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+def reset_change_feed(conn):
+    # New epoch, one upsert per current row, triggers back in place.
+    # Consumers get a 410 and resync from after=0.
+    ensure_change_feed(conn)
+    conn.execute(f"DELETE FROM {CHANGES_TABLE}")
+    conn.execute("DELETE FROM threat_changes_meta")
+    ensure_change_feed(conn)
+
+def feed_state(conn):
+    epoch, compacted_through = conn.execute(
+        "SELECT epoch, compacted_through FROM threat_changes_meta WHERE id = 1").fetchone()
+    last = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = ?", (CHANGES_TABLE,)).fetchone()
+    return {"epoch": epoch, "compacted_through": compacted_through, "last_seq": last[0] if last else 0}
+
+# --------------------------
+# Feed
+# --------------------------
+def read_changes(conn, after=0, limit=1000, epoch=None, country=None):
+    # Returns (state, rows, next_after). Upserts carry the row as it is now;
+    # one whose row is already gone is skipped, its tombstone follows.
+    state = feed_state(conn)
+    if epoch is not None and epoch != state["epoch"]:
+        raise ResyncRequired("Change feed epoch changed")
+    if after > state["last_seq"] or 0 < after < state["compacted_through"]:
+        raise ResyncRequired("Cursor is outside the retained change feed")
+    limit = max(1, min(limit, MAX_LIMIT))
+    where, params = "c.seq > ?", [after]
+    if country:
+        where += " AND c.country = ?"
+        params.append(country)
+    rows = conn.execute(f"""
+        SELECT {FEED_COLUMNS}, t.id IS NOT NULL AS live
+        FROM {CHANGES_TABLE} c LEFT JOIN {TABLE} t ON t.id = c.threat_id
+        WHERE {where}
+        ORDER BY c.seq
+        LIMIT ?
+    """, (*params, limit)).fetchall()
+    next_after = rows[-1]["seq"] if rows else after
+    if country and len(rows) < limit:
+        # Nothing more for this country up to the end of the feed
+        next_after = max(next_after, state["last_seq"])
+    changes = []
+    for row in rows:
+        record = dict(row)
+        live = record.pop("live")
+        if record["op"] == "delete":
+            changes.append({k: record[k] for k in
+                            ("seq", "op", "id", "country", "indicator", "indicator_type", "changed_at")})
+        elif live:
+            changes.append(record)
+    return state, changes, next_after
+
+# --------------------------
+# Compaction
+# --------------------------
+def compact_changes(conn, retention_days=RETENTION_DAYS, now=None):
+    # Superseded changes go at any age: a consumer still before them reads
+    # the newer change instead. Old tombstones go once past retention.
+    cutoff = ((now or datetime.utcnow()) - timedelta(days=retention_days)).isoformat()
+    with conn:
+        superseded = conn.execute(f"""
+            DELETE FROM {CHANGES_TABLE}
+            WHERE seq < (SELECT MAX(n.seq) FROM {CHANGES_TABLE} n
+                         WHERE n.threat_id = {CHANGES_TABLE}.threat_id)
+        """).rowcount
+        dropped = conn.execute(f"""
+            SELECT COUNT(*), MAX(seq) FROM {CHANGES_TABLE} WHERE op = 'delete' AND changed_at < ?
+        """, (cutoff,)).fetchone()
+        if dropped[0]:
+            conn.execute(f"DELETE FROM {CHANGES_TABLE} WHERE op = 'delete' AND changed_at < ?", (cutoff,))
+            conn.execute("""
+                UPDATE threat_changes_meta SET compacted_through = MAX(compacted_through, ?)
+                WHERE id = 1
+            """, (dropped[1],))
+    return {"superseded": superseded, "tombstones": dropped[0]}
@@ -0,0 +1,110 @@
+import os
+import json
+import sqlite3
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from indicators import register_functions
+
+# --------------------------
+# Export Config
+# --------------------------
+PARQUET_DIR = os.environ.get("PARQUET_DIR", os.path.join("exports", "parquet"))
+STATE_FILE = "_export_state.json"
+CHUNK_ROWS = 50000
+
+PARTITION_COLS = ["week", "indicator_type"]
+
+# Partition values are always read back as strings so that filters such as
+# ("week", ">=", "2024-01-01") compare ISO dates lexicographically.
+PARTITIONING = pa.schema([
+    ("week", pa.string()),
+    ("indicator_type", pa.string()),
+])
+
+EXPORT_COLUMNS = [
+    "id", "country", "ioc_text(indicator) AS indicator", "indicator_type", "pulse_name", "pulse_description",
+    "pulse_author", "pulse_created", "threat_score"
+]
+
+# --------------------------
+# Export State (watermark)
+# --------------------------
+def _state_path(out_dir):
+    return os.path.join(out_dir, STATE_FILE)
+
+def load_export_state(out_dir=PARQUET_DIR):
+    try:
+        with open(_state_path(out_dir)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"last_id": 0}
+
+def _save_export_state(out_dir, state):
+    path = _state_path(out_dir)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+# --------------------------
+# Frame Preparation
+# --------------------------
+def _prepare_chunk(df):
+    created = pd.to_datetime(df["pulse_created"], errors="coerce", format="ISO8601", utc=True)
+    week_start = (created.dt.tz_localize(None).dt.normalize()
+                  - pd.to_timedelta(created.dt.weekday, unit="D"))
+    df["week"] = week_start.dt.strftime("%Y-%m-%d").fillna("unknown")
+    df["indicator_type"] = df["indicator_type"].fillna("unknown")
+    df["threat_score"] = df["threat_score"].fillna(0).astype("int32")
+    return df
+
+# --------------------------
+# Incremental Parquet Export
+# --------------------------
+def export_threats(db_file, out_dir=PARQUET_DIR, full=False):
+    # Appends every row with an id above the stored watermark, partitioned as
+    # week=YYYY-MM-DD/indicator_type=<type>/part-<first id>-<n>.parquet
+    os.makedirs(out_dir, exist_ok=True)
+    state = {"last_id": 0} if full else load_export_state(out_dir)
+    if full:
+        _clear_partitions(out_dir)
+
+    conn = register_functions(sqlite3.connect(db_file))
+    exported = 0
+    try:
+        chunks = pd.read_sql_query(
+            f"SELECT {', '.join(EXPORT_COLUMNS)} FROM malaysia_targeted_threats "
+            "WHERE id > ? ORDER BY id",
+            conn, params=(state["last_id"],), chunksize=CHUNK_ROWS
+        )
+        for df in chunks:
+            if df.empty:
+                continue
+            df = _prepare_chunk(df)
+            first_id = int(df["id"].iloc[0])
+            pq.write_to_dataset(
+                pa.Table.from_pandas(df, preserve_index=False),
+                root_path=out_dir,
+                partition_cols=PARTITION_COLS,
+                basename_template=f"part-{first_id}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore"
+            )
+            state["last_id"] = int(df["id"].iloc[-1])
+            exported += len(df)
+            # Watermark advances per chunk so an interrupted export resumes
+            # without rewriting what already landed on disk.
+            _save_export_state(out_dir, state)
+    finally:
+        conn.close()
+
+    _save_export_state(out_dir, state)
+    return exported
+
+def _clear_partitions(out_dir):
+    for root, dirs, files in os.walk(out_dir, topdown=False):
+        for name in files:
+            if name.endswith(".parquet") or name == STATE_FILE:
+                os.remove(os.path.join(root, name))
+        if root != out_dir and not os.listdir(root):
+            os.rmdir(root)
@@ -0,0 +1,39 @@
+import os
+
+# --------------------------
+# Country Config
+# --------------------------
+# Every stored threat row belongs to one target country (ISO 3166 alpha-2).
+# The scoring profiles in scoring_rules.json decide which countries a pulse
+# is stored for; DEFAULT_COUNTRY is what pages, reports and the CLI show
+# when no ?country= is given.
+DEFAULT_COUNTRY = os.environ.get("DEFAULT_COUNTRY", "MY").upper()
+
+COUNTRY_NAMES = {
+    "BN": "Brunei",
+    "KH": "Cambodia",
+    "ID": "Indonesia",
+    "LA": "Laos",
+    "MY": "Malaysia",
+    "MM": "Myanmar",
+    "PH": "Philippines",
+    "SG": "Singapore",
+    "TH": "Thailand",
+    "TL": "Timor-Leste",
+    "VN": "Vietnam",
+}
+
+class InvalidCountry(ValueError):
+    pass
+
+def parse_country(value):
+    # "my" -> "MY"; empty -> DEFAULT_COUNTRY
+    if not value:
+        return DEFAULT_COUNTRY
+    code = str(value).strip().upper()
+    if len(code) != 2 or not code.isalpha():
+        raise InvalidCountry(f"Invalid country code: {value}")
+    return code
+
+def country_name(code):
+    return COUNTRY_NAMES.get(code, code)
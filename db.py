@@ -0,0 +1,233 @@
+import os
+import sqlite3
+import snapshots
+from search import ensure_search_index, rebuild_search_index
+from domains import backfill_rkeys
+from indicators import register_functions, migrate_indicator_storage
+from rollups import GEO_COLUMNS, ensure_rollups, rebuild_rollups, backfill_locations
+from lifecycle import rollup_tables, archive_exists, ensure_archive
+from changes import ensure_change_feed
+
+# --------------------------
+# Database Config
+# --------------------------
+DATABASE_FILE = os.environ.get("DATABASE_FILE", "threat_intel.db")
+
+# Page cache per connection; sized to hold the hot (unarchived) table
+CACHE_MB = int(os.environ.get("SQLITE_CACHE_MB", "64"))
+
+# Bumped whenever init_db() gains a one-off data migration
+SCHEMA_VERSION = 2
+
+# Threat rows are stored once per (country, indicator): a pulse scored for
+# several country profiles gets one row for each. Rows from before country
+# profiles were all scored for Malaysia, hence the 'MY' default. The table
+# keeps its historical name; snapshots, the archive and FTS all refer to it.
+THREAT_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        country TEXT NOT NULL DEFAULT 'MY',
+        indicator BLOB,
+        indicator_type TEXT,
+        pulse_name TEXT,
+        pulse_description TEXT,
+        pulse_author TEXT,
+        pulse_created TEXT,
+        threat_score INTEGER,
+        domain_rkey TEXT,
+        geo_country TEXT,
+        geo_region TEXT,
+        geo_city TEXT,
+        geo_asn INTEGER,
+        geo_isp TEXT,
+        last_seen TEXT,
+        UNIQUE (country, indicator)
+    )
+"""
+
+# --------------------------
+# Database Setup
+# --------------------------
+def init_db():
+    # Workers started together queue behind whichever one is restoring
+    conn = sqlite3.connect(DATABASE_FILE, timeout=snapshots.RESTORE_TIMEOUT)
+    # indicator holds TEXT for domains/URLs and tagged BLOBs for IPs and
+    # hashes (see indicators.py); the declared type has no affinity effect.
+    conn.execute(THREAT_TABLE_DDL.format(table="malaysia_targeted_threats"))
+    added_rkey = ensure_column(conn, "malaysia_targeted_threats", "domain_rkey", "TEXT")
+    added_geo = [
+        column for column, decl in GEO_COLUMNS.items()
+        if ensure_column(conn, "malaysia_targeted_threats", column, decl)
+    ]
+    ensure_column(conn, "malaysia_targeted_threats", "last_seen", "TEXT")
+    migrate_country(conn)
+    create_indexes(conn)
+    ensure_search_index(conn)
+    ensure_change_feed(conn)
+    ensure_dataset_meta(conn)
+    new_rollups = ensure_rollups(conn)
+    conn.commit()
+    if archive_exists():
+        ensure_archive(conn)
+    empty = conn.execute("SELECT 1 FROM malaysia_targeted_threats LIMIT 1").fetchone() is None
+    conn.close()
+    # Fresh checkouts carry only the compressed snapshots, not the DB itself
+    restored = snapshots.restore(DATABASE_FILE, only_if_empty=True) if empty else 0
+    conn = sqlite3.connect(DATABASE_FILE, timeout=snapshots.RESTORE_TIMEOUT)
+    # WAL lets dashboard reads proceed while ingest/backfill jobs write
+    conn.execute("PRAGMA journal_mode = WAL")
+    # Rows written (or snapshotted) before the column existed have no key yet
+    if added_rkey or restored:
+        backfill_rkeys(conn)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < 1 or restored:
+        migrate_indicator_storage(conn)
+    if version < SCHEMA_VERSION:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    # Stored IPs predate the ASN columns and the "asn" rollup
+    backfill_asn = "geo_asn" in added_geo and not empty
+    if backfill_asn:
+        register_functions(conn)
+        backfill_locations(conn)
+    if new_rollups or restored or backfill_asn:
+        rebuild_rollups(conn, rollup_tables(conn))
+        conn.commit()
+    if restored:
+        bump_dataset_version(conn)
+        conn.commit()
+    conn.close()
+
+def ensure_column(conn, table, column, decl):
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+    if column in cols:
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
+def migrate_country(conn):
+    # Moving UNIQUE (indicator) to UNIQUE (country, indicator) needs a table
+    # rebuild in SQLite. Ids are copied as they are, so the FTS index
+    # (content_rowid = id), snapshot digests and archived ids stay valid.
+    if "country" in [r[1] for r in conn.execute("PRAGMA table_info(malaysia_targeted_threats)")]:
+        return False
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    seq = conn.execute(
+        "SELECT seq FROM sqlite_sequence WHERE name = 'malaysia_targeted_threats'").fetchone()
+    conn.execute("DROP TABLE IF EXISTS threats_rebuild")
+    conn.execute(THREAT_TABLE_DDL.format(table="threats_rebuild"))
+    cols = ", ".join(r[1] for r in conn.execute("PRAGMA table_info(malaysia_targeted_threats)"))
+    conn.execute(f"INSERT INTO threats_rebuild ({cols}) SELECT {cols} FROM malaysia_targeted_threats")
+    # Drops the old indexes and FTS triggers too; init_db() recreates them
+    conn.execute("DROP TABLE malaysia_targeted_threats")
+    conn.execute("ALTER TABLE threats_rebuild RENAME TO malaysia_targeted_threats")
+    if seq:
+        # Archived rows took ids above MAX(id); new rows must not reuse them
+        conn.execute("""
+            UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'malaysia_targeted_threats'
+        """, (seq[0],))
+    conn.commit()
+    return True
+
+def create_indexes(conn):
+    # Every query surface is per country, so country leads each index and a
+    # country's slice is scanned exactly like the whole table used to be.
+    # Dashboard ordering and the weekly report window. Columns are ascending
+    # so the grid's keyset seek on (threat_score, pulse_created, id) is one
+    # index range either way; the dashboard's DESC order scans it backwards.
+    old = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_threats_score'").fetchone()
+    if old and "DESC" in old[0]:
+        conn.execute("DROP INDEX idx_threats_score")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_threats_score
+        ON malaysia_targeted_threats (country, threat_score, pulse_created)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_threats_created
+        ON malaysia_targeted_threats (country, pulse_created)
+    """)
+    # Id (arrival) order within a country: the rowid rides along in the index
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_threats_country
+        ON malaysia_targeted_threats (country)
+    """)
+    # Zone / subdomain range scans over reversed domain keys
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_threats_rkey
+        ON malaysia_targeted_threats (country, domain_rkey)
+        WHERE domain_rkey IS NOT NULL
+    """)
+    # Groups the rows of one pulse back together for re-scoring
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_threats_pulse
+        ON malaysia_targeted_threats (pulse_created, pulse_name)
+    """)
+    # Expiry scans per indicator type (see lifecycle.py)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_threats_expiry
+        ON malaysia_targeted_threats (indicator_type, COALESCE(last_seen, pulse_created))
+    """)
+
+# --------------------------
+# Dataset Version
+# --------------------------
+# A counter bumped in the same transaction as any job that changes threat
+# rows, so page/API caches can tell when their rendered output is stale.
+def ensure_dataset_meta(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS dataset_meta (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO dataset_meta (id, version) VALUES (1, 0)")
+
+def bump_dataset_version(conn):
+    conn.execute("UPDATE dataset_meta SET version = version + 1 WHERE id = 1")
+
+def get_dataset_version(conn=None):
+    if conn is not None:
+        return conn.execute("SELECT version FROM dataset_meta WHERE id = 1").fetchone()[0]
+    conn = sqlite3.connect(DATABASE_FILE)
+    try:
+        return get_dataset_version(conn)
+    finally:
+        conn.close()
+
+def get_db_connection():
+    conn = sqlite3.connect(DATABASE_FILE)
+    conn.execute(f"PRAGMA cache_size = -{CACHE_MB * 1024}")
+    conn.row_factory = sqlite3.Row
+    register_functions(conn)
+    return conn
+
+# --------------------------
+# Index Maintenance
+# --------------------------
+def rebuild_indexes(from_snapshots=False):
+    if from_snapshots:
+        snapshots.restore(DATABASE_FILE)
+    conn = sqlite3.connect(DATABASE_FILE)
+    try:
+        create_indexes(conn)
+        ensure_search_index(conn)
+        ensure_change_feed(conn)
+        ensure_dataset_meta(conn)
+        ensure_rollups(conn)
+        if archive_exists():
+            ensure_archive(conn)
+        rebuild_search_index(conn)
+        backfill_rkeys(conn, rebuild=True)
+        migrate_indicator_storage(conn)
+        register_functions(conn)
+        backfill_locations(conn)
+        rebuild_rollups(conn, rollup_tables(conn))
+        conn.execute("REINDEX")
+        conn.execute("ANALYZE")
+        bump_dataset_version(conn)
+        conn.commit()
+        # Returns the pages freed by binary indicators / dropped rows
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
@@ -0,0 +1,103 @@
+from lifecycle import threat_source
+
+# --------------------------
+# Reversed Domain Keys
+# --------------------------
+# "agency.gov.my" is stored as "my.gov.agency." so every name under a zone
+# shares a string prefix and zone queries become index range scans. The
+# trailing dot keeps "gov.my" from matching "govx.my".
+
+DOMAIN_TYPES = ("domain", "hostname")
+
+def normalize_domain(name):
+    name = (name or "").strip().lower().strip(".")
+    if name.startswith("*."):
+        name = name[2:]
+    try:
+        name = name.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+    return name
+
+def reverse_domain(name):
+    name = normalize_domain(name)
+    if not name:
+        return None
+    return ".".join(reversed(name.split("."))) + "."
+
+def indicator_rkey(indicator, indicator_type):
+    if indicator_type not in DOMAIN_TYPES:
+        return None
+    return reverse_domain(indicator)
+
+def zone_range(zone):
+    # [lo, hi) bounds covering the zone itself and everything below it;
+    # "/" is the character right after "." so hi closes the prefix range.
+    lo = reverse_domain(zone)
+    if lo is None:
+        raise ValueError("Empty zone")
+    return lo, lo[:-1] + "/"
+
+# --------------------------
+# Zone Queries
+# --------------------------
+def zone_threats(conn, zone, country, since=None, after_id=0, limit=100, include_archived=False):
+    lo, hi = zone_range(zone)
+    # +id: walk the zone's rkey range, not the whole country via idx_threats_country
+    sql = f"""
+        SELECT id, indicator, indicator_type, pulse_name, pulse_author,
+               pulse_created, threat_score
+        FROM {threat_source(conn, include_archived)}
+        WHERE country = ? AND domain_rkey >= ? AND domain_rkey < ? AND +id > ?
+    """
+    params = [country, lo, hi, after_id]
+    if since:
+        sql += " AND pulse_created >= ?"
+        params.append(since)
+    sql += " ORDER BY id LIMIT ?"
+    params.append(limit)
+    return [dict(r) for r in conn.execute(sql, params).fetchall()]
+
+def zone_counts(conn, zone, country, since=None, include_archived=False):
+    # Indicator counts per label directly under the zone, e.g. gov.my ->
+    # {"moh": 12, "mof": 3, "": 1}, where "" is the zone apex itself.
+    lo, hi = zone_range(zone)
+    start = len(lo) + 1
+    sql = f"""
+        SELECT CASE WHEN length(domain_rkey) = {len(lo)} THEN ''
+                    ELSE substr(domain_rkey, {start}, instr(substr(domain_rkey, {start}), '.') - 1)
+               END AS child,
+               COUNT(*) AS cnt
+        FROM {threat_source(conn, include_archived)}
+        WHERE country = ? AND domain_rkey >= ? AND domain_rkey < ?
+    """
+    params = [country, lo, hi]
+    if since:
+        sql += " AND pulse_created >= ?"
+        params.append(since)
+    sql += " GROUP BY child ORDER BY cnt DESC"
+    return {row[0]: row[1] for row in conn.execute(sql, params).fetchall()}
+
+# --------------------------
+# Backfill
+# --------------------------
+def backfill_rkeys(conn, batch_rows=5000, rebuild=False):
+    if rebuild:
+        conn.execute("UPDATE malaysia_targeted_threats SET domain_rkey = NULL")
+    placeholders = ", ".join("?" * len(DOMAIN_TYPES))
+    last_id = 0
+    # + keeps this an id-ordered scan instead of an index scan + sort
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, indicator, indicator_type FROM malaysia_targeted_threats
+            WHERE id > ? AND domain_rkey IS NULL AND +indicator_type IN ({placeholders})
+            ORDER BY id LIMIT ?
+        """, (last_id, *DOMAIN_TYPES, batch_rows)).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            "UPDATE malaysia_targeted_threats SET domain_rkey = ? WHERE id = ?",
+            [(indicator_rkey(ind, t), row_id) for row_id, ind, t in rows]
+        )
+        conn.commit()
+        last_id = rows[-1][0]
@@ -0,0 +1,198 @@
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from indicators import THREAT_COLUMNS
+from changes import CHANGES_TABLE
+
+# --------------------------
+# Stream Config
+# --------------------------
+RING_SIZE = int(os.environ.get("STREAM_RING_SIZE", "1000"))   # events kept for resume
+EVENT_ROWS = 500            # rows per "threats" event
+WATCH_SECONDS = 1.0         # dataset_meta poll for writes from other processes
+
+# --------------------------
+# In-process Pub/Sub
+# --------------------------
+# Events live in a ring buffer with a sequence number. Event ids are
+# "<epoch>-<seq>"; the epoch changes per process, so an id from another
+# worker or from before a restart resolves to a "reset" instead of a gap.
+
+class EventBus:
+    def __init__(self, size=RING_SIZE):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._events = deque(maxlen=size)
+        self._seq = 0
+        self._cond = threading.Condition()
+        self.listeners = 0
+        self.high_water_id = 0      # highest threat id already published
+        self.change_seq = 0         # threat_changes seq already published
+        self.version = None         # dataset version those events cover
+
+    def publish(self, name, data):
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, name, data))
+            self._cond.notify_all()
+            return self._seq
+
+    def add_listener(self):
+        with self._cond:
+            self.listeners += 1
+
+    def remove_listener(self):
+        with self._cond:
+            self.listeners -= 1
+
+    def position(self, event_id):
+        # Sequence to resume after, or None when the id cannot be resumed
+        with self._cond:
+            if not event_id:
+                return self._seq
+            epoch, _, seq = event_id.partition("-")
+            if epoch != self.epoch or not seq.isdigit():
+                return None
+            seq = int(seq)
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            if seq > self._seq or seq < oldest - 1:
+                return None
+            return seq
+
+    def wait(self, after_seq, timeout):
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > after_seq, timeout)
+            return [e for e in self._events if e[0] > after_seq]
+
+    def event_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+bus = EventBus()
+
+# --------------------------
+# Publishing
+# --------------------------
+# One publisher at a time, so the in-process writer and the watcher never
+# both send the same rows.
+_publish_lock = threading.Lock()
+
+def _last_change_seq(conn):
+    row = conn.execute(f"SELECT seq FROM sqlite_sequence WHERE name = '{CHANGES_TABLE}'").fetchone()
+    return row[0] if row else 0
+
+def _publish_rows(conn, name, ids):
+    published = 0
+    for i in range(0, len(ids), EVENT_ROWS):
+        chunk = ids[i:i + EVENT_ROWS]
+        rows = conn.execute(f"""
+            SELECT {THREAT_COLUMNS} FROM malaysia_targeted_threats
+            WHERE id IN ({", ".join("?" * len(chunk))}) ORDER BY id
+        """, chunk).fetchall()
+        if rows:
+            bus.publish(name, [dict(r) for r in rows])
+            published += len(rows)
+    return published
+
+def _publish_since_high_water(conn, version):
+    # Walks threat_changes past the last published seq. Ids above the
+    # high-water mark are new rows ("threats"); earlier ids were rescored or
+    # re-located ("updates", current row); deletes are expiries ("deletes",
+    # id + country). Each id goes out once, in its latest state.
+    last = _last_change_seq(conn)
+    if last < bus.change_seq:
+        # The feed was reset (snapshot restore): clients reload everything
+        bus.change_seq, bus.version = last, version
+        bus.high_water_id = conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM malaysia_targeted_threats").fetchone()[0]
+        bus.publish("refresh", {"version": version})
+        return 1
+    new, updated, deleted = {}, {}, {}
+    for op, threat_id, country in conn.execute(f"""
+        SELECT op, threat_id, country FROM {CHANGES_TABLE}
+        WHERE seq > ? AND seq <= ? ORDER BY seq
+    """, (bus.change_seq, last)):
+        if op == "delete":
+            new.pop(threat_id, None)
+            updated.pop(threat_id, None)
+            deleted[threat_id] = country
+        elif threat_id > bus.high_water_id:
+            new[threat_id] = True
+        else:
+            updated[threat_id] = True
+    published = _publish_rows(conn, "threats", sorted(new))
+    published += _publish_rows(conn, "updates", sorted(updated))
+    gone = [{"id": i, "country": c} for i, c in sorted(deleted.items())]
+    for i in range(0, len(gone), EVENT_ROWS):
+        bus.publish("deletes", gone[i:i + EVENT_ROWS])
+    published += len(gone)
+    if new:
+        bus.high_water_id = max(bus.high_water_id, max(new))
+    bus.change_seq = last
+    bus.version = version
+    return published
+
+def publish_new_threats(conn, version):
+    # Called by the ingest writer right after its commit on `conn`. With
+    # nobody listening there is nothing to fan out; the watcher moves the
+    # high-water mark forward instead.
+    if not bus.listeners:
+        return 0
+    with _publish_lock:
+        return _publish_since_high_water(conn, version)
+
+# --------------------------
+# Dataset Watcher
+# --------------------------
+# Ingests from the CLI or the scheduled workflow run in other processes.
+# The watcher notices their dataset_meta bump and publishes what changed
+# itself: new rows, rescored rows and expiries. A bump with nothing in the
+# change feed still becomes a "refresh" event.
+_watcher = None
+_watcher_lock = threading.Lock()
+
+def ensure_watcher(get_connection, get_version):
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            return
+        _skip_to_end(get_connection, get_version())
+        _watcher = threading.Thread(
+            target=_watch, args=(get_connection, get_version), name="dataset-watcher", daemon=True)
+        _watcher.start()
+
+def _skip_to_end(get_connection, version):
+    conn = get_connection()
+    try:
+        with _publish_lock:
+            bus.high_water_id = conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM malaysia_targeted_threats").fetchone()[0]
+            bus.change_seq = _last_change_seq(conn)
+            bus.version = version
+    finally:
+        conn.close()
+
+def _catch_up(get_connection, version):
+    conn = get_connection()
+    try:
+        with _publish_lock:
+            if version == bus.version:
+                return
+            if not _publish_since_high_water(conn, version):
+                bus.publish("refresh", {"version": version})
+    finally:
+        conn.close()
+
+def _watch(get_connection, get_version):
+    while True:
+        time.sleep(WATCH_SECONDS)
+        try:
+            version = get_version()
+            if version == bus.version:
+                continue
+            if bus.listeners:
+                _catch_up(get_connection, version)
+            else:
+                _skip_to_end(get_connection, version)
+        except Exception as e:
+            print("Stream Watcher Error:", e)
@@ -1,4 +1,88 @@
-# Dummy generate_ioc.py - outputs static dummy data
-with open('exports/csv/iocs.csv','w') as f:
-    f.write('ip,country,asn,isp,score,sources\n')
-    f.write('1.2.3.4,MY,12345,DummyISP,50,Talos\n')
\ No newline at end of file
+import os
+import csv
+import argparse
+from collections import defaultdict
+
+# --------------------------
+# IOC Export Config
+# --------------------------
+# One row per IP: stored OTX threats plus the plain-text feeds/ lists,
+# with GeoIP country and ASN/ISP filled in from the local MMDB files.
+OUTPUT_FILE = os.path.join("exports", "csv", "iocs.csv")
+FEEDS_DIR = "feeds"
+OTX_SOURCE = "OTX"
+
+FIELDS = ["ip", "country", "asn", "isp", "score", "sources"]
+
+def _stored_ips(conn):
+    from indicators import IP_TYPES
+    placeholders = ", ".join("?" * len(IP_TYPES))
+    return conn.execute(f"""
+        SELECT ioc_text(indicator), geo_country, geo_asn, geo_isp, threat_score
+        FROM malaysia_targeted_threats
+        WHERE indicator_type IN ({placeholders})
+    """, tuple(IP_TYPES))
+
+def feed_ips(feeds_dir=FEEDS_DIR):
+    if not os.path.isdir(feeds_dir):
+        return
+    for name in sorted(os.listdir(feeds_dir)):
+        if not name.endswith(".txt"):
+            continue
+        source = name[:-4].title()
+        with open(os.path.join(feeds_dir, name)) as f:
+            for line in f:
+                ip = line.split("#", 1)[0].strip()
+                if ip:
+                    yield ip, source
+
+def build_iocs(conn, feeds_dir=FEEDS_DIR):
+    from geo import lookup_networks
+    iocs = {}
+    sources = defaultdict(set)
+    for ip, country, asn, isp, score in _stored_ips(conn):
+        # An IP stored for several target countries keeps its highest score
+        if ip not in iocs or (score or 0) > (iocs[ip][3] or 0):
+            iocs[ip] = [country, asn, isp, score]
+        sources[ip].add(OTX_SOURCE)
+    for ip, source in feed_ips(feeds_dir):
+        iocs.setdefault(ip, [None, None, None, 0])
+        sources[ip].add(source)
+
+    # Feed IPs and rows stored before the ASN columns: one batched lookup
+    missing = [ip for ip, row in iocs.items() if row[1] is None]
+    for ip, (country, _, _, asn, isp) in lookup_networks(missing).items():
+        row = iocs[ip]
+        row[0] = row[0] or country
+        row[1], row[2] = asn, isp
+
+    for ip in sorted(iocs):
+        country, asn, isp, score = iocs[ip]
+        yield [ip, country or "", asn or "", isp or "", score or 0, ";".join(sorted(sources[ip]))]
+
+def write_iocs(path=OUTPUT_FILE, feeds_dir=FEEDS_DIR):
+    from db import init_db, get_db_connection
+    init_db()
+    conn = get_db_connection()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    count = 0
+    try:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            for row in build_iocs(conn, feeds_dir):
+                writer.writerow(row)
+                count += 1
+    finally:
+        conn.close()
+    return count
+
+# --------------------------
+# Run Export
+# --------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the enriched IP IOC list")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--feeds", default=FEEDS_DIR)
+    args = parser.parse_args()
+    print(f"Wrote {write_iocs(args.output, args.feeds)} IOCs to {args.output}")
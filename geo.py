@@ -0,0 +1,145 @@
+import os
+import socket
+import threading
+from geo_reload import ReloadingReader
+
+# --------------------------
+# GeoIP Config
+# --------------------------
+MAXMIND_DB = os.environ.get("MAXMIND_DB", "GeoLite2-Country.mmdb")
+MAXMIND_ASN_DB = os.environ.get("MAXMIND_ASN_DB", "GeoLite2-ASN.mmdb")
+MAXMIND_CITY_DB = os.environ.get("MAXMIND_CITY_DB", "GeoLite2-City.mmdb")
+
+IP_TYPES = ("IPv4", "IPv6")
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+def _open(path):
+    import maxminddb
+    return maxminddb.open_database(path)
+
+def _reader(path):
+    # Missing MMDB files are normal in dev; lookups then return nothing
+    # until the file appears. A replaced file is picked up without restart.
+    managed = _readers.get(path)
+    if managed is None:
+        with _readers_lock:
+            managed = _readers.get(path)
+            if managed is None:
+                managed = _readers[path] = ReloadingReader(path, _open, on_swap=_invalidate)
+    return managed.get()
+
+# --------------------------
+# Batch Lookups
+# --------------------------
+# A batch is deduplicated and walked in address order through the City (or
+# Country) and ASN databases together. Consecutive IPs inside the network
+# of the previous hit reuse its record without another lookup, and results
+# are cached per process so scoring, ingest and backfills share them.
+CACHE_SIZE = int(os.environ.get("GEO_CACHE_SIZE", "500000"))
+
+NO_LOCATION = (None, None, None)
+NO_ASN = (None, None)
+NO_NETWORK = NO_LOCATION + NO_ASN
+
+_cache = {}
+
+def _invalidate(managed):
+    # A fresh dict rather than clear(): lookups still running against the
+    # old reader finish into the old one.
+    global _cache
+    _cache = {}
+
+def _english_name(rec):
+    return ((rec or {}).get("names") or {}).get("en")
+
+def _location(rec):
+    subdivisions = rec.get("subdivisions") or [None]
+    return (
+        (rec.get("country") or {}).get("iso_code"),
+        _english_name(subdivisions[0]),
+        _english_name(rec.get("city")),
+    )
+
+def _asn(rec):
+    return rec.get("autonomous_system_number"), rec.get("autonomous_system_organization")
+
+def _address(ip):
+    # (address bits, integer value); None for anything that is not an IP
+    try:
+        packed = socket.inet_pton(socket.AF_INET6 if ":" in ip else socket.AF_INET, ip)
+    except (OSError, TypeError):
+        return None
+    return len(packed) * 8, int.from_bytes(packed, "big")
+
+def _walk(reader, addresses, parse, empty):
+    # addresses: sorted (bits, value, ip). One reader.get per network hit.
+    result = {}
+    bits, end, value = None, -1, empty
+    for ip_bits, n, ip in addresses:
+        if ip_bits != bits or n >= end:
+            try:
+                rec, prefix_len = reader.get_with_prefix_len(ip)
+            except ValueError:
+                continue
+            shift = ip_bits - prefix_len
+            bits, end = ip_bits, ((n >> shift) + 1) << shift
+            value = parse(rec) if rec else empty
+        if value != empty:
+            result[ip] = value
+    return result
+
+def lookup_networks(ips):
+    # (country ISO code, state/region, city, ASN, ISP) per IP. Without the
+    # City database only the country comes back, from the Country database.
+    cache = _cache      # taken first, so results from a swapped-out reader land in the dropped cache
+    location_reader = _reader(MAXMIND_CITY_DB) or _reader(MAXMIND_DB)
+    asn_reader = _reader(MAXMIND_ASN_DB)
+    if location_reader is None and asn_reader is None:
+        return {}
+    found = {}
+    missing = []
+    for ip in set(ips):
+        hit = cache.get(ip)
+        if hit is None:
+            missing.append(ip)
+        elif hit != NO_NETWORK:
+            found[ip] = hit
+    if not missing:
+        return found
+
+    addresses = sorted(
+        (addr[0], addr[1], ip) for ip in missing for addr in (_address(ip),) if addr
+    )
+    locations = _walk(location_reader, addresses, _location, NO_LOCATION) if location_reader else {}
+    asns = _walk(asn_reader, addresses, _asn, NO_ASN) if asn_reader else {}
+
+    if len(cache) + len(missing) > CACHE_SIZE:
+        cache.clear()
+    for ip in missing:
+        net = locations.get(ip, NO_LOCATION) + asns.get(ip, NO_ASN)
+        if net != NO_NETWORK:
+            found[ip] = net
+        if len(cache) < CACHE_SIZE:
+            cache[ip] = net
+    return found
+
+def lookup_countries(ips):
+    return {ip: net[0] for ip, net in lookup_networks(ips).items() if net[0]}
+
+def lookup_asns(ips):
+    return {ip: net[3] for ip, net in lookup_networks(ips).items() if net[3]}
+
+def locate_domains(names):
+    # {name: [network, ...]} for domains whose A/AAAA records geolocate,
+    # in address order; see resolver.py for the DNS side.
+    from resolver import resolve_domains
+    resolved = resolve_domains(names)
+    networks = lookup_networks([ip for ips in resolved.values() for ip in ips])
+    located = {}
+    for name, ips in resolved.items():
+        nets = [networks[ip] for ip in sorted(ips) if ip in networks]
+        if nets:
+            located[name] = nets
+    return located
@@ -0,0 +1,314 @@
+import re
+import threading
+from collections import OrderedDict
+from indicators import HASH_TYPES, TAG_IPV4
+
+# --------------------------
+# Grid Config
+# --------------------------
+MAX_WINDOW = 500
+COUNT_CACHE_SIZE = 256
+
+GRID_COLUMNS = [
+    "id", "indicator", "indicator_type", "pulse_name", "pulse_author",
+    "pulse_created", "threat_score"
+]
+
+# Only orders an index can deliver directly; the window query never sorts.
+# Rows are ordered by the key columns and then id, all in one direction, so a
+# page resumes after a known row with a row-value comparison on the index
+# instead of an OFFSET that rescans every row before it.
+#   name -> key columns (id is always the last key)
+SORTS = {
+    "score": ("threat_score", "pulse_created"),  # idx_threats_score
+    "created": ("pulse_created",),               # idx_threats_created
+    "id": (),                                    # idx_threats_country
+    "indicator": ("indicator",),                 # UNIQUE (country, indicator)
+}
+
+# Keys of every ANCHOR_ROWS-th row are cached per dataset version, so a jump
+# to any offset seeks to the nearest anchor and skips fewer rows than this
+ANCHOR_ROWS = 1000
+ANCHOR_CACHE_SIZE = 64
+
+# --------------------------
+# Prefix Ranges
+# --------------------------
+# A prefix becomes half-open [lo, hi) ranges over the UNIQUE (country,
+# indicator) index.
+# Text indicators take one text range. IPv4 and hash prefixes are also mapped
+# onto their tagged BLOB encoding, e.g. "10.1." -> [x'040a01', x'040a02')
+# and "10.1" -> 10.1.*, 10.10-19.*, 10.100-199.*.
+
+_IPV4_PREFIX = re.compile(r"^\d{1,3}(\.\d{1,3}){0,3}\.?$")
+_HEX_PREFIX = re.compile(r"^[0-9a-fA-F]+$")
+
+def _next_text(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def _next_bytes(prefix):
+    # Smallest byte string greater than every string starting with prefix
+    b = bytearray(prefix)
+    while b and b[-1] == 0xFF:
+        b.pop()
+    if not b:
+        return None
+    b[-1] += 1
+    return bytes(b)
+
+def _octet_runs(partial):
+    # Contiguous runs of octet values whose decimal form starts with partial
+    runs = []
+    for v in range(256):
+        if str(v).startswith(partial):
+            if runs and runs[-1][1] == v - 1:
+                runs[-1][1] = v
+            else:
+                runs.append([v, v])
+    return runs
+
+def _ipv4_ranges(prefix):
+    parts = prefix.split(".")
+    if prefix.endswith("."):
+        parts = parts[:-1]
+        complete, partial = parts, None
+    else:
+        complete, partial = parts[:-1], parts[-1]
+    if any(int(p) > 255 for p in complete) or len(complete) > 4:
+        return []
+    base = bytes([TAG_IPV4] + [int(p) for p in complete])
+    if partial is None:
+        return [(base, _next_bytes(base))]
+    if len(complete) == 4:
+        return []
+    ranges = []
+    for lo, hi in _octet_runs(partial):
+        start = base + bytes([lo])
+        end = base + bytes([hi + 1]) if hi < 255 else _next_bytes(base)
+        ranges.append((start, end))
+    return ranges
+
+def _hash_ranges(prefix):
+    prefix = prefix.lower()
+    whole = bytes.fromhex(prefix[:len(prefix) // 2 * 2])
+    ranges = []
+    for tag, size in HASH_TYPES.values():
+        if len(prefix) > size * 2:
+            continue
+        base = bytes([tag]) + whole
+        if len(prefix) % 2:
+            nibble = int(prefix[-1], 16)
+            start = base + bytes([nibble << 4])
+            end = base + bytes([(nibble + 1) << 4]) if nibble < 15 else _next_bytes(base)
+            ranges.append((start, end))
+        else:
+            ranges.append((base, _next_bytes(base)))
+    return ranges
+
+def prefix_ranges(prefix):
+    # Ranges in index order: TEXT sorts before BLOB in SQLite
+    if not prefix:
+        return []
+    ranges = [(prefix, _next_text(prefix))]
+    if _IPV4_PREFIX.match(prefix):
+        ranges += _ipv4_ranges(prefix)
+    if _HEX_PREFIX.match(prefix):
+        ranges += _hash_ranges(prefix)
+    text = [r for r in ranges if isinstance(r[0], str)]
+    blobs = sorted(r for r in ranges if isinstance(r[0], bytes))
+    return text + blobs
+
+# --------------------------
+# Counts (cached per dataset version)
+# --------------------------
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+def _cached_count(version, key, compute):
+    cache_key = (version, key)
+    with _counts_lock:
+        if cache_key in _counts:
+            _counts.move_to_end(cache_key)
+            return _counts[cache_key]
+    value = compute()
+    with _counts_lock:
+        _counts[cache_key] = value
+        while len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return value
+
+def _segment_count(conn, version, segment):
+    key, where, params, _ = segment
+    return _cached_count(version, key, lambda: conn.execute(
+        f"SELECT COUNT(*) FROM malaysia_targeted_threats WHERE {where}", params
+    ).fetchone()[0])
+
+def _range_where(hi):
+    if hi is None:
+        return "country = ? AND indicator >= ?"
+    return "country = ? AND indicator >= ? AND indicator < ?"
+
+# --------------------------
+# Segments
+# --------------------------
+# A window walks one or more disjoint segments of a country's slice:
+#   (cache key, WHERE, params, key columns ending in id)
+
+def _sort_segments(country, sort):
+    # Rows with every key set, then the rare rows missing one in id order: a
+    # row value holding NULL never compares true, so it can't be a keyset.
+    # "+id" keeps the planner on the sort's own index for those few rows
+    # rather than walking the whole country in id order to find them.
+    columns = SORTS[sort]
+    if not columns:
+        return [(("sorted", country, sort), "country = ?", (country,), ("id",))]
+    keyed = " AND ".join(f"{c} IS NOT NULL" for c in columns)
+    unkeyed = " OR ".join(f"{c} IS NULL" for c in columns)
+    return [
+        (("sorted", country, sort), f"country = ? AND {keyed}", (country,), (*columns, "id")),
+        (("unkeyed", country, sort), f"country = ? AND ({unkeyed})", (country,), ("+id",)),
+    ]
+
+def _range_segments(country, ranges):
+    return [
+        (("range", country, lo, hi), _range_where(hi),
+         (country, lo) if hi is None else (country, lo, hi), ("indicator", "id"))
+        for lo, hi in ranges
+    ]
+
+# --------------------------
+# Keyset Seek
+# --------------------------
+_anchors = OrderedDict()
+_anchors_lock = threading.Lock()
+
+def _select(conn, where, params, keys, descending, skip, limit):
+    columns = ", ".join(keys)
+    order_by = ", ".join(f"{k} DESC" if descending else k for k in keys)
+    return [tuple(r) for r in conn.execute(f"""
+        SELECT {columns} FROM malaysia_targeted_threats
+        WHERE {where}
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+    """, (*params, limit, skip))]
+
+def _seek(conn, segment, descending, after, skip, limit):
+    # Key tuples of up to `limit` rows in key order, starting `skip` rows
+    # past the row whose keys are `after` (None: from the segment's start).
+    # SQLite won't range-seek a row value through the rowid, so the rest of
+    # after's tie group (equal keys, further id) is read first by an id
+    # range, then the rows past it by a row-value range on the other keys.
+    _, where, params, keys = segment
+    if after is None:
+        return _select(conn, where, params, keys, descending, skip, limit)
+    *ties, row_id = keys
+    cmp = "<" if descending else ">"
+    tie_where = " AND ".join([where, *(f"{k} = ?" for k in ties), f"{row_id} {cmp} ?"])
+    tie_params = (*params, *after)
+    rows = _select(conn, tie_where, tie_params, keys, descending, skip, limit)
+    if len(rows) == limit or not ties:
+        return rows
+    if rows:
+        skip = 0
+    else:
+        # The skip may run past the group; count what it used up there
+        skip -= conn.execute(f"""
+            SELECT COUNT(*) FROM (SELECT 1 FROM malaysia_targeted_threats WHERE {tie_where} LIMIT ?)
+        """, (*tie_params, skip)).fetchone()[0]
+    rest_where = f"{where} AND ({', '.join(ties)}) {cmp} ({', '.join('?' * len(ties))})"
+    return rows + _select(conn, rest_where, (*params, *after[:-1]), keys, descending, skip, limit - len(rows))
+
+def _anchor(conn, version, segment, descending, offset):
+    # (after, skip) for the anchor nearest below offset. Missing anchors are
+    # found by hopping ANCHOR_ROWS at a time from the furthest one known.
+    block = offset // ANCHOR_ROWS
+    if block == 0:
+        return None, offset
+    cache_key = (version, segment[0], descending)
+    with _anchors_lock:
+        known = list(_anchors.get(cache_key, ()))
+    while len(known) < block:
+        rows = _seek(conn, segment, descending, known[-1] if known else None, ANCHOR_ROWS - 1, 1)
+        if not rows:
+            break
+        known.append(rows[0])
+    with _anchors_lock:
+        if len(known) > len(_anchors.get(cache_key, ())):
+            _anchors[cache_key] = known
+        if cache_key in _anchors:
+            _anchors.move_to_end(cache_key)
+        while len(_anchors) > ANCHOR_CACHE_SIZE:
+            _anchors.popitem(last=False)
+    block = min(block, len(known))
+    if block == 0:
+        return None, offset
+    return known[block - 1], offset - block * ANCHOR_ROWS
+
+# --------------------------
+# Window Fetch
+# --------------------------
+def _window_ids(conn, version, segments, descending, offset, limit):
+    # Walks the segments in order, skipping whole ones by their cached
+    # counts. Within one, the page starts from the nearest anchor, so
+    # OFFSET never skips more than ANCHOR_ROWS rows.
+    ids = []
+    for segment in segments:
+        n = _segment_count(conn, version, segment)
+        if offset >= n:
+            offset -= n
+            continue
+        after, skip = _anchor(conn, version, segment, descending, offset)
+        ids += [r[-1] for r in _seek(conn, segment, descending, after, skip, limit - len(ids))]
+        offset = 0
+        if len(ids) >= limit:
+            break
+    return ids
+
+def fetch_window(conn, version, country, q=None, sort="score", order="desc", offset=0, limit=100):
+    # Returns a columnar page: {"columns": [...], "data": {col: [...]}, ...}.
+    # Ids come from an index-only seek into one country's slice; full rows
+    # are looked up for the window alone.
+    if sort not in SORTS:
+        raise ValueError(f"Unsupported sort: {sort}")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"Unsupported order: {order}")
+    offset = max(0, offset)
+    limit = max(1, min(limit, MAX_WINDOW))
+    descending = order == "desc"
+
+    if q:
+        # Matches come back in indicator order, the only order the prefix
+        # index can give without sorting.
+        sort = "indicator"
+        segments = _range_segments(country, prefix_ranges(q))
+        if descending:
+            segments.reverse()
+    else:
+        segments = _sort_segments(country, sort)
+    total = sum(_segment_count(conn, version, s) for s in segments)
+    ids = _window_ids(conn, version, segments, descending, offset, limit)
+
+    data = {c: [] for c in GRID_COLUMNS}
+    if ids:
+        placeholders = ", ".join("?" * len(ids))
+        rows = conn.execute(f"""
+            SELECT id, ioc_text(indicator), indicator_type, pulse_name, pulse_author,
+                   pulse_created, threat_score
+            FROM malaysia_targeted_threats WHERE id IN ({placeholders})
+        """, ids).fetchall()
+        by_id = {r[0]: r for r in rows}
+        for row_id in ids:
+            for c, v in zip(GRID_COLUMNS, by_id[row_id]):
+                data[c].append(v)
+
+    return {
+        "columns": GRID_COLUMNS,
+        "data": data,
+        "offset": offset,
+        "limit": limit,
+        "total": total,
+        "sort": sort,
+        "order": order,
+        "country": country,
+        "version": version,
+    }
@@ -0,0 +1,90 @@
+import socket
+import ipaddress
+
+# --------------------------
+# Indicator Storage Codec
+# --------------------------
+# IPs and file hashes are stored as a 1-byte type tag + raw bytes (5 bytes
+# for IPv4, 33 for SHA256) instead of their text form; domains, URLs and
+# anything unparseable stay TEXT. The tag keeps a 16-byte MD5 distinct from
+# a 16-byte IPv6 under the UNIQUE index and makes values self-describing.
+
+TAG_MD5 = 0x01
+TAG_SHA1 = 0x02
+TAG_SHA256 = 0x03
+TAG_IPV4 = 0x04
+TAG_IPV6 = 0x06
+
+HASH_TYPES = {
+    "FileHash-MD5": (TAG_MD5, 16),
+    "FileHash-SHA1": (TAG_SHA1, 20),
+    "FileHash-SHA256": (TAG_SHA256, 32),
+}
+IP_TYPES = {"IPv4": TAG_IPV4, "IPv6": TAG_IPV6}
+BINARY_TYPES = tuple(HASH_TYPES) + tuple(IP_TYPES)
+
+def encode_indicator(value, indicator_type):
+    if value is None:
+        return None
+    try:
+        if indicator_type in IP_TYPES:
+            addr = ipaddress.ip_address(value.strip())
+            tag = TAG_IPV4 if addr.version == 4 else TAG_IPV6
+            return bytes([tag]) + addr.packed
+        if indicator_type in HASH_TYPES:
+            tag, size = HASH_TYPES[indicator_type]
+            raw = bytes.fromhex(value.strip())
+            if len(raw) == size:
+                return bytes([tag]) + raw
+    except ValueError:
+        pass
+    return value
+
+def decode_indicator(stored):
+    if not isinstance(stored, (bytes, bytearray)):
+        return stored
+    tag, raw = stored[0], bytes(stored[1:])
+    if tag == TAG_IPV4 and len(raw) == 4:
+        return socket.inet_ntoa(raw)
+    if tag in (TAG_IPV4, TAG_IPV6):
+        return str(ipaddress.ip_address(raw))
+    return raw.hex()
+
+# --------------------------
+# SQL Helpers
+# --------------------------
+def register_functions(conn):
+    # ioc_text(indicator) decodes at the SQL boundary, so queries can keep
+    # returning readable indicators.
+    conn.create_function("ioc_text", 1, decode_indicator, deterministic=True)
+    return conn
+
+# Public projection of a threat row, with the indicator decoded
+THREAT_COLUMNS = """
+    id, country, ioc_text(indicator) AS indicator, indicator_type, pulse_name,
+    pulse_description, pulse_author, pulse_created, threat_score
+"""
+
+# --------------------------
+# Migration
+# --------------------------
+def migrate_indicator_storage(conn, batch_rows=5000):
+    # Re-encodes TEXT IP/hash rows. OR IGNORE leaves a row as text when its
+    # canonical form already exists (e.g. two spellings of one IPv6).
+    placeholders = ", ".join("?" * len(BINARY_TYPES))
+    # Unary + stops the planner using the type index; batches follow id order
+    last_id = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, indicator, indicator_type FROM malaysia_targeted_threats
+            WHERE id > ? AND typeof(indicator) = 'text' AND +indicator_type IN ({placeholders})
+            ORDER BY id LIMIT ?
+        """, (last_id, *BINARY_TYPES, batch_rows)).fetchall()
+        if not rows:
+            break
+        conn.executemany(
+            "UPDATE OR IGNORE malaysia_targeted_threats SET indicator = ? WHERE id = ?",
+            [(encode_indicator(ind, t), row_id) for row_id, ind, t in rows]
+        )
+        conn.commit()
+        last_id = rows[-1][0]
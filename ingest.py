@@ -0,0 +1,181 @@
+import os
+import snapshots
+import ioc_index
+from datetime import datetime
+from db import DATABASE_FILE, get_db_connection, bump_dataset_version, get_dataset_version
+from events import publish_new_threats
+from otx_client import iter_otx_pulses
+from scoring import get_engine, ScoringBatch, ScoringEngine
+from pipeline import Pipeline, Stage
+from domains import indicator_rkey, DOMAIN_TYPES
+from indicators import encode_indicator, IP_TYPES
+from geo import lookup_networks, locate_domains, NO_NETWORK
+from rollups import apply_rollups
+from lifecycle import archive_exists, attach_archive, drop_revived
+
+# --------------------------
+# Save Threats
+# --------------------------
+def _locate(pulses, resolve=False):
+    # GeoIP location and ASN/ISP for the IP indicators of a batch. With
+    # resolve, domains take the network of their first resolved address.
+    ips, names = [], []
+    for pulse in pulses:
+        for ind in pulse.get("indicators") or []:
+            if not ind.get("indicator"):
+                continue
+            if ind.get("type") in IP_TYPES:
+                ips.append(ind["indicator"])
+            elif resolve and ind.get("type") in DOMAIN_TYPES:
+                names.append(ind["indicator"])
+    located = lookup_networks(ips) if ips else {}
+    if names:
+        located.update((name, nets[0]) for name, nets in locate_domains(names).items())
+    return located
+
+def _threat_rows(pulses, results, min_score, locations=None):
+    # One row per indicator for every country profile the pulse scores for;
+    # each indicator keeps the score of the pulse it arrived in.
+    # results: {country: ScoreResult}
+    locations = locations or {}
+    rows = []
+    for country, result in results.items():
+        for pulse, score in zip(pulses, result.totals.tolist()):
+            if score < min_score:
+                continue
+            for ind in pulse.get("indicators") or []:
+                rows.append((
+                    country,
+                    encode_indicator(ind.get("indicator"), ind.get("type")),
+                    ind.get("type"),
+                    pulse.get("name"),
+                    pulse.get("description"),
+                    pulse.get("author"),
+                    pulse.get("created"),
+                    score,
+                    indicator_rkey(ind.get("indicator"), ind.get("type")),
+                    *locations.get(ind.get("indicator"), NO_NETWORK)
+                ))
+    return rows
+
+def _write_rows(rows):
+    conn = get_db_connection()
+    # ATTACH is not allowed inside the transaction
+    archived = archive_exists()
+    if archived:
+        attach_archive(conn)
+    # IMMEDIATE takes the write lock before reading the last id, so every id
+    # above it in this transaction was inserted by this batch
+    conn.execute("BEGIN IMMEDIATE")
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM malaysia_targeted_threats").fetchone()[0]
+    # A known indicator only has last_seen refreshed, which keeps it hot
+    seen = datetime.utcnow().isoformat()
+    cur = conn.executemany("""
+        INSERT INTO malaysia_targeted_threats
+        (country, indicator, indicator_type, pulse_name, pulse_description, pulse_author,
+         pulse_created, threat_score, domain_rkey, geo_country, geo_region, geo_city, geo_asn,
+         geo_isp, last_seen)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (country, indicator) DO UPDATE SET last_seen = excluded.last_seen
+    """, [(*row, seen) for row in rows])
+    # Only new ids change what the dashboards show
+    inserted = cur.rowcount > 0 and conn.execute(
+        "SELECT MAX(id) FROM malaysia_targeted_threats").fetchone()[0] > last_id
+    if inserted:
+        apply_rollups(conn, "id > ?", (last_id,))
+        if archived:
+            drop_revived(conn, last_id)
+        bump_dataset_version(conn)
+    conn.commit()
+    if inserted:
+        # Live /api/stream clients get the new rows straight from this batch
+        publish_new_threats(conn, get_dataset_version(conn))
+    conn.close()
+    return len(rows)
+
+def save_threats(pulses):
+    # Serial path: the whole list is scored as one batch and written at once
+    engine = get_engine()
+    results = engine.score_pulses(pulses)
+    locations = _locate(pulses, engine.resolves_domains())
+    return _write_rows(_threat_rows(pulses, results, engine.min_score, locations))
+
+# --------------------------
+# Ingest Pipeline
+# --------------------------
+# fetch -> parse -> enrich -> score -> write, joined by bounded queues so the
+# network, GeoIP lookups, numpy scoring and SQLite writes overlap. Writes stay
+# on one thread; SQLite only takes one writer anyway.
+PULSE_BATCH = 50
+QUEUE_BATCHES = 4                     # batches buffered between two stages
+PARSE_PROCESSES = int(os.environ.get("INGEST_PARSE_PROCESSES", "0"))   # 0 = parse on a thread
+ENRICH_WORKERS = int(os.environ.get("INGEST_ENRICH_WORKERS", "2"))
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def parse_batch(pulses):
+    # Module level so it can run in a process pool
+    return pulses, ScoringBatch.from_pulses(pulses)
+
+def build_pipeline(pulse_source, engine=None):
+    engine = engine or get_engine()
+    written = {"pulses": 0, "rows": 0}
+
+    def enrich(item):
+        pulses, batch = item
+        return pulses, engine.enrich(batch), _locate(pulses, engine.resolves_domains())
+
+    def score(item):
+        pulses, batch, locations = item
+        return pulses, _threat_rows(pulses, engine.score(batch), engine.min_score, locations)
+
+    def write(item):
+        pulses, rows = item
+        written["rows"] += _write_rows(rows)
+        written["pulses"] += len(pulses)
+
+    pipeline = Pipeline(
+        [_batches(pulse_source, PULSE_BATCH)],
+        [
+            Stage("parse", parse_batch, workers=max(1, PARSE_PROCESSES),
+                  queue_size=QUEUE_BATCHES, processes=PARSE_PROCESSES > 0),
+            Stage("enrich", enrich, workers=ENRICH_WORKERS, queue_size=QUEUE_BATCHES),
+            Stage("score", score, queue_size=QUEUE_BATCHES),
+            Stage("write", write),
+        ],
+        source_queue_size=QUEUE_BATCHES
+    )
+    return pipeline, written
+
+# --------------------------
+# Ingest Run
+# --------------------------
+def run_ingest(limit=200, export=True, pages=1, resolve_domains=False):
+    # resolve_domains opts this run into DNS lookups of indicator domains
+    engine = ScoringEngine.from_file(resolve_domains=True) if resolve_domains else None
+    pipeline, written = build_pipeline(iter_otx_pulses(limit=limit, pages=pages), engine)
+    pipeline.run()
+    if export:
+        try:
+            # pandas/pyarrow only load when the Parquet export actually runs
+            from columnar_export import export_threats
+            export_threats(DATABASE_FILE)
+        except Exception as e:
+            print("Parquet Export Error:", e)
+    try:
+        snapshots.write_delta(DATABASE_FILE)
+    except Exception as e:
+        print("Snapshot Delta Error:", e)
+    try:
+        ioc_index.write_index(DATABASE_FILE)
+    except Exception as e:
+        print("IOC Index Error:", e)
+    return written["pulses"]
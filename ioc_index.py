@@ -0,0 +1,191 @@
+import os
+import mmap
+import sqlite3
+import struct
+from bisect import bisect_left
+from collections import defaultdict
+from domains import DOMAIN_TYPES, normalize_domain
+from indicators import (encode_indicator, HASH_TYPES, TAG_MD5, TAG_SHA1, TAG_SHA256,
+                        TAG_IPV4, TAG_IPV6)
+from geo_reload import ReloadingReader
+
+# --------------------------
+# Memory-mapped IOC Index
+# --------------------------
+# A read-only lookup file written after every ingest (atomic rename) and
+# mmap'ed by each web worker. Workers share the page cache instead of each
+# building a dict of every indicator, start warm, and pick up a new file
+# through ReloadingReader.
+#
+# Layout (little-endian, sections 8-byte aligned):
+#   header   magic, format, section count, dataset version, hits offset/count
+#   sections one entry per key kind: IPv4, IPv6 and hashes as sorted
+#            fixed-width raw keys; domains as sorted UTF-8 keys plus an
+#            offset table (count + 1 uint32) into the key blob
+#   values   per key: first hit, hit count, max score
+#   hits     (country, max score) pairs, one per key and country
+
+INDEX_FILE = os.environ.get("IOC_INDEX_FILE", os.path.join("exports", "ioc_index.bin"))
+TABLE = "malaysia_targeted_threats"
+
+MAGIC = b"RSIX"
+FORMAT = 1
+KIND_DOMAIN = 0x10
+
+HEADER = struct.Struct("<4sHHQQI")
+SECTION = struct.Struct("<BxHIQQQ")     # kind, key width (0 = variable), count, keys, values, offsets
+VALUE = struct.Struct("<IHH")           # first hit, hit count, max score
+HIT = struct.Struct("<2sH")             # country, score
+OFFSET = struct.Struct("<I")
+
+KEY_WIDTHS = {TAG_IPV4: 4, TAG_IPV6: 16, TAG_MD5: 16, TAG_SHA1: 20, TAG_SHA256: 32}
+_HASH_BY_LENGTH = {size * 2: name for name, (_, size) in HASH_TYPES.items()}
+
+def index_key(value):
+    # Query text -> (kind, key bytes), matching how ingest stores indicators
+    value = (value or "").strip()
+    if not value:
+        return None
+    encoded = encode_indicator(value, "IPv4")
+    if isinstance(encoded, bytes):
+        return encoded[0], encoded[1:]
+    if len(value) in _HASH_BY_LENGTH:
+        encoded = encode_indicator(value, _HASH_BY_LENGTH[len(value)])
+        if isinstance(encoded, bytes):
+            return encoded[0], encoded[1:]
+    name = normalize_domain(value)
+    return (KIND_DOMAIN, name.encode("utf-8")) if name else None
+
+# --------------------------
+# Writer
+# --------------------------
+def _collect(conn):
+    # {kind: {key: {country: max score}}}
+    keys = defaultdict(lambda: defaultdict(dict))
+    rows = conn.execute(f"SELECT indicator, indicator_type, country, threat_score FROM {TABLE}")
+    for indicator, indicator_type, country, score in rows:
+        if isinstance(indicator, bytes):
+            kind, key = indicator[0], indicator[1:]
+            if KEY_WIDTHS.get(kind) != len(key):
+                continue
+        elif indicator_type in DOMAIN_TYPES and indicator:
+            kind, key = KIND_DOMAIN, normalize_domain(indicator).encode("utf-8")
+        else:
+            continue
+        hits = keys[kind][key]
+        hits[country] = max(hits.get(country, 0), score or 0)
+    return keys
+
+def _pad(buf):
+    buf.extend(b"\0" * (-len(buf) % 8))
+
+def write_index(db_file, path=INDEX_FILE):
+    conn = sqlite3.connect(db_file)
+    try:
+        version = conn.execute("SELECT version FROM dataset_meta WHERE id = 1").fetchone()[0]
+        keys = _collect(conn)
+    finally:
+        conn.close()
+
+    kinds = sorted(keys)
+    body = bytearray()
+    header_pad = -(HEADER.size + SECTION.size * len(kinds)) % 8
+    start = HEADER.size + SECTION.size * len(kinds) + header_pad
+    sections, hits = [], []
+    for kind in kinds:
+        entries = sorted(keys[kind].items())
+        width = KEY_WIDTHS.get(kind, 0)
+        offsets_at = 0
+        if not width:
+            offsets_at = start + len(body)
+            position = 0
+            for key, _ in entries:
+                body += OFFSET.pack(position)
+                position += len(key)
+            body += OFFSET.pack(position)
+            _pad(body)
+        keys_at = start + len(body)
+        for key, _ in entries:
+            body += key
+        _pad(body)
+        values_at = start + len(body)
+        for _, countries in entries:
+            body += VALUE.pack(len(hits), len(countries), min(max(countries.values()), 0xFFFF))
+            hits.extend(sorted(countries.items()))
+        _pad(body)
+        sections.append(SECTION.pack(kind, width, len(entries), keys_at, values_at, offsets_at))
+    hits_at = start + len(body)
+    for country, score in hits:
+        body += HIT.pack(country.encode("ascii"), min(score, 0xFFFF))
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Per-process temp name: several workers may build a missing index at once
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT, len(kinds), version, hits_at, len(hits)))
+        f.write(b"".join(sections))
+        f.write(b"\0" * header_pad)
+        f.write(body)
+    os.replace(tmp, path)
+    return sum(len(k) for k in keys.values())
+
+# --------------------------
+# Reader
+# --------------------------
+class _Keys:
+    # Sequence view of one section's sorted keys, for bisect
+    def __init__(self, mm, width, count, keys_at, offsets_at):
+        self.mm, self.width, self.count = mm, width, count
+        self.keys_at, self.offsets_at = keys_at, offsets_at
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if self.width:
+            at = self.keys_at + i * self.width
+            return self.mm[at:at + self.width]
+        begin, end = struct.unpack_from("<II", self.mm, self.offsets_at + i * OFFSET.size)
+        return self.mm[self.keys_at + begin:self.keys_at + end]
+
+class IOCIndex:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, count, self.version, self.hits_at, self.hit_count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f"Not an IOC index (format {fmt}): {path}")
+        self.sections = {}
+        for i in range(count):
+            kind, width, n, keys_at, values_at, offsets_at = SECTION.unpack_from(
+                self.mm, HEADER.size + i * SECTION.size)
+            self.sections[kind] = (_Keys(self.mm, width, n, keys_at, offsets_at), values_at)
+
+    def __len__(self):
+        return sum(len(keys) for keys, _ in self.sections.values())
+
+    def lookup(self, value):
+        # None, or {"max_score": int, "countries": {country: score}}
+        parsed = index_key(value)
+        if parsed is None or parsed[0] not in self.sections:
+            return None
+        kind, key = parsed
+        keys, values_at = self.sections[kind]
+        i = bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return None
+        first, n, max_score = VALUE.unpack_from(self.mm, values_at + i * VALUE.size)
+        countries = {}
+        for j in range(first, first + n):
+            country, score = HIT.unpack_from(self.mm, self.hits_at + j * HIT.size)
+            countries[country.decode("ascii")] = score
+        return {"max_score": max_score, "countries": countries}
+
+_reader = None
+
+def get_index(path=INDEX_FILE):
+    # Current IOCIndex for this process, or None before the first write
+    global _reader
+    if _reader is None:
+        _reader = ReloadingReader(path, IOCIndex)
+    return _reader.get()
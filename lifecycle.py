@@ -0,0 +1,174 @@
+import os
+import json
+import time
+from datetime import datetime, timedelta
+from rollups import ROLLUP_TABLE, apply_rollups, rebuild_rollups
+
+# --------------------------
+# Lifecycle Config
+# --------------------------
+# Rows expire TTL days after they were last seen in a pulse (pulse_created
+# for rows older than the last_seen column) and move to a separate archive
+# DB, so the hot table - and its indexes - stay small enough to stay in the
+# page cache. ARCHIVE_TTL_DAYS='{"IPv4": 14}' overrides single types.
+#
+# An indicator is either live or archived, once per country: ingesting an
+# archived indicator again takes it out of the archive (drop_revived), so
+# rollups over hot + archive and include_archived queries count it once.
+ARCHIVE_DATABASE_FILE = os.environ.get("ARCHIVE_DATABASE_FILE", "threat_archive.db")
+ARCHIVE_BATCH = 2000
+ARCHIVE_PAUSE = 0.05
+
+DEFAULT_TTL_DAYS = 180
+TTL_DAYS = {
+    "IPv4": 30,
+    "IPv6": 30,
+    "URL": 60,
+    "domain": 90,
+    "hostname": 90,
+    "FileHash-MD5": 365,
+    "FileHash-SHA1": 365,
+    "FileHash-SHA256": 365,
+}
+TTL_DAYS.update(json.loads(os.environ.get("ARCHIVE_TTL_DAYS", "{}")))
+
+TABLE = "malaysia_targeted_threats"
+
+# Matches idx_threats_expiry, so expiry scans are index range scans
+LAST_SEEN = "COALESCE(last_seen, pulse_created)"
+
+# --------------------------
+# Archive DB
+# --------------------------
+def _columns(conn, schema="main"):
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_info({TABLE})")]
+
+def attach_archive(conn):
+    # Attaches threat_archive.db as "archive". No writes, so read-only
+    # requests can use it; ensure_archive sets up the schema.
+    attached = [r[1] for r in conn.execute("PRAGMA database_list")]
+    if "archive" not in attached:
+        conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DATABASE_FILE,))
+    return conn
+
+def ensure_archive(conn):
+    # Creates the archive table and brings it up to the hot table's columns
+    # and indexes. Run once by init_db and by the archive job.
+    attach_archive(conn)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS archive.{TABLE} (
+            id INTEGER PRIMARY KEY,
+            archived_at TEXT
+        )
+    """)
+    have = set(_columns(conn, "archive"))
+    for _, column, decl, notnull, default, _ in conn.execute(f"PRAGMA main.table_info({TABLE})"):
+        if column not in have:
+            # The default matters for rows archived before the column existed
+            # (country = 'MY'); plain columns are added untyped as before.
+            extra = f" {decl} NOT NULL DEFAULT {default}" if notnull and default is not None else ""
+            conn.execute(f"ALTER TABLE archive.{TABLE} ADD COLUMN {column}{extra}")
+    # Per-country like the hot table's indexes (see db.create_indexes)
+    conn.execute("DROP INDEX IF EXISTS archive.idx_archive_score")
+    conn.execute("DROP INDEX IF EXISTS archive.idx_archive_rkey")
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS archive.idx_archive_country_score
+        ON {TABLE} (country, threat_score DESC, pulse_created DESC)
+    """)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS archive.idx_archive_country_rkey
+        ON {TABLE} (country, domain_rkey) WHERE domain_rkey IS NOT NULL
+    """)
+    if not conn.execute(
+            "SELECT 1 FROM archive.sqlite_master WHERE name = 'idx_archive_country_indicator'").fetchone():
+        _dedupe_archive(conn)
+    conn.commit()
+    return conn
+
+def _dedupe_archive(conn):
+    # One-off for archives from before the (country, indicator) index:
+    # archived copies of live rows and all but the newest archived copy go,
+    # and the rollups that counted them are rebuilt.
+    removed = conn.execute(f"""
+        DELETE FROM archive.{TABLE}
+        WHERE (country, indicator) IN (SELECT country, indicator FROM main.{TABLE})
+           OR id NOT IN (SELECT MAX(id) FROM archive.{TABLE} GROUP BY country, indicator)
+    """).rowcount
+    conn.execute(f"CREATE UNIQUE INDEX archive.idx_archive_country_indicator ON {TABLE} (country, indicator)")
+    if removed and conn.execute(
+            f"SELECT 1 FROM sqlite_master WHERE name = '{ROLLUP_TABLE}'").fetchone():
+        rebuild_rollups(conn, [TABLE, f"archive.{TABLE}"])
+
+def archive_exists():
+    return os.path.exists(ARCHIVE_DATABASE_FILE)
+
+def threat_source(conn, include_archived=False):
+    # FROM-clause for threat queries: the hot table, or hot + archive under
+    # the same name so existing column references keep working.
+    if not include_archived or not archive_exists():
+        return TABLE
+    attach_archive(conn)
+    cols = ", ".join(_columns(conn))
+    return (f"(SELECT {cols} FROM main.{TABLE} "
+            f"UNION ALL SELECT {cols} FROM archive.{TABLE}) AS {TABLE}")
+
+def drop_revived(conn, after_id):
+    # Rows above after_id that were archived before are live again: their
+    # archived copy leaves the archive and the rollups. Run it in the ingest
+    # transaction, after the new rows were added to the rollups.
+    revived = f"(country, indicator) IN (SELECT country, indicator FROM main.{TABLE} WHERE id > ?)"
+    apply_rollups(conn, revived, (after_id,), sign=-1, table=f"archive.{TABLE}")
+    conn.execute(f"DELETE FROM archive.{TABLE} WHERE {revived}", (after_id,))
+
+def rollup_tables(conn):
+    # Rollups are history: they count archived rows too
+    if not archive_exists():
+        return [TABLE]
+    attach_archive(conn)
+    return [TABLE, f"archive.{TABLE}"]
+
+# --------------------------
+# Expiry Job
+# --------------------------
+def ttl_cutoffs(conn, now=None):
+    now = now or datetime.utcnow()
+    types = [r[0] for r in conn.execute(
+        f"SELECT DISTINCT indicator_type FROM {TABLE} WHERE indicator_type IS NOT NULL")]
+    return {t: (now - timedelta(days=TTL_DAYS.get(t, DEFAULT_TTL_DAYS))).isoformat() for t in types}
+
+def archive_expired(conn, batch_rows=ARCHIVE_BATCH, pause=ARCHIVE_PAUSE, dry_run=False, progress=print):
+    # Copies a batch into the archive and commits, then deletes it from the
+    # hot table and commits. A crash in between leaves the batch in both
+    # places; the next run's INSERT OR IGNORE + DELETE finishes it.
+    from db import bump_dataset_version
+    ensure_archive(conn)
+    cols = ", ".join(_columns(conn))
+    archived_at = datetime.utcnow().isoformat()
+    moved = {}
+    for ind_type, cutoff in ttl_cutoffs(conn).items():
+        if dry_run:
+            moved[ind_type] = conn.execute(f"""
+                SELECT COUNT(*) FROM {TABLE} WHERE indicator_type = ? AND {LAST_SEEN} < ?
+            """, (ind_type, cutoff)).fetchone()[0]
+            continue
+        while True:
+            ids = [r[0] for r in conn.execute(f"""
+                SELECT id FROM {TABLE} WHERE indicator_type = ? AND {LAST_SEEN} < ? LIMIT ?
+            """, (ind_type, cutoff, batch_rows))]
+            if not ids:
+                break
+            placeholders = ", ".join("?" * len(ids))
+            with conn:
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO archive.{TABLE} ({cols}, archived_at)
+                    SELECT {cols}, ? FROM main.{TABLE} WHERE id IN ({placeholders})
+                """, (archived_at, *ids))
+            with conn:
+                conn.execute(f"DELETE FROM main.{TABLE} WHERE id IN ({placeholders})", ids)
+                bump_dataset_version(conn)
+            moved[ind_type] = moved.get(ind_type, 0) + len(ids)
+            if pause:
+                time.sleep(pause)
+        if progress and moved.get(ind_type):
+            progress(f"Archived {moved[ind_type]} {ind_type} rows last seen before {cutoff[:10]}")
+    return moved
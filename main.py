@@ -1,344 +1,180 @@
 import os
-import sqlite3
-import requests
-import io
-import csv
-from datetime import datetime, timedelta
-from flask import Flask, jsonify, request, render_template_string, send_file
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Image
-from reportlab.lib import colors, pagesizes
-from reportlab.lib.styles import getSampleStyleSheet
-import urllib.request
+import sys
+import argparse
 
 # --------------------------
-# Flask App
+# Command Line Entry Point
 # --------------------------
-app = Flask(__name__)
+# Heavy dependencies (Flask, ReportLab, pandas) are imported inside the
+# subcommand that needs them, so `python main.py ingest` from cron only pays
+# for requests + sqlite3.
 
-# --------------------------
-# Environment / Config
-# --------------------------
-OTX_API_KEY = os.environ.get("OTX_API_KEY")
-if not OTX_API_KEY:
-    raise RuntimeError("OTX_API_KEY environment variable is required!")
-
-ADMIN_KEY = os.environ.get("ADMIN_KEY")
-DATABASE_FILE = "threat_intel.db"
-
-# --------------------------
-# Malaysia Targeting Rules
-# --------------------------
-MALAYSIA_KEYWORDS = [
-    "malaysia", "maybank", "cimb", "bank negara",
-    "petronas", ".my", "gov.my", "edu.my"
-]
-
-THREAT_SCORES = {
-    "keyword": 3,
-    "my_domain": 4
-}
-
-# --------------------------
-# Database Setup
-# --------------------------
-def init_db():
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.execute("""
-        CREATE TABLE IF NOT EXISTS malaysia_targeted_threats (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            indicator TEXT UNIQUE,
-            indicator_type TEXT,
-            pulse_name TEXT,
-            pulse_description TEXT,
-            pulse_author TEXT,
-            pulse_created TEXT,
-            threat_score INTEGER
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-init_db()
-
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# --------------------------
-# Fetch OTX Pulses
-# --------------------------
-def fetch_otx_pulses(limit=100):
-    headers = {"X-OTX-API-KEY": OTX_API_KEY, "Accept": "application/json"}
-    url = "https://otx.alienvault.com/api/v1/pulses/subscribed"
-    params = {"limit": limit}
-    try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        return response.json().get("results", [])
-    except Exception as e:
-        print("OTX Fetch Error:", e)
-        return []
-
-# --------------------------
-# Compute Malaysia Score
-# --------------------------
-def compute_malaysia_score(pulse):
-    score = 0
-    text = (pulse.get("name", "") + " " + pulse.get("description", "")).lower()
-    for kw in MALAYSIA_KEYWORDS:
-        if kw in text:
-            score += THREAT_SCORES["keyword"]
-    for ind in pulse.get("indicators") or []:
-        if ind.get("type") == "domain" and ind.get("indicator", "").endswith(".my"):
-            score += THREAT_SCORES["my_domain"]
-    return score
-
-# --------------------------
-# Save Threats
-# --------------------------
-def save_threats(pulses):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    for pulse in pulses:
-        score = compute_malaysia_score(pulse)
-        if score < 1:
-            continue
-        for ind in pulse.get("indicators") or []:
-            cursor.execute("""
-                INSERT OR IGNORE INTO malaysia_targeted_threats
-                (indicator, indicator_type, pulse_name, pulse_description, pulse_author, pulse_created, threat_score)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                ind.get("indicator"),
-                ind.get("type"),
-                pulse.get("name"),
-                pulse.get("description"),
-                pulse.get("author"),
-                pulse.get("created"),
-                score
-            ))
-    conn.commit()
-    conn.close()
-
-# --------------------------
-# Update Endpoint
-# --------------------------
-@app.route("/update")
-def update_threats():
-    key = request.args.get("key")
-    if ADMIN_KEY and key != ADMIN_KEY:
-        return {"error": "Unauthorized"}, 403
-    pulses = fetch_otx_pulses(limit=200)
-    save_threats(pulses)
-    return {"status": "updated", "total_pulses_fetched": len(pulses)}
-
-# --------------------------
-# Dashboard API
-# --------------------------
-@app.route("/api/dashboard")
-def dashboard_api():
-    conn = get_db_connection()
-    rows = conn.execute("""
-        SELECT * FROM malaysia_targeted_threats
-        ORDER BY threat_score DESC, pulse_created DESC
-        LIMIT 50
-    """).fetchall()
-    conn.close()
-    return jsonify([dict(row) for row in rows])
+def cmd_serve(args):
+    from web import app
+    port = int(os.environ.get("PORT", args.port))
+    app.run(host="0.0.0.0", port=port)
 
-# --------------------------
-# Weekly Top 10 Threats
-# --------------------------
-def get_weekly_top10():
+def cmd_ingest(args):
+    from db import init_db
+    from ingest import run_ingest
+    init_db()
+    total = run_ingest(limit=args.limit, export=args.export, pages=args.pages,
+                       resolve_domains=args.resolve_domains)
+    print(f"Ingested {total} pulses")
+
+def cmd_export(args):
+    from db import init_db, DATABASE_FILE
+    from columnar_export import export_threats, PARQUET_DIR
+    init_db()
+    exported = export_threats(DATABASE_FILE, out_dir=args.output or PARQUET_DIR, full=args.full)
+    print(f"Exported {exported} rows")
+
+def cmd_report(args):
+    from db import init_db
+    from reports import write_report
+    if args.history and args.format != "pdf":
+        raise RuntimeError("--history is only available with --format pdf")
+    init_db()
+    default_dir = os.path.join("exports", args.format)
+    name = "threat_history_report" if args.history else "weekly_threat_report"
+    path = args.output or os.path.join(default_dir, f"{name}.{args.format}")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    print(f"Wrote {write_report(args.format, path, args.history, args.since, args.until, args.country)}")
+
+def cmd_rescore(args):
+    import snapshots
+    from db import init_db, DATABASE_FILE
+    from rescore import rescore_threats
+    from ioc_index import write_index
+    init_db()
+    result = rescore_threats(chunk_rows=args.chunk_size, restart=args.restart)
+    print(f"Rescored {result['scanned']} rows, {result['updated']} changed (rules {result['version']})")
+    if result["updated"]:
+        snapshots.write_delta(DATABASE_FILE)
+        write_index(DATABASE_FILE)
+        print("Parquet rows keep their old scores until `export --full` is run")
+
+def cmd_rebuild_index(args):
+    from db import init_db, rebuild_indexes
+    init_db()
+    rebuild_indexes(from_snapshots=args.from_snapshots)
+    print("Indexes rebuilt")
+
+def cmd_archive(args):
+    import snapshots
+    from db import init_db, get_db_connection, DATABASE_FILE
+    from lifecycle import archive_expired, ARCHIVE_DATABASE_FILE
+    from changes import compact_changes
+    from ioc_index import write_index
+    init_db()
     conn = get_db_connection()
-    one_week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
-    rows = conn.execute("""
-        SELECT indicator, indicator_type, threat_score, pulse_name
-        FROM malaysia_targeted_threats
-        WHERE pulse_created >= ?
-        ORDER BY threat_score DESC
-        LIMIT 100
-    """, (one_week_ago,)).fetchall()
+    moved = archive_expired(conn, batch_rows=args.batch_size, dry_run=args.dry_run)
+    if not args.dry_run:
+        # Tombstones past retention go in the same run that creates new ones
+        compacted = compact_changes(conn)
+        print(f"Change feed: {compacted['superseded']} superseded, {compacted['tombstones']} old tombstones dropped")
     conn.close()
-    result = {"ips": [], "domains": [], "hashes": []}
-    for row in rows:
-        r = dict(row)
-        t = r["indicator_type"]
-        if t in ["IPv4", "IPv6"]:
-            result["ips"].append(r)
-        elif t == "domain":
-            result["domains"].append(r)
-        elif "FileHash" in t:
-            result["hashes"].append(r)
-    result["ips"] = result["ips"][:10]
-    result["domains"] = result["domains"][:10]
-    result["hashes"] = result["hashes"][:10]
-    return result
-
-# --------------------------
-# JSON Report
-# --------------------------
-@app.route("/report/json")
-def report_json():
-    return jsonify({
-        "title": "Sunday Ring With Red Shark - Top 10 Malaysia Weekly Threat Report",
-        "report": get_weekly_top10()
-    })
-
-# --------------------------
-# CSV Report
-# --------------------------
-@app.route("/report/csv")
-def report_csv():
-    data = get_weekly_top10()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["Sunday Ring With Red Shark - Top 10 Malaysia Weekly Threat Report"])
-    writer.writerow([])
-    writer.writerow(["Category", "Indicator", "Threat Score", "Pulse Name"])
-    for category, items in data.items():
-        for item in items:
-            writer.writerow([
-                category,
-                item["indicator"],
-                item["threat_score"],
-                item["pulse_name"]
-            ])
-    output.seek(0)
-    return send_file(
-        io.BytesIO(output.getvalue().encode()),
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name="weekly_threat_report.csv"
-    )
-
-# --------------------------
-# PDF Report with RedShark Logo
-# --------------------------
-@app.route("/report/pdf")
-def report_pdf():
-    data = get_weekly_top10()
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=pagesizes.A4)
-    elements = []
-    styles = getSampleStyleSheet()
-
-    # RedShark Logo
-    logo_url = "https://raw.githubusercontent.com/redsharknetworks/sunday-ring/main/redshark.png"
-    logo_file = io.BytesIO(urllib.request.urlopen(logo_url).read())
-    logo_img = Image(logo_file, width=120, height=60)
-    elements.append(logo_img)
-    elements.append(Spacer(1, 12))
-
-    # Title
-    elements.append(Paragraph(
-        "Sunday Ring With Red Shark - Top 10 Malaysia Weekly Threat Report",
-        styles["Heading1"]
-    ))
-    elements.append(Spacer(1, 12))
-
-    # Table
-    table_data = [["Category", "Indicator", "Threat Score"]]
-    for category, items in data.items():
-        for item in items:
-            table_data.append([category, item["indicator"], str(item["threat_score"])])
-
-    table = Table(table_data, hAlign='LEFT')
-    table.setStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 1, colors.black),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-    ])
-    elements.append(table)
-    elements.append(Spacer(1, 24))
-
-    # Footer contact info
-    elements.append(Paragraph("Contact: darkgrid@redshark.my", styles["Normal"]))
-
-    doc.build(elements)
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        mimetype="application/pdf",
-        as_attachment=True,
-        download_name="weekly_threat_report.pdf"
-    )
-
-# --------------------------
-# Dashboard HTML
-# --------------------------
-@app.route("/")
-def dashboard_html():
+    total = sum(moved.values())
+    if args.dry_run:
+        print(f"{total} rows would move to {ARCHIVE_DATABASE_FILE}")
+        return
+    print(f"Archived {total} rows to {ARCHIVE_DATABASE_FILE}")
+    if total:
+        snapshots.write_delta(DATABASE_FILE)
+        write_index(DATABASE_FILE)
+
+def cmd_blocklist(args):
+    from db import init_db, get_db_connection
+    from blocklist import write_blocklists, FORMATS, OUTPUT_DIR
+    init_db()
     conn = get_db_connection()
-    rows = conn.execute("""
-        SELECT * FROM malaysia_targeted_threats
-        ORDER BY threat_score DESC, pulse_created DESC
-        LIMIT 20
-    """).fetchall()
-    conn.close()
-
-    html = """
-    <html>
-    <head>
-        <title>Malaysia Threat Intel Dashboard</title>
-        <style>
-            body { font-family: Arial, sans-serif; background-color: #111; color: #eee; }
-            table { border-collapse: collapse; width: 100%; margin-top: 20px; }
-            th, td { border: 1px solid #555; padding: 8px; text-align: left; }
-            th { background-color: #222; }
-            tr:nth-child(even) { background-color: #1a1a1a; }
-            .header { display: flex; align-items: center; gap: 15px; }
-            img.logo { height: 60px; }
-            .email { margin-top: 5px; font-size: 0.9em; color: #aaa; }
-            .buttons { margin-top: 15px; }
-            .buttons a { 
-                background-color: #222; color: #eee; padding: 8px 12px; text-decoration: none; 
-                margin-right: 10px; border-radius: 4px;
-            }
-            .buttons a:hover { background-color: #333; }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <img src="https://raw.githubusercontent.com/redsharknetworks/sunday-ring/main/redshark.png" class="logo" />
-            <h1>Malaysia Threat Intel Dashboard</h1>
-        </div>
-        <div class="email">Contact: darkgrid@redshark.my</div>
-
-        <div class="buttons">
-            <a href="/report/json" target="_blank">Download JSON</a>
-            <a href="/report/csv" target="_blank">Download CSV</a>
-            <a href="/report/pdf" target="_blank">Download PDF</a>
-        </div>
+    try:
+        paths, count = write_blocklists(
+            conn, formats=list(FORMATS) if args.format == "all" else [args.format],
+            out_dir=args.output or OUTPUT_DIR, min_score=args.min_score,
+            country=args.country, feeds=args.feeds)
+    finally:
+        conn.close()
+    print(f"Wrote {count} networks to {', '.join(paths)}")
+
+def build_parser():
+    from countries import DEFAULT_COUNTRY, parse_country
+    parser = argparse.ArgumentParser(description="Sunday Ring Malaysia threat intel")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("serve", help="run the dashboard web app")
+    p.add_argument("--port", type=int, default=5000)
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("ingest", help="fetch OTX pulses and store scored threats")
+    p.add_argument("--limit", type=int, default=200)
+    p.add_argument("--pages", type=int, default=1, help="follow OTX 'next' links up to N pages")
+    p.add_argument("--no-export", dest="export", action="store_false",
+                   help="skip the incremental Parquet export")
+    p.add_argument("--resolve-domains", action="store_true",
+                   help="resolve domain indicators for geo_ip rules (queries their nameservers)")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("export", help="append new rows to the Parquet dataset")
+    p.add_argument("--output")
+    p.add_argument("--full", action="store_true", help="rewrite the dataset from scratch")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("report", help="write the weekly top 10 report")
+    p.add_argument("--format", choices=["json", "csv", "pdf"], default="pdf")
+    p.add_argument("--output")
+    p.add_argument("--history", action="store_true",
+                   help="every stored threat as a multi-page PDF instead of the weekly top 10")
+    p.add_argument("--since", help="history start, e.g. 2024-01-01")
+    p.add_argument("--until", help="history end (exclusive)")
+    p.add_argument("--country", type=parse_country, default=DEFAULT_COUNTRY,
+                   help="target country profile, e.g. SG (default %(default)s)")
+    p.set_defaults(func=cmd_report)
+
+    p = sub.add_parser("rescore", help="re-apply current scoring rules to stored threats")
+    p.add_argument("--chunk-size", type=int, default=2000)
+    p.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    p.set_defaults(func=cmd_rescore)
+
+    p = sub.add_parser("rebuild-index", help="recreate indexes and refresh planner stats")
+    p.add_argument("--from-snapshots", action="store_true",
+                   help="reload the DB from snapshots/ first")
+    p.set_defaults(func=cmd_rebuild_index)
+
+    p = sub.add_parser("archive", help="move expired indicators to the archive DB")
+    p.add_argument("--batch-size", type=int, default=2000)
+    p.add_argument("--dry-run", action="store_true", help="only count what would move")
+    p.set_defaults(func=cmd_archive)
+
+    p = sub.add_parser("blocklist", help="write aggregated CIDR blocklists for firewalls and IDS")
+    p.add_argument("--format", choices=["all", "plain", "ipset", "nftables", "suricata"], default="all")
+    p.add_argument("--output", help="output directory (default exports/blocklist)")
+    p.add_argument("--min-score", type=int, default=0)
+    p.add_argument("--country", type=parse_country, help="only IPs stored for this country")
+    p.add_argument("--no-feeds", dest="feeds", action="store_false", help="skip feeds/*.txt")
+    p.set_defaults(func=cmd_blocklist)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command is None:
+        args = build_parser().parse_args(["serve"])
+    try:
+        args.func(args)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
 
-        <table>
-            <tr>
-                <th>Indicator</th>
-                <th>Type</th>
-                <th>Pulse Name</th>
-                <th>Threat Score</th>
-            </tr>
-            {% for row in rows %}
-            <tr>
-                <td>{{ row['indicator'] }}</td>
-                <td>{{ row['indicator_type'] }}</td>
-                <td>{{ row['pulse_name'] }}</td>
-                <td>{{ row['threat_score'] }}</td>
-            </tr>
-            {% endfor %}
-        </table>
-        <p>Total Showing: {{ rows|length }}</p>
-    </body>
-    </html>
-    """
-    return render_template_string(html, rows=rows)
+# `gunicorn main:app` keeps working without importing Flask for the CLI
+def __getattr__(name):
+    if name == "app":
+        from web import app
+        return app
+    raise AttributeError(name)
 
 # --------------------------
 # Run App
 # --------------------------
 if __name__ == "__main__":
-    port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port)
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import ijson
 import requests
 from dotenv import load_dotenv
 
@@ -8,8 +9,54 @@ OTX_BASE = "https://otx.alienvault.com/api/v1"
 HEADERS = {"X-OTX-API-KEY": OTX_API_KEY}
 
 def fetch_indicators(indicator_type, limit=500):
+    # Yields one indicator per line as the export body streams in
     url = f"{OTX_BASE}/indicators/export"
     params = {"type": indicator_type, "limit": limit}
-    r = requests.get(url, headers=HEADERS, params=params, timeout=10)
-    r.raise_for_status()
-    return r.text.splitlines()
+    with requests.get(url, headers=HEADERS, params=params, timeout=10, stream=True) as r:
+        r.raise_for_status()
+        r.encoding = r.encoding or "utf-8"
+        for line in r.iter_lines(decode_unicode=True):
+            if line:
+                yield line
+
+# --------------------------
+# Streaming Pulse Parser
+# --------------------------
+def _iter_page_pulses(raw, page):
+    # Event-based parse of {"results": [pulse, ...], "next": url, ...}: only
+    # the pulse currently being built is held in memory.
+    builder = None
+    for prefix, event, value in ijson.parse(raw, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == "results.item" and event == "end_map":
+                yield builder.value
+                builder = None
+        elif prefix == "results.item" and event == "start_map":
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == "next" and event == "string":
+            page["next"] = value
+
+def iter_otx_pulses(limit=100, pages=1):
+    if not OTX_API_KEY:
+        raise RuntimeError("OTX_API_KEY environment variable is required!")
+    headers = {"X-OTX-API-KEY": OTX_API_KEY, "Accept": "application/json"}
+    url = f"{OTX_BASE}/pulses/subscribed"
+    params = {"limit": limit}
+    for _ in range(pages):
+        page = {"next": None}
+        try:
+            with requests.get(url, headers=headers, params=params, timeout=10, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                yield from _iter_page_pulses(response.raw, page)
+        except Exception as e:
+            print("OTX Fetch Error:", e)
+            return
+        if not page["next"]:
+            return
+        url, params = page["next"], None
+
+def fetch_otx_pulses(limit=100):
+    return list(iter_otx_pulses(limit=limit))
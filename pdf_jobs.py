@@ -0,0 +1,125 @@
+import os
+import json
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# --------------------------
+# PDF Job Config
+# --------------------------
+JOB_DIR = os.environ.get("PDF_JOB_DIR", os.path.join("exports", "pdf", "jobs"))
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "2"))      # concurrent renders
+MAX_PENDING = int(os.environ.get("PDF_MAX_PENDING", "8"))  # queued + running, per web worker
+JOB_TTL_SECONDS = 3600
+
+KINDS = ("weekly", "history")
+
+class PoolBusy(RuntimeError):
+    pass
+
+# --------------------------
+# Renderer (runs in the pool)
+# --------------------------
+# ReportLab holds the GIL for the whole document build, so renders happen in
+# separate processes and the web worker only waits on a future or a file.
+# Job state lives next to the output (<id>.json / .pdf / .err) so any web
+# worker can answer a poll, not just the one that took the submit.
+
+def _path(job_id, ext):
+    return os.path.join(JOB_DIR, f"{job_id}.{ext}")
+
+def render_job(job_id, kind, since=None, until=None, include_archived=False, country=None):
+    from reports import build_pdf_report, build_history_pdf
+    from countries import DEFAULT_COUNTRY
+    country = country or DEFAULT_COUNTRY
+    try:
+        if kind == "history":
+            content = build_history_pdf(since=since, until=until, include_archived=include_archived,
+                                        country=country)
+        else:
+            content = build_pdf_report(country=country)
+        tmp = _path(job_id, "pdf.tmp")
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, _path(job_id, "pdf"))
+        return len(content)
+    except Exception as e:
+        with open(_path(job_id, "err"), "w") as f:
+            f.write(str(e))
+        raise
+
+# --------------------------
+# Pool
+# --------------------------
+_pool = None
+_pending = set()
+_lock = threading.Lock()
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: forking a threaded web worker can copy held locks
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def submit(kind="weekly", since=None, until=None, include_archived=False, country=None):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown report kind: {kind}")
+    os.makedirs(JOB_DIR, exist_ok=True)
+    with _lock:
+        if len(_pending) >= MAX_PENDING:
+            raise PoolBusy("Too many PDF reports in progress")
+        job_id = uuid.uuid4().hex
+        with open(_path(job_id, "json"), "w") as f:
+            json.dump({"kind": kind, "since": since, "until": until, "country": country,
+                       "include_archived": include_archived, "created": time.time()}, f)
+        future = _get_pool().submit(render_job, job_id, kind, since, until, include_archived, country)
+        _pending.add(future)
+    future.add_done_callback(_finished)
+    _cleanup()
+    return job_id, future
+
+def _finished(future):
+    with _lock:
+        _pending.discard(future)
+
+def status(job_id):
+    if not job_id.isalnum() or not os.path.exists(_path(job_id, "json")):
+        return None
+    if os.path.exists(_path(job_id, "pdf")):
+        return {"job": job_id, "status": "done"}
+    if os.path.exists(_path(job_id, "err")):
+        with open(_path(job_id, "err")) as f:
+            return {"job": job_id, "status": "failed", "error": f.read()}
+    return {"job": job_id, "status": "pending"}
+
+def result_path(job_id):
+    return _path(job_id, "pdf")
+
+def render_now(kind="weekly", since=None, until=None, country=None):
+    # Blocking convenience for the synchronous /report/pdf route
+    job_id, future = submit(kind, since, until, country=country)
+    future.result()
+    with open(result_path(job_id), "rb") as f:
+        return f.read()
+
+def _cleanup():
+    # Finished jobs are dropped with their files once the TTL has passed since
+    # they finished (the .pdf/.err mtime); pending and running jobs are kept
+    # however long they have been queued.
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for name in os.listdir(JOB_DIR):
+        job_id, _, ext = name.partition(".")
+        if ext not in ("pdf", "err"):
+            continue
+        try:
+            if os.path.getmtime(os.path.join(JOB_DIR, name)) >= cutoff:
+                continue
+            for ext in ("pdf", "err", "json"):
+                if os.path.exists(_path(job_id, ext)):
+                    os.remove(_path(job_id, ext))
+        except OSError:
+            pass
@@ -0,0 +1,226 @@
+import io
+import os
+import csv
+import json
+import urllib.request
+from datetime import datetime, timedelta
+from db import get_db_connection
+from lifecycle import threat_source
+from countries import DEFAULT_COUNTRY, country_name
+
+# Formatted with the report's country name, e.g. "Malaysia"
+REPORT_TITLE = "Sunday Ring With Red Shark - Top 10 {country} Weekly Threat Report"
+HISTORY_TITLE = "Sunday Ring With Red Shark - {country} Threat History"
+LOGO_URL = "https://raw.githubusercontent.com/redsharknetworks/sunday-ring/main/redshark.png"
+LOGO_FILE = "redshark.png"
+
+# --------------------------
+# Weekly Top 10 Threats
+# --------------------------
+def get_weekly_top10(country=DEFAULT_COUNTRY):
+    conn = get_db_connection()
+    one_week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
+    rows = conn.execute("""
+        SELECT ioc_text(indicator) AS indicator, indicator_type, threat_score, pulse_name
+        FROM malaysia_targeted_threats
+        WHERE country = ? AND pulse_created >= ?
+        ORDER BY threat_score DESC
+        LIMIT 100
+    """, (country, one_week_ago)).fetchall()
+    conn.close()
+    result = {"ips": [], "domains": [], "hashes": []}
+    for row in rows:
+        r = dict(row)
+        t = r["indicator_type"]
+        if t in ["IPv4", "IPv6"]:
+            result["ips"].append(r)
+        elif t == "domain":
+            result["domains"].append(r)
+        elif "FileHash" in t:
+            result["hashes"].append(r)
+    result["ips"] = result["ips"][:10]
+    result["domains"] = result["domains"][:10]
+    result["hashes"] = result["hashes"][:10]
+    return result
+
+# --------------------------
+# Full History
+# --------------------------
+def get_history(since=None, until=None, include_archived=False, country=DEFAULT_COUNTRY):
+    # Every stored threat in [since, until), newest first
+    conn = get_db_connection()
+    rows = conn.execute(f"""
+        SELECT pulse_created, ioc_text(indicator) AS indicator, indicator_type,
+               threat_score, pulse_name
+        FROM {threat_source(conn, include_archived)}
+        WHERE country = ? AND pulse_created >= COALESCE(?, '') AND pulse_created < COALESCE(?, '9999')
+        ORDER BY pulse_created DESC, id DESC
+    """, (country, since, until)).fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+# --------------------------
+# JSON Report
+# --------------------------
+def build_json_report(data=None, country=DEFAULT_COUNTRY):
+    return {
+        "title": REPORT_TITLE.format(country=country_name(country)),
+        "country": country,
+        "report": data if data is not None else get_weekly_top10(country)
+    }
+
+# --------------------------
+# CSV Report
+# --------------------------
+def build_csv_report(data=None, country=DEFAULT_COUNTRY):
+    data = data if data is not None else get_weekly_top10(country)
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow([REPORT_TITLE.format(country=country_name(country))])
+    writer.writerow([])
+    writer.writerow(["Category", "Indicator", "Threat Score", "Pulse Name"])
+    for category, items in data.items():
+        for item in items:
+            writer.writerow([
+                category,
+                item["indicator"],
+                item["threat_score"],
+                item["pulse_name"]
+            ])
+    return output.getvalue().encode()
+
+# --------------------------
+# Logo
+# --------------------------
+def _load_logo():
+    if os.path.exists(LOGO_FILE):
+        with open(LOGO_FILE, "rb") as f:
+            return f.read()
+    return urllib.request.urlopen(LOGO_URL).read()
+
+# --------------------------
+# PDF Report with RedShark Logo
+# --------------------------
+def build_pdf_report(data=None, country=DEFAULT_COUNTRY):
+    # ReportLab is only needed here, so it is not imported for CLI ingest runs
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Image
+    from reportlab.lib import colors, pagesizes
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    data = data if data is not None else get_weekly_top10(country)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=pagesizes.A4)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # RedShark Logo (the checked-in copy avoids a network fetch per report)
+    logo_file = io.BytesIO(_load_logo())
+    logo_img = Image(logo_file, width=120, height=60)
+    elements.append(logo_img)
+    elements.append(Spacer(1, 12))
+
+    # Title
+    elements.append(Paragraph(REPORT_TITLE.format(country=country_name(country)), styles["Heading1"]))
+    elements.append(Spacer(1, 12))
+
+    # Table
+    table_data = [["Category", "Indicator", "Threat Score"]]
+    for category, items in data.items():
+        for item in items:
+            table_data.append([category, item["indicator"], str(item["threat_score"])])
+
+    table = Table(table_data, hAlign='LEFT')
+    table.setStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.grey),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ])
+    elements.append(table)
+    elements.append(Spacer(1, 24))
+
+    # Footer contact info
+    elements.append(Paragraph("Contact: darkgrid@redshark.my", styles["Normal"]))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+# --------------------------
+# Multi-page History PDF
+# --------------------------
+PULSE_NAME_CHARS = 60
+
+def build_history_pdf(rows=None, since=None, until=None, include_archived=False,
+                      country=DEFAULT_COUNTRY):
+    # LongTable splits thousands of rows across pages faster than Table and
+    # repeats the header row on every page. Memory still grows with the
+    # range: get_history loads every row and the document is built in memory,
+    # which is why these reports render in the pdf_jobs pool.
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, LongTable, Image
+    from reportlab.lib import colors, pagesizes
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    rows = rows if rows is not None else get_history(since, until, include_archived, country)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=pagesizes.landscape(pagesizes.A4))
+    styles = getSampleStyleSheet()
+
+    def footer(canvas, doc):
+        canvas.setFont("Helvetica", 8)
+        canvas.drawRightString(doc.pagesize[0] - 36, 20, f"Page {doc.page}")
+
+    period = f"{since or 'start'} to {until or 'now'}"
+    elements = [
+        Image(io.BytesIO(_load_logo()), width=120, height=60),
+        Spacer(1, 12),
+        Paragraph(HISTORY_TITLE.format(country=country_name(country)), styles["Heading1"]),
+        Paragraph(f"{period} - {len(rows)} indicators", styles["Normal"]),
+        Spacer(1, 12),
+    ]
+
+    table_data = [["Created", "Indicator", "Type", "Score", "Pulse Name"]]
+    for r in rows:
+        name = r["pulse_name"] or ""
+        if len(name) > PULSE_NAME_CHARS:
+            name = name[:PULSE_NAME_CHARS - 3] + "..."
+        table_data.append([
+            (r["pulse_created"] or "")[:10], r["indicator"], r["indicator_type"],
+            str(r["threat_score"]), name
+        ])
+
+    table = LongTable(table_data, repeatRows=1, hAlign='LEFT')
+    table.setStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.grey),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,-1), 8),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ])
+    elements.append(table)
+    elements.append(Spacer(1, 24))
+    elements.append(Paragraph("Contact: darkgrid@redshark.my", styles["Normal"]))
+
+    doc.build(elements, onFirstPage=footer, onLaterPages=footer)
+    return buffer.getvalue()
+
+# --------------------------
+# Report Files
+# --------------------------
+def write_report(fmt, path, history=False, since=None, until=None, country=DEFAULT_COUNTRY):
+    if history:
+        if fmt != "pdf":
+            raise ValueError("History reports are only available as PDF")
+        content = build_history_pdf(since=since, until=until, country=country)
+    elif fmt == "json":
+        content = json.dumps(build_json_report(country=country), indent=2).encode()
+    elif fmt == "csv":
+        content = build_csv_report(country=country)
+    elif fmt == "pdf":
+        content = build_pdf_report(country=country)
+    else:
+        raise ValueError(f"Unknown report format: {fmt}")
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
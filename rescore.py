@@ -0,0 +1,138 @@
+import time
+import sqlite3
+from datetime import datetime
+from db import DATABASE_FILE, bump_dataset_version
+from scoring import get_engine, ScoringBatch
+from indicators import register_functions
+
+# --------------------------
+# Backfill Config
+# --------------------------
+JOB_NAME = "rescore"
+CHUNK_ROWS = 2000
+PAUSE_SECONDS = 0.05     # gap between chunks so readers are never starved
+PROGRESS_EVERY = 25      # chunks
+BUSY_TIMEOUT_MS = 5000
+
+# --------------------------
+# Checkpoints
+# --------------------------
+def _ensure_checkpoint_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job TEXT PRIMARY KEY,
+            last_id INTEGER,
+            version TEXT,
+            updated_at TEXT
+        )
+    """)
+    conn.commit()
+
+def _load_checkpoint(conn, version):
+    row = conn.execute(
+        "SELECT last_id, version FROM job_checkpoints WHERE job = ?", (JOB_NAME,)
+    ).fetchone()
+    # A checkpoint written under other rules is useless: start over
+    if row is None or row[1] != version:
+        return 0
+    return row[0]
+
+def _save_checkpoint(conn, last_id, version):
+    conn.execute("""
+        INSERT INTO job_checkpoints (job, last_id, version, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(job) DO UPDATE SET
+            last_id = excluded.last_id,
+            version = excluded.version,
+            updated_at = excluded.updated_at
+    """, (JOB_NAME, last_id, version, datetime.utcnow().isoformat()))
+
+# --------------------------
+# Pulse Reconstruction
+# --------------------------
+def _load_pulses(conn, keys):
+    # Rows only carry pulse fields, so a pulse is every row sharing
+    # (pulse_created, pulse_name, pulse_author). DISTINCT folds the copies
+    # stored for each country back into one indicator.
+    conn.execute("DELETE FROM temp.rescore_keys")
+    conn.executemany("INSERT INTO temp.rescore_keys VALUES (?, ?, ?)", keys)
+    return conn.execute("""
+        SELECT DISTINCT t.pulse_created, t.pulse_name, t.pulse_author, t.pulse_description,
+               ioc_text(t.indicator), t.indicator_type, t.domain_rkey
+        FROM temp.rescore_keys k
+        JOIN malaysia_targeted_threats t
+          ON t.pulse_created IS k.created AND t.pulse_name IS k.name AND t.pulse_author IS k.author
+    """).fetchall()
+
+def _score_keys(engine, keys, rows):
+    index = {key: i for i, key in enumerate(keys)}
+    texts, authors = [""] * len(keys), [""] * len(keys)
+    ind_pulse, ind_values, ind_types, ind_rkeys = [], [], [], []
+    for created, name, author, description, indicator, ind_type, rkey in rows:
+        i = index[(created, name, author)]
+        texts[i] = ((name or "") + " " + (description or "")).lower()
+        authors[i] = author or ""
+        ind_pulse.append(i)
+        ind_values.append((indicator or "").lower())
+        ind_types.append(ind_type or "")
+        ind_rkeys.append(rkey or "")
+    results = engine.score(ScoringBatch(texts, authors, ind_pulse, ind_values, ind_types,
+                                        ind_rkeys=ind_rkeys))
+    # {(country, created, name, author): total}
+    return {(country, *key): int(result.totals[i])
+            for country, result in results.items() for key, i in index.items()}
+
+# --------------------------
+# Backfill Job
+# --------------------------
+def rescore_threats(chunk_rows=CHUNK_ROWS, pause=PAUSE_SECONDS, restart=False, progress=print):
+    # Walks the table in primary-key order, one short transaction per chunk.
+    # Rows are re-scored but never dropped, even if they now fall below
+    # min_score, and rows for a country whose profile was removed are left
+    # alone. A pulse is not stored for newly added profiles until it arrives
+    # again in an ingest.
+    engine = get_engine()
+    conn = register_functions(sqlite3.connect(DATABASE_FILE, timeout=BUSY_TIMEOUT_MS / 1000))
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    _ensure_checkpoint_table(conn)
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS rescore_keys (created TEXT, name TEXT, author TEXT)")
+
+    last_id = 0 if restart else _load_checkpoint(conn, engine.version)
+    scanned = updated = chunks = 0
+    try:
+        while True:
+            chunk = conn.execute("""
+                SELECT id, country, pulse_created, pulse_name, pulse_author, threat_score
+                FROM malaysia_targeted_threats
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, chunk_rows)).fetchall()
+            if not chunk:
+                break
+
+            keys = list(dict.fromkeys((c, n, a) for _, _, c, n, a, _ in chunk))
+            scores = _score_keys(engine, keys, _load_pulses(conn, keys))
+            changes = [
+                (scores[(cc, c, n, a)], row_id)
+                for row_id, cc, c, n, a, old in chunk
+                if scores.get((cc, c, n, a), old) != old
+            ]
+            last_id = chunk[-1][0]
+            with conn:
+                conn.executemany(
+                    "UPDATE malaysia_targeted_threats SET threat_score = ? WHERE id = ?", changes)
+                if changes:
+                    bump_dataset_version(conn)
+                _save_checkpoint(conn, last_id, engine.version)
+
+            scanned += len(chunk)
+            updated += len(changes)
+            chunks += 1
+            if progress and chunks % PROGRESS_EVERY == 0:
+                progress(f"Rescored through id {last_id}: {scanned} scanned, {updated} updated")
+            if pause:
+                time.sleep(pause)
+    finally:
+        conn.close()
+    return {"scanned": scanned, "updated": updated, "last_id": last_id, "version": engine.version}
@@ -0,0 +1,128 @@
+import os
+import time
+import asyncio
+import threading
+
+# --------------------------
+# Resolver Config
+# --------------------------
+# DNS_NAMESERVERS="127.0.0.1:5353,[::1]:53" replaces /etc/resolv.conf, e.g.
+# with a resolver that does not forward the lookups of malicious domains to
+# their owners' logs.
+# Copied to threat/src by sync_copies.py; edit this root module.
+NAMESERVERS = [s.strip() for s in os.environ.get("DNS_NAMESERVERS", "").split(",") if s.strip()]
+CONCURRENCY = int(os.environ.get("DNS_CONCURRENCY", "200"))   # names in flight
+TIMEOUT = float(os.environ.get("DNS_TIMEOUT", "2.0"))         # seconds per name
+
+RECORD_TYPES = ("A", "AAAA")
+MIN_TTL = 30
+MAX_TTL = 86400
+NEGATIVE_TTL = 300          # NXDOMAIN / no records, when the SOA gives no TTL
+FAILURE_TTL = 60            # timeouts and SERVFAIL
+CACHE_SIZE = 200000
+
+# --------------------------
+# Answer Cache
+# --------------------------
+# name -> (expires, (ip, ...)); an empty tuple is a cached negative answer.
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _normalize(name):
+    return (name or "").strip().rstrip(".").lower()
+
+def _parse_server(server):
+    # "1.1.1.1", "127.0.0.1:5353", "[::1]:5353" -> (address, port)
+    if server.startswith("["):
+        host, _, port = server[1:].partition("]")
+        return host, int(port.lstrip(":") or 53)
+    if server.count(":") == 1:
+        host, port = server.split(":")
+        return host, int(port)
+    return server, 53
+
+def _make_resolver():
+    import dns.asyncresolver
+    import dns.nameserver
+    resolver = dns.asyncresolver.Resolver(configure=not NAMESERVERS)
+    if NAMESERVERS:
+        resolver.nameservers = [dns.nameserver.Do53Nameserver(*_parse_server(s)) for s in NAMESERVERS]
+    # Half the budget per try leaves room to resend one dropped UDP query
+    resolver.timeout = TIMEOUT / 2
+    resolver.lifetime = TIMEOUT
+    return resolver
+
+def _negative_ttl(response):
+    # RFC 2308: min(SOA TTL, SOA MINIMUM) from the authority section
+    import dns.rdatatype
+    for rrset in getattr(response, "authority", None) or []:
+        if rrset.rdtype == dns.rdatatype.SOA and len(rrset):
+            return min(rrset.ttl, rrset[0].minimum)
+    return NEGATIVE_TTL
+
+# --------------------------
+# Async Lookups
+# --------------------------
+async def _query(resolver, name, rdtype):
+    # ([addresses], ttl, positive?)
+    import dns.exception
+    import dns.resolver
+    try:
+        answer = await resolver.resolve(name, rdtype, search=False, raise_on_no_answer=False)
+    except dns.resolver.NXDOMAIN as e:
+        responses = list(e.responses().values())
+        return [], _negative_ttl(responses[0] if responses else None), False
+    except dns.exception.DNSException:
+        return [], FAILURE_TTL, False
+    if answer.rrset is None:
+        return [], _negative_ttl(answer.response), False
+    return [r.address for r in answer.rrset], answer.rrset.ttl, True
+
+async def _lookup(resolver, semaphore, name):
+    async with semaphore:
+        answers = await asyncio.gather(*(_query(resolver, name, t) for t in RECORD_TYPES))
+    ips = tuple(ip for addresses, _, _ in answers for ip in addresses)
+    ttls = [ttl for _, ttl, ok in answers if ok] or [ttl for _, ttl, _ in answers]
+    return name, ips, max(MIN_TTL, min(min(ttls), MAX_TTL))
+
+async def resolve_domains_async(names):
+    # {name: (ip, ...)} for the names that have A/AAAA records. Answers are
+    # cached for their TTL, empty ones (NXDOMAIN, no records, failures) too.
+    wanted = {name: _normalize(name) for name in set(names) if _normalize(name)}
+    now = time.monotonic()
+    answers, missing = {}, set()
+    with _cache_lock:
+        for norm in set(wanted.values()):
+            hit = _cache.get(norm)
+            if hit and hit[0] > now:
+                answers[norm] = hit[1]
+            else:
+                missing.add(norm)
+
+    if missing:
+        try:
+            resolver = _make_resolver()
+        except ImportError:
+            # dnspython not installed: domains simply stay unresolved
+            resolver = None
+        if resolver is not None:
+            semaphore = asyncio.Semaphore(CONCURRENCY)
+            results = await asyncio.gather(*(_lookup(resolver, semaphore, n) for n in missing))
+            now = time.monotonic()
+            with _cache_lock:
+                if len(_cache) + len(results) > CACHE_SIZE:
+                    for key in [k for k, (expires, _) in _cache.items() if expires <= now]:
+                        del _cache[key]
+                    if len(_cache) + len(results) > CACHE_SIZE:
+                        _cache.clear()
+                for norm, ips, ttl in results:
+                    _cache[norm] = (now + ttl, ips)
+                    answers[norm] = ips
+
+    return {name: answers[norm] for name, norm in wanted.items() if answers.get(norm)}
+
+def resolve_domains(names):
+    # Blocking wrapper for worker threads (ingest stages, batch jobs)
+    if not names:
+        return {}
+    return asyncio.run(resolve_domains_async(names))
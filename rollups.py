@@ -0,0 +1,131 @@
+from indicators import IP_TYPES
+from geo import lookup_networks
+
+# --------------------------
+# Rollup Config
+# --------------------------
+# threat_rollups holds pre-aggregated counts as (country, dim, bucket, key)
+# -> count, per target country like the threat rows themselves. Time dims
+# bucket by pulse_created and key by indicator type; geo dims bucket by week
+# so charts can still pick a date range.
+ROLLUP_TABLE = "threat_rollups"
+
+_WEEK = "COALESCE(date(substr(pulse_created, 1, 10), '-6 days', 'weekday 1'), 'unknown')"
+
+ROLLUP_DIMS = {
+    "hour": ("COALESCE(substr(pulse_created, 1, 13), 'unknown')", "indicator_type", None),
+    "day": ("COALESCE(substr(pulse_created, 1, 10), 'unknown')", "indicator_type", None),
+    "week": (_WEEK, "indicator_type", None),
+    "country": (_WEEK, "geo_country", "geo_country IS NOT NULL"),
+    # States, cities and networks inside the target country itself
+    "state": (_WEEK, "geo_region", "geo_country = country AND geo_region IS NOT NULL"),
+    "city": (_WEEK, "geo_region || '/' || geo_city",
+             "geo_country = country AND geo_region IS NOT NULL AND geo_city IS NOT NULL"),
+    # Local networks hosting malicious IPs, keyed "AS4788 TM Net"
+    "asn": (_WEEK, "'AS' || geo_asn || COALESCE(' ' || geo_isp, '')",
+            "geo_country = country AND geo_asn IS NOT NULL"),
+}
+
+GEO_COLUMNS = {
+    "geo_country": "TEXT",
+    "geo_region": "TEXT",
+    "geo_city": "TEXT",
+    "geo_asn": "INTEGER",
+    "geo_isp": "TEXT",
+}
+
+def ensure_rollups(conn):
+    # True when the table is new and has to be filled from existing rows.
+    # Tables from before country profiles are dropped and refilled.
+    cols = [r[1] for r in conn.execute(f"PRAGMA table_info({ROLLUP_TABLE})")]
+    if cols and "country" not in cols:
+        conn.execute(f"DROP TABLE {ROLLUP_TABLE}")
+        cols = []
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            country TEXT NOT NULL,
+            dim TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (country, dim, bucket, key)
+        ) WITHOUT ROWID
+    """)
+    return not cols
+
+# --------------------------
+# Incremental Maintenance
+# --------------------------
+def apply_rollups(conn, row_filter="id > ?", params=(0,), sign=1, table="malaysia_targeted_threats"):
+    # Adds (or with sign=-1 subtracts) the rows matching row_filter. Run it in
+    # the same transaction as the insert/delete it accounts for.
+    for dim, (bucket, key, where) in ROLLUP_DIMS.items():
+        extra = f" AND {where}" if where else ""
+        conn.execute(f"""
+            INSERT INTO {ROLLUP_TABLE} (country, dim, bucket, key, count)
+            SELECT country, ?, {bucket}, COALESCE({key}, 'unknown'), ? * COUNT(*)
+            FROM {table}
+            WHERE {row_filter}{extra}
+            GROUP BY 1, 3, 4
+            ON CONFLICT (country, dim, bucket, key) DO UPDATE SET count = count + excluded.count
+        """, (dim, sign, *params))
+    if sign < 0:
+        conn.execute(f"DELETE FROM {ROLLUP_TABLE} WHERE count <= 0")
+
+def rebuild_rollups(conn, tables=("malaysia_targeted_threats",)):
+    conn.execute(f"DELETE FROM {ROLLUP_TABLE}")
+    for table in tables:
+        apply_rollups(conn, table=table)
+
+# --------------------------
+# Location Backfill
+# --------------------------
+def backfill_locations(conn, batch_rows=50000):
+    # Fills geo/ASN columns for stored IP rows that predate them (or newer
+    # MMDB files). Rollups must be rebuilt afterwards.
+    placeholders = ", ".join("?" * len(IP_TYPES))
+    # +indicator_type: page by rowid rather than through idx_threats_expiry
+    last_id = 0
+    while True:
+        rows = conn.execute(f"""
+            SELECT id, ioc_text(indicator) FROM malaysia_targeted_threats
+            WHERE id > ? AND +indicator_type IN ({placeholders})
+            ORDER BY id LIMIT ?
+        """, (last_id, *IP_TYPES, batch_rows)).fetchall()
+        if not rows:
+            break
+        networks = lookup_networks([ip for _, ip in rows])
+        conn.executemany("""
+            UPDATE malaysia_targeted_threats
+            SET geo_country = ?, geo_region = ?, geo_city = ?, geo_asn = ?, geo_isp = ?
+            WHERE id = ?
+        """, [(*networks[ip], row_id) for row_id, ip in rows if ip in networks])
+        conn.commit()
+        last_id = rows[-1][0]
+
+# --------------------------
+# Queries
+# --------------------------
+def query_rollup(conn, dim, country, since=None, until=None, key=None):
+    # {"bucket": .., "key": .., "count": ..} rows in bucket order
+    if dim not in ROLLUP_DIMS:
+        raise ValueError(f"Unknown rollup dimension: {dim}")
+    rows = conn.execute(f"""
+        SELECT bucket, key, count FROM {ROLLUP_TABLE}
+        WHERE country = ? AND dim = ? AND bucket >= COALESCE(?, '') AND bucket < COALESCE(?, '~')
+          AND (? IS NULL OR key = ?)
+        ORDER BY bucket, key
+    """, (country, dim, since, until, key, key)).fetchall()
+    return [{"bucket": b, "key": k, "count": c} for b, k, c in rows]
+
+def rollup_totals(conn, dim, country, since=None, until=None, limit=None):
+    # Counts per key summed over the buckets in range, largest first
+    if dim not in ROLLUP_DIMS:
+        raise ValueError(f"Unknown rollup dimension: {dim}")
+    rows = conn.execute(f"""
+        SELECT key, SUM(count) FROM {ROLLUP_TABLE}
+        WHERE country = ? AND dim = ? AND bucket >= COALESCE(?, '') AND bucket < COALESCE(?, '~')
+        GROUP BY key ORDER BY 2 DESC
+        LIMIT COALESCE(?, -1)
+    """, (country, dim, since, until, limit)).fetchall()
+    return {k: c for k, c in rows}
@@ -0,0 +1,275 @@
+import os
+import json
+import hashlib
+import numpy as np
+from domains import DOMAIN_TYPES, reverse_domain
+
+# --------------------------
+# Scoring Config
+# --------------------------
+RULES_FILE = os.environ.get("SCORING_RULES", "scoring_rules.json")
+
+IP_TYPES = ("IPv4", "IPv6")
+
+# --------------------------
+# Batch Input
+# --------------------------
+class ScoringBatch:
+    # Column arrays for a batch of pulses and their flattened indicators.
+    # ind_pulse maps every indicator row back to its pulse row.
+    def __init__(self, texts, authors, ind_pulse, ind_values, ind_types,
+                 ind_countries=None, ind_asns=None, ind_rkeys=None, ind_hosted=None):
+        self.texts = np.asarray(texts, dtype=str)
+        self.authors = np.asarray(authors, dtype=object)
+        self.ind_pulse = np.asarray(ind_pulse, dtype=np.int64)
+        self.ind_values = np.asarray(ind_values, dtype=str)
+        self.ind_types = np.asarray(ind_types, dtype=str)
+        self.ind_countries = ind_countries
+        self.ind_asns = ind_asns
+        # frozenset of countries a domain's A/AAAA records geolocate to
+        self.ind_hosted = ind_hosted
+        self.ind_rkeys = None if ind_rkeys is None else np.asarray(ind_rkeys, dtype=str)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def rkeys(self):
+        # Reversed domain keys ("my.gov.agency."), "" for non-domain types
+        if self.ind_rkeys is None:
+            self.ind_rkeys = np.array(
+                [reverse_domain(v) or "" if t in DOMAIN_TYPES else ""
+                 for v, t in zip(self.ind_values.tolist(), self.ind_types.tolist())], dtype=str)
+        return self.ind_rkeys
+
+    @classmethod
+    def from_pulses(cls, pulses):
+        texts, authors = [], []
+        ind_pulse, ind_values, ind_types = [], [], []
+        for i, pulse in enumerate(pulses):
+            texts.append(((pulse.get("name") or "") + " " + (pulse.get("description") or "")).lower())
+            authors.append(pulse.get("author") or "")
+            for ind in pulse.get("indicators") or []:
+                ind_pulse.append(i)
+                ind_values.append((ind.get("indicator") or "").lower())
+                ind_types.append(ind.get("type") or "")
+        return cls(texts, authors, ind_pulse, ind_values, ind_types)
+
+# --------------------------
+# Rule Evaluation
+# --------------------------
+# Each rule returns one contribution per pulse in the batch.
+
+def _per_pulse(batch, mask, weight):
+    return np.bincount(batch.ind_pulse[mask], minlength=len(batch)) * weight
+
+def _rule_keyword(rule, batch):
+    total = np.zeros(len(batch))
+    for kw in rule["keywords"]:
+        total += np.char.find(batch.texts, kw.lower()) >= 0
+    return total * rule["weight"]
+
+def _rule_tld_suffix(rule, batch):
+    # Suffix ".com.my" is the reversed-key prefix "my.com.", the same range
+    # the domain_rkey index serves for zone queries.
+    rkeys = batch.rkeys()
+    mask = np.zeros(len(rkeys), dtype=bool)
+    for suffix in rule["suffixes"]:
+        prefix = reverse_domain(suffix)
+        match = np.char.startswith(rkeys, prefix)
+        if suffix.startswith("."):
+            # ".my" means strictly below the zone, like str.endswith(".my")
+            match &= np.char.str_len(rkeys) > len(prefix)
+        mask |= match
+    if rule.get("indicator_types"):
+        mask &= np.isin(batch.ind_types, rule["indicator_types"])
+    return _per_pulse(batch, mask, rule["weight"])
+
+def _rule_geo_ip(rule, batch):
+    # "resolve_domains": true also counts domains hosted in those countries
+    mask = np.zeros(len(batch.ind_values), dtype=bool)
+    if batch.ind_countries is not None:
+        mask |= np.isin(batch.ind_countries, rule["countries"])
+    if rule.get("resolve_domains") and batch.ind_hosted is not None:
+        countries = set(rule["countries"])
+        mask |= np.fromiter((not countries.isdisjoint(h) for h in batch.ind_hosted),
+                            dtype=bool, count=len(mask))
+    return _per_pulse(batch, mask, rule["weight"])
+
+def _rule_asn(rule, batch):
+    if batch.ind_asns is None:
+        return np.zeros(len(batch))
+    mask = np.isin(batch.ind_asns, rule["asns"])
+    return _per_pulse(batch, mask, rule["weight"])
+
+def _rule_author(rule, batch):
+    weights = rule.get("authors") or {}
+    if not weights:
+        return np.zeros(len(batch))
+    lookup = np.vectorize(lambda a: weights.get(a, 0), otypes=[float])
+    return lookup(batch.authors) if len(batch) else np.zeros(0)
+
+RULE_TYPES = {
+    "keyword": _rule_keyword,
+    "tld_suffix": _rule_tld_suffix,
+    "geo_ip": _rule_geo_ip,
+    "asn": _rule_asn,
+    "author": _rule_author,
+}
+
+def _map_values(values, mask, mapping, default, dtype):
+    # Looks up each distinct value once and broadcasts back to every row
+    out = np.full(len(values), default, dtype=dtype)
+    if mapping and mask.any():
+        uniq, inverse = np.unique(values[mask], return_inverse=True)
+        out[mask] = np.array([mapping.get(u, default) for u in uniq.tolist()], dtype=dtype)[inverse]
+    return out
+
+# --------------------------
+# Score Result
+# --------------------------
+class ScoreResult:
+    def __init__(self, rule_names, contributions):
+        self.rule_names = rule_names
+        self.contributions = contributions          # shape (pulses, rules)
+        self.totals = contributions.sum(axis=1).astype(np.int64)
+
+    def explain(self, i):
+        return {name: int(v) for name, v in zip(self.rule_names, self.contributions[i]) if v}
+
+# --------------------------
+# Country Profiles
+# --------------------------
+# scoring_rules.json lists one profile per target country:
+#   "SG": {"keywords": [...], "suffixes": [".sg"], "asns": [...], "weights": {...}}
+# Each profile expands into the five rule types above, with the top-level
+# "weights" as defaults. A profile with its own "rules" list is used as-is,
+# and a legacy top-level "rules" list is the DEFAULT_COUNTRY profile.
+DEFAULT_WEIGHTS = {"keyword": 3, "tld_suffix": 4, "geo_ip": 4, "asn": 2}
+
+def _profile_rules(code, profile, config):
+    if "rules" in profile:
+        return profile["rules"]
+    weights = {**DEFAULT_WEIGHTS, **config.get("weights", {}), **profile.get("weights", {})}
+    prefix = code.lower()
+    return [
+        {"name": "keyword", "type": "keyword", "weight": weights["keyword"],
+         "keywords": profile.get("keywords", [])},
+        {"name": f"{prefix}_domain", "type": "tld_suffix", "weight": weights["tld_suffix"],
+         "suffixes": profile.get("suffixes", [f".{prefix}"]), "indicator_types": ["domain"]},
+        {"name": f"{prefix}_ip", "type": "geo_ip", "weight": weights["geo_ip"],
+         "countries": [code],
+         "resolve_domains": profile.get("resolve_domains", config.get("resolve_domains", False))},
+        {"name": f"{prefix}_asn", "type": "asn", "weight": weights["asn"],
+         "asns": profile.get("asns", [])},
+        {"name": "author", "type": "author",
+         "authors": profile.get("authors", config.get("authors", {}))},
+    ]
+
+def load_profiles(config):
+    from countries import DEFAULT_COUNTRY, parse_country
+    if "profiles" not in config:
+        return {DEFAULT_COUNTRY: config["rules"]}
+    return {
+        parse_country(code): _profile_rules(parse_country(code), profile, config)
+        for code, profile in config["profiles"].items()
+    }
+
+# --------------------------
+# Scoring Engine
+# --------------------------
+class ScoringEngine:
+    # profiles: {country code: [rule, ...]}. score() evaluates every profile
+    # over the batch in one pass: enrichment (GeoIP, DNS) runs once, and a
+    # rule that several profiles share (e.g. the author rule) is computed once.
+    def __init__(self, profiles, min_score=1):
+        for rules in profiles.values():
+            for rule in rules:
+                if rule["type"] not in RULE_TYPES:
+                    raise ValueError(f"Unknown scoring rule type: {rule['type']}")
+        self.profiles = profiles
+        self.min_score = min_score
+        self.rules = [rule for rules in profiles.values() for rule in rules]
+        self.version = hashlib.sha1(
+            json.dumps({"profiles": profiles, "min_score": min_score}, sort_keys=True).encode()
+        ).hexdigest()[:12]
+
+    @classmethod
+    def from_file(cls, path=RULES_FILE, resolve_domains=None):
+        # resolve_domains=True/False overrides every profile for one run
+        with open(path) as f:
+            config = json.load(f)
+        if resolve_domains is not None:
+            config["resolve_domains"] = resolve_domains
+            for profile in config.get("profiles", {}).values():
+                profile["resolve_domains"] = resolve_domains
+        return cls(load_profiles(config), config.get("min_score", 1))
+
+    @property
+    def countries(self):
+        return list(self.profiles)
+
+    def rule_names(self, country):
+        return [rule["name"] for rule in self.profiles[country]]
+
+    def needs(self, rule_type):
+        return any(rule["type"] == rule_type for rule in self.rules)
+
+    def resolves_domains(self):
+        return any(rule["type"] == "geo_ip" and rule.get("resolve_domains") for rule in self.rules)
+
+    def enrich(self, batch):
+        # Geo/ASN columns are only looked up when a rule uses them
+        if not (self.needs("geo_ip") or self.needs("asn")):
+            return batch
+        import geo
+        is_ip = np.isin(batch.ind_types, IP_TYPES)
+        ips = batch.ind_values[is_ip].tolist()
+        if self.needs("geo_ip") and batch.ind_countries is None:
+            batch.ind_countries = _map_values(
+                batch.ind_values, is_ip, geo.lookup_countries(ips), "", "<U2")
+        if self.needs("asn") and batch.ind_asns is None:
+            batch.ind_asns = _map_values(
+                batch.ind_values, is_ip, geo.lookup_asns(ips), 0, np.int64)
+        if self.resolves_domains() and batch.ind_hosted is None:
+            is_domain = np.isin(batch.ind_types, DOMAIN_TYPES)
+            located = geo.locate_domains(np.unique(batch.ind_values[is_domain]).tolist())
+            hosted = {name: frozenset(net[0] for net in nets if net[0]) for name, nets in located.items()}
+            batch.ind_hosted = _map_values(batch.ind_values, is_domain, hosted, frozenset(), object)
+        return batch
+
+    def score(self, batch):
+        # {country: ScoreResult} in profile order
+        batch = self.enrich(batch)
+        computed = {}
+        results = {}
+        for country, rules in self.profiles.items():
+            contributions = np.zeros((len(batch), len(rules)))
+            for j, rule in enumerate(rules):
+                key = json.dumps({k: v for k, v in rule.items() if k != "name"}, sort_keys=True)
+                if key not in computed:
+                    computed[key] = RULE_TYPES[rule["type"]](rule, batch)
+                contributions[:, j] = computed[key]
+            results[country] = ScoreResult(self.rule_names(country), contributions)
+        return results
+
+    def score_pulses(self, pulses):
+        return self.score(ScoringBatch.from_pulses(pulses))
+
+_engine = None
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = ScoringEngine.from_file()
+    return _engine
+
+# --------------------------
+# Compute Country Score
+# --------------------------
+def compute_country_score(pulse, country=None):
+    from countries import DEFAULT_COUNTRY
+    result = get_engine().score_pulses([pulse]).get(country or DEFAULT_COUNTRY)
+    return 0 if result is None else int(result.totals[0])
+
+def compute_malaysia_score(pulse):
+    return compute_country_score(pulse, "MY")
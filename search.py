@@ -0,0 +1,110 @@
+import re
+
+# --------------------------
+# Full-Text Search Config
+# --------------------------
+FTS_TABLE = "threats_fts"
+NAME_WEIGHT = 5.0          # bm25 weight of pulse_name relative to description
+MAX_LIMIT = 100
+
+# --------------------------
+# Index Setup
+# --------------------------
+def ensure_search_index(conn):
+    # External-content FTS5 table: the text lives once in the main table and
+    # the triggers keep the index in step with every write path.
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+    ).fetchone()
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            pulse_name, pulse_description,
+            content='malaysia_targeted_threats', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS threats_fts_ai AFTER INSERT ON malaysia_targeted_threats BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, pulse_name, pulse_description)
+            VALUES (new.id, new.pulse_name, new.pulse_description);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS threats_fts_ad AFTER DELETE ON malaysia_targeted_threats BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, pulse_name, pulse_description)
+            VALUES ('delete', old.id, old.pulse_name, old.pulse_description);
+        END
+    """)
+    # Score-only updates (rescore) leave the index alone
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS threats_fts_au
+        AFTER UPDATE OF pulse_name, pulse_description ON malaysia_targeted_threats BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, pulse_name, pulse_description)
+            VALUES ('delete', old.id, old.pulse_name, old.pulse_description);
+            INSERT INTO {FTS_TABLE} (rowid, pulse_name, pulse_description)
+            VALUES (new.id, new.pulse_name, new.pulse_description);
+        END
+    """)
+    if not exists:
+        rebuild_search_index(conn)
+
+def rebuild_search_index(conn):
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+# --------------------------
+# Query Building
+# --------------------------
+def build_match_query(text):
+    # Free text -> quoted FTS5 terms ANDed together; the last term is a
+    # prefix so "mayb" finds "maybank". Quoting keeps user input from being
+    # parsed as FTS5 syntax.
+    terms = re.findall(r"\w+", text or "", flags=re.UNICODE)
+    if not terms:
+        return None
+    quoted = ['"' + t.replace('"', '""') + '"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+def _encode_cursor(score, row_id):
+    return f"{score!r}:{row_id}"
+
+def _decode_cursor(cursor):
+    score, row_id = cursor.rsplit(":", 1)
+    return float(score), int(row_id)
+
+# --------------------------
+# Search
+# --------------------------
+def search_threats(conn, text, country, limit=20, cursor=None):
+    # Ranked by bm25 (lower is better), then id; paged by keyset cursor
+    match = build_match_query(text)
+    if match is None:
+        return {"results": [], "next_cursor": None}
+    limit = max(1, min(int(limit), MAX_LIMIT))
+
+    where = f"{FTS_TABLE} MATCH ? AND t.country = ?"
+    params = [match, country]
+    if cursor:
+        score, row_id = _decode_cursor(cursor)
+        where += " AND (score > ? OR (score = ? AND t.id > ?))"
+        params += [score, score, row_id]
+
+    rows = conn.execute(f"""
+        SELECT t.id, t.country, ioc_text(t.indicator) AS indicator, t.indicator_type, t.pulse_name, t.pulse_author,
+               t.pulse_created, t.threat_score,
+               bm25({FTS_TABLE}, {NAME_WEIGHT}, 1.0) AS score,
+               snippet({FTS_TABLE}, -1, '<mark>', '</mark>', '…', 16) AS snippet
+        FROM {FTS_TABLE}
+        JOIN malaysia_targeted_threats t ON t.id = {FTS_TABLE}.rowid
+        WHERE {where}
+        ORDER BY score, t.id
+        LIMIT ?
+    """, params + [limit + 1]).fetchall()
+
+    results = [dict(r) for r in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = results[-1]
+        next_cursor = _encode_cursor(last["score"], last["id"])
+    return {"results": results, "next_cursor": next_cursor}
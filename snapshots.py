@@ -0,0 +1,258 @@
+import os
+import gzip
+import json
+import hashlib
+import sqlite3
+from changes import suspend_change_feed, reset_change_feed
+
+# --------------------------
+# Snapshot Config
+# --------------------------
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+MANIFEST_FILE = "MANIFEST.json"
+COMPACT_AFTER = int(os.environ.get("SNAPSHOT_COMPACT_AFTER", 48))  # ~1 day of 30 min runs
+TABLE = "malaysia_targeted_threats"
+BATCH_ROWS = 5000
+# How long a worker waits for another one's restore to finish
+RESTORE_TIMEOUT = int(os.environ.get("SNAPSHOT_RESTORE_TIMEOUT", 600))
+
+# Per-row digests of the last written snapshot state, used to find rows that
+# are new or changed since then. Rebuilt on every restore, never snapshotted.
+DIGEST_TABLE = "snapshot_digests"
+
+# --------------------------
+# Manifest
+# --------------------------
+def load_manifest(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_manifest(snapshot_dir, manifest):
+    path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+# --------------------------
+# Row Encoding
+# --------------------------
+def _row_digest(record):
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=8).digest()
+
+# BLOB values (binary IP/hash indicators) travel as {"$hex": "..."}
+def _to_json(value):
+    if isinstance(value, bytes):
+        return {"$hex": value.hex()}
+    return value
+
+def _from_json(value):
+    if isinstance(value, dict) and "$hex" in value:
+        return bytes.fromhex(value["$hex"])
+    return value
+
+def _iter_records(conn):
+    cur = conn.execute(f"SELECT * FROM {TABLE} ORDER BY id")
+    cols = [d[0] for d in cur.description]
+    while True:
+        rows = cur.fetchmany(BATCH_ROWS)
+        if not rows:
+            break
+        for row in rows:
+            yield {c: _to_json(v) for c, v in zip(cols, row)}
+
+def _write_segment(snapshot_dir, kind, records):
+    # Streams records through gzip into a temp file, then renames it to its
+    # content hash. mtime=0 so identical content always gets the same name.
+    # Returns None when there was nothing to write.
+    tmp = os.path.join(snapshot_dir, f".{kind}.tmp")
+    count = 0
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as gz:
+        for rec in records:
+            gz.write(json.dumps(rec, separators=(",", ":")).encode())
+            gz.write(b"\n")
+            count += 1
+    if not count:
+        os.remove(tmp)
+        return None
+    sha = hashlib.sha256()
+    with open(tmp, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    name = f"{kind}-{sha.hexdigest()[:20]}.ndjson.gz"
+    os.replace(tmp, os.path.join(snapshot_dir, name))
+    return name
+
+def _write_empty_base(snapshot_dir):
+    data = gzip.compress(b"", mtime=0)
+    name = f"base-{hashlib.sha256(data).hexdigest()[:20]}.ndjson.gz"
+    with open(os.path.join(snapshot_dir, name), "wb") as f:
+        f.write(data)
+    return name
+
+def _read_segment(snapshot_dir, name):
+    with gzip.open(os.path.join(snapshot_dir, name), "rb") as gz:
+        for line in gz:
+            if line.strip():
+                yield json.loads(line)
+
+def _ensure_digest_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DIGEST_TABLE} (
+            id INTEGER PRIMARY KEY,
+            digest BLOB
+        )
+    """)
+
+# --------------------------
+# Delta Writer
+# --------------------------
+def write_delta(db_file, snapshot_dir=SNAPSHOT_DIR):
+    # Appends one delta segment holding every row that is new or changed
+    # since the last snapshot, plus {"id": .., "_deleted": true} tombstones.
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = load_manifest(snapshot_dir)
+    if manifest is None or not manifest.get("base"):
+        return compact(db_file, snapshot_dir)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        _ensure_digest_table(conn)
+        known = dict(conn.execute(f"SELECT id, digest FROM {DIGEST_TABLE}"))
+        updates = []
+
+        def changed_records():
+            for rec in _iter_records(conn):
+                digest = _row_digest(rec)
+                if known.pop(rec["id"], None) != digest:
+                    updates.append((rec["id"], digest))
+                    yield rec
+            # Whatever is left in known no longer exists in the table
+            for row_id in sorted(known):
+                yield {"id": row_id, "_deleted": True}
+
+        name = _write_segment(snapshot_dir, "delta", changed_records())
+        if name is None:
+            return None
+        manifest["deltas"].append(name)
+        _save_manifest(snapshot_dir, manifest)
+
+        with conn:
+            conn.executemany(f"INSERT OR REPLACE INTO {DIGEST_TABLE} (id, digest) VALUES (?, ?)", updates)
+            conn.executemany(f"DELETE FROM {DIGEST_TABLE} WHERE id = ?", [(i,) for i in known])
+    finally:
+        conn.close()
+
+    if len(manifest["deltas"]) >= COMPACT_AFTER:
+        compact(db_file, snapshot_dir)
+    return name
+
+# --------------------------
+# Compaction
+# --------------------------
+def compact(db_file, snapshot_dir=SNAPSHOT_DIR):
+    # Folds the current DB into a fresh base segment and drops every segment
+    # the new manifest no longer references.
+    os.makedirs(snapshot_dir, exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    try:
+        _ensure_digest_table(conn)
+        digests = []
+
+        def all_records():
+            for rec in _iter_records(conn):
+                digests.append((rec["id"], _row_digest(rec)))
+                yield rec
+
+        # An empty table still gets an (empty) base so the manifest is valid
+        name = _write_segment(snapshot_dir, "base", all_records()) or _write_empty_base(snapshot_dir)
+        with conn:
+            conn.execute(f"DELETE FROM {DIGEST_TABLE}")
+            conn.executemany(f"INSERT INTO {DIGEST_TABLE} (id, digest) VALUES (?, ?)", digests)
+    finally:
+        conn.close()
+
+    _save_manifest(snapshot_dir, {"base": name, "deltas": []})
+    for f in os.listdir(snapshot_dir):
+        if f.endswith(".ndjson.gz") and f != name:
+            os.remove(os.path.join(snapshot_dir, f))
+    return name
+
+# --------------------------
+# Loader
+# --------------------------
+def restore(db_file, snapshot_dir=SNAPSHOT_DIR, only_if_empty=False):
+    # Replays base + deltas into an existing (schema-initialised) DB. Segments
+    # stream in order, so memory stays at one batch and a later delta simply
+    # overwrites or deletes what an earlier segment wrote.
+    manifest = load_manifest(snapshot_dir)
+    if manifest is None or not manifest.get("base"):
+        return 0
+
+    conn = sqlite3.connect(db_file, timeout=RESTORE_TIMEOUT, isolation_level=None)
+    conn.execute("PRAGMA synchronous = OFF")
+    try:
+        # Every web worker runs init_db on import: the first to take the write
+        # lock restores, the rest wait here and then find the table filled
+        conn.execute("BEGIN IMMEDIATE")
+        if only_if_empty and conn.execute(f"SELECT 1 FROM {TABLE} LIMIT 1").fetchone():
+            conn.execute("ROLLBACK")
+            return 0
+        _ensure_digest_table(conn)
+        info = conn.execute(f"PRAGMA table_info({TABLE})").fetchall()
+        cols = [r[1] for r in info]
+        # Columns newer than a segment take their declared default, e.g.
+        # country = 'MY' for rows snapshotted before country profiles
+        defaults = {
+            r[1]: conn.execute(f"SELECT {r[4]}").fetchone()[0] if r[4] is not None else None
+            for r in info
+        }
+        # A delta's row replaces the older copy with the same id, or with the
+        # same (country, indicator) under a new id. Deleting first (instead
+        # of INSERT OR REPLACE) keeps the search index triggers firing.
+        delete_sql = f"DELETE FROM {TABLE} WHERE id = ? OR (country = ? AND indicator = ?)"
+        insert_sql = f"INSERT INTO {TABLE} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+        id_at, country_at, indicator_at = (cols.index(c) for c in ("id", "country", "indicator"))
+        digest_sql = f"INSERT OR REPLACE INTO {DIGEST_TABLE} (id, digest) VALUES (?, ?)"
+
+        def flush(batch, tombstones):
+            if batch:
+                conn.executemany(delete_sql, ((r[id_at], r[country_at], r[indicator_at]) for r, _ in batch))
+                conn.executemany(insert_sql, (r for r, _ in batch))
+                conn.executemany(digest_sql, ((r[id_at], digest) for r, digest in batch))
+            if tombstones:
+                conn.executemany(f"DELETE FROM {TABLE} WHERE id = ?", tombstones)
+                conn.executemany(f"DELETE FROM {DIGEST_TABLE} WHERE id = ?", tombstones)
+
+        suspend_change_feed(conn)
+        conn.execute(f"DELETE FROM {TABLE}")
+        conn.execute(f"DELETE FROM {DIGEST_TABLE}")
+        for name in [manifest["base"]] + manifest["deltas"]:
+            # Ids are unique within a segment, so a batch never holds the
+            # same row twice; segments are flushed one after the other
+            batch, tombstones = [], []
+            for rec in _read_segment(snapshot_dir, name):
+                if rec.get("_deleted"):
+                    tombstones.append((rec["id"],))
+                else:
+                    rec = {c: rec.get(c, defaults[c]) for c in cols}
+                    batch.append(([_from_json(rec[c]) for c in cols], _row_digest(rec)))
+                if len(batch) + len(tombstones) >= BATCH_ROWS:
+                    flush(batch, tombstones)
+                    batch, tombstones = [], []
+            flush(batch, tombstones)
+        reset_change_feed(conn)
+        count = conn.execute(f"SELECT COUNT(*) FROM {TABLE}").fetchone()[0]
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return count
@@ -0,0 +1,43 @@
+import os
+import sys
+import shutil
+import filecmp
+
+# --------------------------
+# Shared Module Copies
+# --------------------------
+# threat/src and backend/app are deployed on their own, with their own import
+# roots, so they carry copies of these root modules. The root module is the
+# one to edit: `python sync_copies.py` rewrites the copies from it, and
+# `python sync_copies.py --check` (run by the workflow) exits 1 when a copy
+# has drifted.
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+COPIES = {
+    "pipeline.py": ["threat/src/pipeline.py", "backend/app/services/pipeline.py"],
+    "page_cache.py": ["threat/src/page_cache.py"],
+    "resolver.py": ["threat/src/resolver.py"],
+    "geo_reload.py": ["threat/src/geo_reload.py", "backend/app/services/geo_reload.py"],
+}
+
+def drifted():
+    # [(source, copy)] for every copy that differs from its root module
+    return [
+        (source, copy)
+        for source, copies in COPIES.items()
+        for copy in copies
+        if not filecmp.cmp(os.path.join(ROOT, source), os.path.join(ROOT, copy), shallow=False)
+    ]
+
+def sync():
+    for source, copy in drifted():
+        shutil.copyfile(os.path.join(ROOT, source), os.path.join(ROOT, copy))
+        print(f"Updated {copy} from {source}")
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--check"]:
+        stale = drifted()
+        for source, copy in stale:
+            print(f"{copy} differs from {source}; edit {source} and run python sync_copies.py")
+        sys.exit(1 if stale else 0)
+    sync()
@@ -20,3 +20,10 @@ def insert_indicator(ind_type, value, country):
         (ind_type, value, country)
     )
     conn.commit()
+
+def insert_indicators(rows):
+    cursor.executemany(
+        "INSERT INTO indicators (type, value, country) VALUES (?, ?, ?)",
+        rows
+    )
+    conn.commit()
@@ -0,0 +1,70 @@
+import os
+import time
+import threading
+
+# --------------------------
+# Hot-reloading MMDB Reader
+# --------------------------
+# The scheduled workflow drops a fresh GeoLite2 file in place every run.
+# get() returns the current reader and, at most every check_seconds, stats
+# the file. When its (inode, mtime, size) changed, a background thread opens
+# the new file and swaps it in with one assignment; lookups keep using the
+# old reader meanwhile and never wait on a reload. Replace the file with a
+# rename (mv), not by writing into it: readers mmap the file.
+# Copied to threat/src and backend/app/services by sync_copies.py; edit this root module.
+
+CHECK_SECONDS = float(os.environ.get("GEOIP_CHECK_SECONDS", "30"))
+
+class ReloadingReader:
+    def __init__(self, path, open_reader, check_seconds=CHECK_SECONDS, on_swap=None):
+        self.path = path
+        self.open_reader = open_reader
+        self.check_seconds = check_seconds
+        self.on_swap = on_swap            # called after every swap, e.g. to drop caches
+        self.generation = 0
+        self._current = (None, None)      # (file stamp, reader)
+        self._next_check = time.monotonic() + check_seconds
+        self._loading = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.path)
+        except (OSError, TypeError):
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        stamp = self._stamp()
+        reader = None
+        try:
+            if stamp is not None:
+                reader = self.open_reader(self.path)
+        except Exception as e:
+            # Half-copied or corrupt file: keep the old reader, retry next check
+            print("Reload Error:", self.path, e)
+            with self._lock:
+                self._loading = False
+            return
+        with self._lock:
+            self._current = (stamp, reader)
+            self.generation += 1
+            self._loading = False
+        # The old reader is left to the garbage collector: lookups that
+        # already hold it finish against the old file.
+        if self.on_swap:
+            self.on_swap(self)
+
+    def get(self):
+        now = time.monotonic()
+        if now >= self._next_check:
+            with self._lock:
+                check = now >= self._next_check and not self._loading
+                if check:
+                    self._next_check = now + self.check_seconds
+            if check and self._stamp() != self._current[0]:
+                with self._lock:
+                    self._loading = True
+                threading.Thread(target=self._load, name="geoip-reload", daemon=True).start()
+        return self._current[1]
@@ -1,19 +1,51 @@
 from otx_client import fetch_indicators
 from maxmind_geo import is_malaysia_ip
-from database import insert_indicator
+from resolver import resolve_domains
+from database import insert_indicators
+from pipeline import Pipeline, Stage
 
-def ingest():
-    ips = fetch_indicators("IPv4")
-    domains = fetch_indicators("domain")
-    hashes = fetch_indicators("FileHash-SHA256")
+# The three exports are fetched concurrently and feed one bounded queue;
+# GeoIP filtering runs on worker threads and a single writer inserts batches.
+# Domains are resolved a batch at a time (concurrent async DNS, cached) and
+# count as Malaysian when any A/AAAA record is.
+BATCH_SIZE = 200
+GEO_WORKERS = 4
+
+def _tagged_batches(ind_type, values, size=BATCH_SIZE):
+    batch = []
+    for value in values:
+        batch.append(value)
+        if len(batch) >= size:
+            yield ind_type, batch
+            batch = []
+    if batch:
+        yield ind_type, batch
 
-    # Malaysian IPs
-    for ip in ips:
-        if is_malaysia_ip(ip):
-            insert_indicator("ip", ip, "MY")
+def _classify(item):
+    ind_type, values = item
+    if ind_type == "ip":
+        # Malaysian IPs only
+        rows = [("ip", v, "MY") for v in values if is_malaysia_ip(v)]
+    elif ind_type == "domain":
+        resolved = resolve_domains(values)
+        rows = [
+            ("domain", v, "MY" if any(is_malaysia_ip(ip) for ip in resolved.get(v, ())) else "")
+            for v in values
+        ]
+    else:
+        # Hashes
+        rows = [(ind_type, v, "") for v in values]
+    return rows or None
 
-    # Domains & hashes
-    for domain in domains:
-        insert_indicator("domain", domain, "")
-    for h in hashes:
-        insert_indicator("hash", h, "")
+def ingest():
+    return Pipeline(
+        [
+            _tagged_batches("ip", fetch_indicators("IPv4")),
+            _tagged_batches("domain", fetch_indicators("domain")),
+            _tagged_batches("hash", fetch_indicators("FileHash-SHA256")),
+        ],
+        [
+            Stage("classify", _classify, workers=GEO_WORKERS),
+            Stage("write", insert_indicators),
+        ]
+    ).run()
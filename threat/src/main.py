@@ -1,7 +1,8 @@
 import os
 import sqlite3
 import requests
-from flask import Flask, jsonify, request, render_template_string
+from flask import Flask, jsonify, request, render_template
+from page_cache import PageCache
 
 # --------------------------
 # Environment / Config
@@ -146,8 +147,7 @@ def dashboard_api():
 # --------------------------
 # Dashboard HTML
 # --------------------------
-@app.route("/")
-def dashboard_html():
+def _render_dashboard():
     conn = get_db_connection()
     rows = conn.execute("""
         SELECT * FROM malaysia_targeted_threats
@@ -155,51 +155,19 @@ def dashboard_html():
         LIMIT 20
     """).fetchall()
     conn.close()
+    return render_template("dashboard.html", rows=rows)
+
+def _dataset_version():
+    # Every commit rewrites the DB file, so its mtime/size tracks the data
+    st = os.stat(DATABASE_FILE)
+    return (st.st_mtime_ns, st.st_size)
+
+dashboard_cache = PageCache(_render_dashboard, _dataset_version)
+
+@app.route("/")
+def dashboard_html():
+    return dashboard_cache.response()
 
-    html = """
-    <html>
-    <head>
-        <title>Malaysia Threat Intel Dashboard</title>
-        <style>
-            body { font-family: Arial, sans-serif; background-color: #111; color: #eee; }
-            table { border-collapse: collapse; width: 100%; margin-top: 20px; }
-            th, td { border: 1px solid #555; padding: 8px; text-align: left; }
-            th { background-color: #222; }
-            tr:nth-child(even) { background-color: #1a1a1a; }
-            .header { display: flex; align-items: center; gap: 15px; }
-            img.logo { height: 60px; }
-            .email { margin-top: 5px; font-size: 0.9em; color: #aaa; }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <img src="https://https://github.com/redsharknetworks/sunday-ring/redshark.jpeg" class="logo" />
-            <h1>Malaysia Threat Intel Dashboard</h1>
-        </div>
-        <div class="email">Contact: darkgrid@redshark.my</div>
-
-        <table>
-            <tr>
-                <th>Indicator</th>
-                <th>Type</th>
-                <th>Pulse Name</th>
-                <th>Threat Score</th>
-            </tr>
-            {% for row in rows %}
-            <tr>
-                <td>{{row['indicator']}}</td>
-                <td>{{row['indicator_type']}}</td>
-                <td>{{row['pulse_name']}}</td>
-                <td>{{row['threat_score']}}</td>
-            </tr>
-            {% endfor %}
-        </table>
-        <p>Total Showing: {{rows|length}}</p>
-    </body>
-    </html>
-    """
-    return render_template_string(html, rows=rows)
-  
 # --------------------------
 # Run App
 # --------------------------
@@ -1,13 +1,18 @@
 import geoip2.database
 import os
 from dotenv import load_dotenv
+from geo_reload import ReloadingReader
 
 load_dotenv()
 MAXMIND_DB = os.getenv("MAXMIND_DB")
 
-reader = geoip2.database.Reader(MAXMIND_DB)
+# Re-opened in the background when the workflow replaces the MMDB file
+geoip = ReloadingReader(MAXMIND_DB, geoip2.database.Reader)
 
 def is_malaysia_ip(ip):
+    reader = geoip.get()
+    if reader is None:
+        return False
     try:
         response = reader.country(ip)
         return response.country.iso_code == "MY"
@@ -10,6 +10,10 @@ HEADERS = {"X-OTX-API-KEY": OTX_API_KEY}
 def fetch_indicators(indicator_type, limit=500):
     url = f"{OTX_BASE}/indicators/export"
     params = {"type": indicator_type, "limit": limit}
-    r = requests.get(url, headers=HEADERS, params=params, timeout=10)
-    r.raise_for_status()
-    return r.text.splitlines()
+    # Yields one indicator per line as the export body streams in
+    with requests.get(url, headers=HEADERS, params=params, timeout=10, stream=True) as r:
+        r.raise_for_status()
+        r.encoding = r.encoding or "utf-8"
+        for line in r.iter_lines(decode_unicode=True):
+            if line:
+                yield line
@@ -0,0 +1,64 @@
+import gzip
+import time
+import hashlib
+import threading
+from flask import Response, request
+
+# --------------------------
+# Versioned Page Cache
+# --------------------------
+# Keeps one rendered copy of a page (plain + gzip) per dataset version. The
+# version source is polled at most every `check_seconds`, so between ingests
+# a view costs a dict lookup instead of a query and a template render.
+# Copied to threat/src by sync_copies.py; edit this root module.
+
+class PageCache:
+    def __init__(self, render, version, check_seconds=1.0, mimetype="text/html"):
+        self.render = render
+        self.version = version
+        self.check_seconds = check_seconds
+        self.mimetype = mimetype
+        self._entry = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        return self._entry is not None and time.monotonic() - self._checked < self.check_seconds
+
+    def current(self):
+        if self._fresh():
+            return self._entry
+        with self._lock:
+            if self._fresh():
+                return self._entry
+            version = self.version()
+            if self._entry is None or self._entry["version"] != version:
+                body = self.render().encode("utf-8")
+                self._entry = {
+                    "version": version,
+                    # Content hash, so a reset counter can never reuse an old tag
+                    "etag": hashlib.blake2b(body, digest_size=8).hexdigest(),
+                    "body": body,
+                    "gzip": gzip.compress(body, compresslevel=6, mtime=0),
+                }
+            self._checked = time.monotonic()
+            return self._entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+
+    def response(self):
+        entry = self.current()
+        use_gzip = bool(request.accept_encodings["gzip"])
+        etag = entry["etag"] + ("-gz" if use_gzip else "")
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(entry["gzip"] if use_gzip else entry["body"], mimetype=self.mimetype)
+            if use_gzip:
+                resp.headers["Content-Encoding"] = "gzip"
+        resp.set_etag(etag)
+        resp.headers["Vary"] = "Accept-Encoding"
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
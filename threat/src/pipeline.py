@@ -0,0 +1,185 @@
+import time
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# --------------------------
+# Staged Pipeline
+# --------------------------
+# Sources -> stage -> stage -> ... connected by bounded queues. A full queue
+# blocks the stage feeding it (backpressure), so a slow writer throttles the
+# fetchers instead of buffering the whole feed in memory. Every blocking
+# call polls the cancel event so cancel() or a failing stage drains
+# everything promptly.
+# Copied to threat/src and backend/app/services by sync_copies.py; edit this root module.
+
+_DONE = object()
+POLL_SECONDS = 0.1
+
+class PipelineCancelled(Exception):
+    pass
+
+class Stage:
+    # fn(item) returns the item for the next stage, or None to drop it.
+    # processes=True runs fn in a process pool of `workers` processes (fn must
+    # be a module-level function and items picklable); otherwise `workers`
+    # threads call fn directly.
+    def __init__(self, name, fn, workers=1, queue_size=8, processes=False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.processes = processes
+        self.items_in = 0
+        self.items_out = 0
+        self.busy_seconds = 0.0
+
+    def stats(self):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "in": self.items_in,
+            "out": self.items_out,
+            "busy_seconds": round(self.busy_seconds, 3),
+        }
+
+class Pipeline:
+    def __init__(self, sources, stages, source_queue_size=8):
+        self.sources = list(sources)
+        self.stages = list(stages)
+        self.source_queue_size = source_queue_size
+        self._cancel = threading.Event()
+        self._errors = []
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    # --------------------------
+    # Queue helpers
+    # --------------------------
+    def _put(self, q, item):
+        while not self._cancel.is_set():
+            try:
+                q.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._cancel.is_set():
+            try:
+                return q.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _fail(self, stage_name, exc):
+        with self._lock:
+            self._errors.append((stage_name, exc))
+        self._cancel.set()
+
+    # --------------------------
+    # Workers
+    # --------------------------
+    def _run_source(self, source, out_q, remaining):
+        try:
+            for item in source:
+                if not self._put(out_q, item):
+                    break
+        except Exception as e:
+            self._fail("source", e)
+        finally:
+            self._finish(remaining, out_q)
+
+    def _run_stage(self, stage, in_q, out_q, remaining, pool):
+        try:
+            while True:
+                item = self._get(in_q)
+                if item is _DONE:
+                    # Let sibling workers of this stage see the end marker too
+                    self._put(in_q, _DONE)
+                    break
+                started = time.perf_counter()
+                result = pool.submit(stage.fn, item).result() if pool else stage.fn(item)
+                with self._lock:
+                    stage.items_in += 1
+                    stage.busy_seconds += time.perf_counter() - started
+                if result is None or out_q is None:
+                    continue
+                if not self._put(out_q, result):
+                    break
+                with self._lock:
+                    stage.items_out += 1
+        except Exception as e:
+            self._fail(stage.name, e)
+        finally:
+            self._finish(remaining, out_q)
+
+    def _finish(self, remaining, out_q):
+        # The last worker of a group passes the end marker downstream
+        with self._lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and out_q is not None:
+            self._put(out_q, _DONE)
+
+    # --------------------------
+    # Run
+    # --------------------------
+    def run(self):
+        queues = [queue.Queue(maxsize=self.source_queue_size)]
+        queues += [queue.Queue(maxsize=s.queue_size) for s in self.stages[:-1]]
+        queues.append(None)
+
+        pools, threads = [], []
+        try:
+            remaining = [len(self.sources)]
+            for source in self.sources:
+                threads.append(threading.Thread(
+                    target=self._run_source, args=(source, queues[0], remaining), daemon=True))
+
+            for i, stage in enumerate(self.stages):
+                # spawn: the pool's processes start once stage threads (and in
+                # the backend the scheduler and DB pools) are running, and a
+                # fork would copy locks those threads hold
+                pool = ProcessPoolExecutor(
+                    max_workers=stage.workers, mp_context=multiprocessing.get_context("spawn")
+                ) if stage.processes else None
+                if pool:
+                    pools.append(pool)
+                remaining = [stage.workers]
+                for _ in range(stage.workers):
+                    threads.append(threading.Thread(
+                        target=self._run_stage,
+                        args=(stage, queues[i], queues[i + 1], remaining, pool),
+                        name=f"pipeline-{stage.name}", daemon=True))
+
+            for t in threads:
+                t.start()
+            for t in threads:
+                while t.is_alive():
+                    t.join(POLL_SECONDS)
+        except KeyboardInterrupt:
+            self.cancel()
+            for t in threads:
+                t.join()
+            raise
+        finally:
+            for pool in pools:
+                pool.shutdown(cancel_futures=True)
+
+        if self._errors:
+            # The first failure is re-raised as-is so callers see the real error
+            stage_name, exc = self._errors[0]
+            print(f"Pipeline stage '{stage_name}' failed:", exc)
+            raise exc
+        if self._cancel.is_set():
+            raise PipelineCancelled()
+        return [stage.stats() for stage in self.stages]
@@ -0,0 +1,440 @@
+import os
+import io
+import json
+from flask import (Flask, Response, jsonify, request, render_template, send_file,
+                   send_from_directory, stream_with_context)
+from db import init_db, get_db_connection, get_dataset_version, DATABASE_FILE
+from ingest import run_ingest
+import pdf_jobs
+from reports import build_json_report, build_csv_report
+from search import search_threats
+from domains import zone_threats, zone_counts
+from indicators import THREAT_COLUMNS
+from page_cache import PageCache
+from events import bus, ensure_watcher
+from rollups import query_rollup, rollup_totals
+from grid import fetch_window
+from lifecycle import threat_source
+from countries import InvalidCountry, parse_country, country_name
+from scoring import get_engine
+import ioc_index
+from changes import read_changes, ResyncRequired
+import blocklist
+
+# --------------------------
+# Flask App
+# --------------------------
+app = Flask(__name__)
+
+ADMIN_KEY = os.environ.get("ADMIN_KEY")
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+
+init_db()
+# Ingest keeps the index current; only a fresh checkout has to build one
+if not os.path.exists(ioc_index.INDEX_FILE):
+    try:
+        ioc_index.write_index(DATABASE_FILE)
+    except Exception as e:
+        print("IOC Index Error:", e)
+
+# --------------------------
+# Country Selection
+# --------------------------
+# Every page and API below serves one target country: ?country=SG, or
+# DEFAULT_COUNTRY when absent.
+def _country():
+    return parse_country(request.args.get("country"))
+
+@app.errorhandler(InvalidCountry)
+def invalid_country(e):
+    return {"error": str(e)}, 400
+
+# --------------------------
+# Update Endpoint
+# --------------------------
+@app.route("/update")
+def update_threats():
+    key = request.args.get("key")
+    if ADMIN_KEY and key != ADMIN_KEY:
+        return {"error": "Unauthorized"}, 403
+    try:
+        total = run_ingest(limit=200)
+    except RuntimeError as e:
+        return {"error": str(e)}, 503
+    return {"status": "updated", "total_pulses_fetched": total}
+
+# --------------------------
+# Dashboard API
+# --------------------------
+def _include_archived():
+    return request.args.get("include_archived", "").lower() in ("1", "true", "yes")
+
+@app.route("/api/dashboard")
+def dashboard_api():
+    country = _country()
+    conn = get_db_connection()
+    rows = conn.execute(f"""
+        SELECT {THREAT_COLUMNS} FROM {threat_source(conn, _include_archived())}
+        WHERE country = ?
+        ORDER BY threat_score DESC, pulse_created DESC
+        LIMIT 50
+    """, (country,)).fetchall()
+    conn.close()
+    return jsonify([dict(row) for row in rows])
+
+# --------------------------
+# Live Threat Stream (SSE)
+# --------------------------
+STREAM_KEEPALIVE_SECONDS = 15
+
+def _sse(event_id, name, data):
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+
+@app.route("/api/stream")
+def stream_api():
+    # "threats" events carry newly inserted rows; "reset" and "refresh" tell
+    # the client to reload /api/dashboard (lost position / rows rescored).
+    # The bus carries every country; each client only gets its own rows.
+    country = _country()
+    ensure_watcher(get_db_connection, get_dataset_version)
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+
+    def generate():
+        bus.add_listener()
+        try:
+            seq = bus.position(last_id)
+            yield "retry: 3000\n\n"
+            if seq is None:
+                seq = bus.position(None)
+                yield _sse(bus.event_id(seq), "reset", {})
+            while True:
+                events = bus.wait(seq, STREAM_KEEPALIVE_SECONDS)
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                if events[0][0] > seq + 1:
+                    # Fell behind the ring buffer while writing to a slow client
+                    seq = events[-1][0]
+                    yield _sse(bus.event_id(seq), "reset", {})
+                    continue
+                for seq, name, data in events:
+                    if name in ("threats", "updates", "deletes"):
+                        data = [row for row in data if row["country"] == country]
+                        if not data:
+                            continue
+                    yield _sse(bus.event_id(seq), name, data)
+        finally:
+            bus.remove_listener()
+
+    return Response(stream_with_context(generate()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --------------------------
+# Chart Rollups API
+# --------------------------
+TOP_ASNS = 10
+
+@app.route("/api/stats")
+def stats_api():
+    # Overview for the dashboard charts, all from threat_rollups
+    since = request.args.get("since")
+    until = request.args.get("until")
+    country = _country()
+    conn = get_db_connection()
+    try:
+        return jsonify({
+            "country": country,
+            "types": rollup_totals(conn, "week", country, since, until),
+            "countries": rollup_totals(conn, "country", country, since, until),
+            "states": rollup_totals(conn, "state", country, since, until),
+            "cities": rollup_totals(conn, "city", country, since, until),
+            "asns": rollup_totals(conn, "asn", country, since, until, limit=TOP_ASNS),
+        })
+    finally:
+        conn.close()
+
+@app.route("/api/stats/<dim>")
+def stats_dim_api(dim):
+    since = request.args.get("since")
+    until = request.args.get("until")
+    country = _country()
+    conn = get_db_connection()
+    try:
+        series = query_rollup(conn, dim, country, since, until, key=request.args.get("key"))
+        totals = rollup_totals(conn, dim, country, since, until)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    finally:
+        conn.close()
+    return jsonify({"dim": dim, "series": series, "totals": totals})
+
+@app.route("/assets/<path:filename>")
+def assets(filename):
+    return send_from_directory(ASSETS_DIR, filename)
+
+# --------------------------
+# Virtualized Table API
+# --------------------------
+@app.route("/api/table")
+def table_api():
+    # Searches page through indicator order, ascending unless asked otherwise
+    q = request.args.get("q", "").strip() or None
+    country = _country()
+    conn = get_db_connection()
+    try:
+        page = fetch_window(
+            conn, get_dataset_version(conn), country,
+            q=q,
+            sort=request.args.get("sort", "score"),
+            order=request.args.get("order", "asc" if q else "desc"),
+            offset=request.args.get("offset", 0, type=int),
+            limit=request.args.get("limit", 100, type=int)
+        )
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    finally:
+        conn.close()
+    return jsonify(page)
+
+# --------------------------
+# Full-Text Search API
+# --------------------------
+@app.route("/api/search")
+def search_api():
+    q = request.args.get("q", "")
+    limit = request.args.get("limit", 20, type=int)
+    cursor = request.args.get("cursor")
+    country = _country()
+    conn = get_db_connection()
+    try:
+        result = search_threats(conn, q, country, limit=limit, cursor=cursor)
+    except ValueError:
+        return {"error": "Invalid cursor"}, 400
+    finally:
+        conn.close()
+    return jsonify(result)
+
+# --------------------------
+# IOC Lookup API
+# --------------------------
+# ?q=1.2.3.4&q=evil.example.my: exact matches against the mmap'ed IOC index,
+# no database query
+LOOKUP_MAX = 100
+
+@app.route("/api/lookup")
+def lookup_api():
+    values = request.args.getlist("q")[:LOOKUP_MAX]
+    if not values:
+        return {"error": "Missing q"}, 400
+    index = ioc_index.get_index()
+    if index is None:
+        return {"error": "IOC index not built yet"}, 503
+    results = []
+    for value in values:
+        hit = index.lookup(value)
+        results.append({"indicator": value, "found": hit is not None, **(hit or {})})
+    return jsonify({"version": index.version, "results": results})
+
+# --------------------------
+# Change Feed API
+# --------------------------
+# NDJSON, one change per line, oldest first. Pass the X-Changes-Next header
+# back as ?after= and X-Changes-Epoch as ?epoch=; a 410 means start over
+# from after=0.
+@app.route("/api/changes")
+def changes_api():
+    after = request.args.get("after", 0, type=int)
+    limit = request.args.get("limit", 1000, type=int)
+    epoch = request.args.get("epoch") or None
+    country = parse_country(request.args["country"]) if request.args.get("country") else None
+    conn = get_db_connection()
+    try:
+        state, rows, next_after = read_changes(conn, after, limit, epoch, country)
+    except ResyncRequired as e:
+        return {"error": str(e), "resync": True}, 410
+    finally:
+        conn.close()
+    body = "".join(json.dumps(row, default=str) + "\n" for row in rows)
+    return Response(body, mimetype="application/x-ndjson", headers={
+        "X-Changes-Epoch": state["epoch"],
+        "X-Changes-Next": str(next_after),
+        "X-Changes-Last": str(state["last_seq"]),
+    })
+
+# --------------------------
+# Domain Zone API
+# --------------------------
+@app.route("/api/zones/<zone>")
+def zone_api(zone):
+    country = _country()
+    conn = get_db_connection()
+    try:
+        rows = zone_threats(
+            conn, zone, country,
+            since=request.args.get("since"),
+            after_id=request.args.get("after", 0, type=int),
+            limit=min(request.args.get("limit", 100, type=int), 1000),
+            include_archived=_include_archived()
+        )
+    except ValueError:
+        return {"error": "Invalid zone"}, 400
+    finally:
+        conn.close()
+    return jsonify({"zone": zone, "results": rows,
+                    "next_after": rows[-1]["id"] if rows else None})
+
+@app.route("/api/zones/<zone>/counts")
+def zone_counts_api(zone):
+    country = _country()
+    conn = get_db_connection()
+    try:
+        counts = zone_counts(conn, zone, country, since=request.args.get("since"),
+                             include_archived=_include_archived())
+    except ValueError:
+        return {"error": "Invalid zone"}, 400
+    finally:
+        conn.close()
+    return jsonify({"zone": zone, "total": sum(counts.values()), "children": counts})
+
+# --------------------------
+# Blocklist Exports
+# --------------------------
+# /export/blocklist/<plain|ipset|nftables|suricata>?min_score=&country=&feeds=0
+# Rendered once per dataset version and feeds/ change for each parameter set.
+BLOCKLIST_CACHE_MAX = 32
+blocklist_caches = {}
+
+def _blocklist_version():
+    return get_dataset_version(), blocklist.feeds_stamp()
+
+def _render_blocklist(fmt, min_score, country, feeds):
+    conn = get_db_connection()
+    try:
+        networks = blocklist.build_networks(conn, min_score, country, feeds)
+    finally:
+        conn.close()
+    return blocklist.render_blocklist(networks, fmt)
+
+@app.route("/export/blocklist/<fmt>")
+def blocklist_export(fmt):
+    if fmt not in blocklist.FORMATS:
+        return {"error": f"Unknown format: {fmt}"}, 404
+    min_score = request.args.get("min_score", 0, type=int)
+    country = parse_country(request.args["country"]) if request.args.get("country") else None
+    feeds = request.args.get("feeds", "1").lower() not in ("0", "false", "no")
+    key = (fmt, min_score, country, feeds)
+    cache = blocklist_caches.get(key)
+    if cache is None:
+        if len(blocklist_caches) >= BLOCKLIST_CACHE_MAX:
+            blocklist_caches.pop(next(iter(blocklist_caches)), None)
+        cache = blocklist_caches.setdefault(key, PageCache(
+            lambda: _render_blocklist(*key), _blocklist_version, mimetype="text/plain"))
+    return cache.response()
+
+# --------------------------
+# JSON Report
+# --------------------------
+@app.route("/report/json")
+def report_json():
+    return jsonify(build_json_report(country=_country()))
+
+# --------------------------
+# CSV Report
+# --------------------------
+@app.route("/report/csv")
+def report_csv():
+    return send_file(
+        io.BytesIO(build_csv_report(country=_country())),
+        mimetype="text/csv",
+        as_attachment=True,
+        download_name="weekly_threat_report.csv"
+    )
+
+# --------------------------
+# PDF Report with RedShark Logo
+# --------------------------
+@app.route("/report/pdf")
+def report_pdf():
+    # Rendered in the PDF process pool; this thread just waits on the result
+    try:
+        content = pdf_jobs.render_now("weekly", country=_country())
+    except pdf_jobs.PoolBusy as e:
+        return {"error": str(e)}, 429
+    return send_file(
+        io.BytesIO(content),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name="weekly_threat_report.pdf"
+    )
+
+# --------------------------
+# PDF Report Jobs
+# --------------------------
+@app.route("/report/pdf/jobs", methods=["POST"])
+def submit_pdf_job():
+    params = request.get_json(silent=True) or request.args
+    country = parse_country(params.get("country"))
+    try:
+        job_id, _ = pdf_jobs.submit(
+            kind=params.get("kind", "history"),
+            since=params.get("since"),
+            until=params.get("until"),
+            country=country,
+            include_archived=str(params.get("include_archived", "")).lower() in ("1", "true", "yes")
+        )
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    except pdf_jobs.PoolBusy as e:
+        return {"error": str(e)}, 429
+    return {"job": job_id, "status": "pending",
+            "status_url": f"/report/pdf/jobs/{job_id}",
+            "download_url": f"/report/pdf/jobs/{job_id}/download"}, 202
+
+@app.route("/report/pdf/jobs/<job_id>")
+def pdf_job_status(job_id):
+    status = pdf_jobs.status(job_id)
+    if status is None:
+        return {"error": "Unknown job"}, 404
+    return status
+
+@app.route("/report/pdf/jobs/<job_id>/download")
+def pdf_job_download(job_id):
+    status = pdf_jobs.status(job_id)
+    if status is None:
+        return {"error": "Unknown job"}, 404
+    if status["status"] != "done":
+        return status, 409
+    return send_file(
+        os.path.abspath(pdf_jobs.result_path(job_id)),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name="threat_history_report.pdf"
+    )
+
+# --------------------------
+# Dashboard HTML
+# --------------------------
+def _render_dashboard(country):
+    conn = get_db_connection()
+    rows = conn.execute(f"""
+        SELECT {THREAT_COLUMNS} FROM malaysia_targeted_threats
+        WHERE country = ?
+        ORDER BY threat_score DESC, pulse_created DESC
+        LIMIT 20
+    """, (country,)).fetchall()
+    conn.close()
+    countries = [(code, country_name(code)) for code in get_engine().countries]
+    return render_template("dashboard.html", rows=rows, country=country,
+                           country_name=country_name(country), countries=countries)
+
+# One cached page per country, each invalidated by the shared dataset version
+dashboard_caches = {}
+
+@app.route("/")
+def dashboard_html():
+    country = _country()
+    cache = dashboard_caches.get(country)
+    if cache is None:
+        cache = dashboard_caches.setdefault(
+            country, PageCache(lambda: _render_dashboard(country), get_dataset_version))
+    return cache.response()